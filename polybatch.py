@@ -0,0 +1,698 @@
+# -*- coding: UTF-8 -*-
+# Efficient Clipping of Arbitrary Polygons
+#
+# Copyright (c) 2011, 2012 Helder Correia <helder.mc@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Batch operations on many polygons
+
+Clip many polygons at once, or union them all together, using a pool of
+worker processes. Polygons are sent to the workers (and back) as packed
+coordinate buffers, not as pickled objects.
+
+Overlay two layers of polygons, clipping only the pairs whose bounding
+boxes overlap, found with an R-tree.
+
+Find the intersections of a single pair of large polygons with a pool of
+workers, each sweeping a vertical strip (the 'parallel' engine).
+
+Requires Python 2.6 or later (multiprocessing).
+"""
+
+from array import array
+from ctypes import memmove
+from math import ceil, sqrt
+from multiprocessing import Pool, cpu_count, current_process
+from multiprocessing.sharedctypes import RawArray
+
+from polygon import (CONTAINED, ENGINES, ClipStats, CompactPolygon, OUTPUTS, PreparedPolygon,
+                     clip_polygon, contained_relation, find_intersections_sweep, signed_area,
+                     simplifier, sweep_events)
+
+try:
+    import numpy
+    import numpy.ctypeslib
+except ImportError:
+    numpy = None
+
+
+def pack(points):
+    """Pack a list of points into a buffer of float64 x, y pairs."""
+    flat = array('d')
+    for x, y in points:
+        flat.append(x)
+        flat.append(y)
+    return flat.tostring()
+
+
+def unpack(data):
+    """Unpack a buffer made by pack() into a list of points."""
+    flat = array('d')
+    flat.fromstring(data)
+    return zip(flat[0::2], flat[1::2])
+
+
+# state of a worker process, set by init_worker
+worker_clipper = None
+worker_simplify = None
+worker_options = {}
+
+
+def init_worker(clipper, options):
+    """Set up a worker process with the fixed clipper (a packed buffer) and clip options.
+
+    If the options have a simplify argument, the fixed clipper is
+    simplified before it's prepared, and other polygons as they're clipped.
+    A cache argument is dropped: workers don't cache their results.
+    """
+    global worker_clipper, worker_simplify, worker_options
+    options = dict(options)
+    options.pop('cache', None)
+    worker_simplify = simplifier(options.pop('simplify', None))
+    if clipper is not None:
+        clipper = unpack(clipper)
+        if worker_simplify is not None:
+            clipper = worker_simplify(clipper).points
+        clipper = PreparedPolygon(clipper)
+    worker_clipper = clipper
+    worker_options = options
+
+
+def clip_packed(task):
+    """Clip one task in a worker, returning (index, list of packed pieces).
+
+    A task is (index, subject, clipper, operation), with packed polygons.
+    The clipper is None when the worker's fixed clipper is to be used.
+    """
+    index, subject, clipper, operation = task
+    subject = CompactPolygon.from_buffer(subject)
+    if clipper is None:
+        clipper = worker_clipper
+    else:
+        clipper = CompactPolygon.from_buffer(clipper)
+        if worker_simplify is not None:
+            clipper = worker_simplify(clipper)
+    if worker_simplify is not None:
+        subject = worker_simplify(subject)
+    # each subject is clipped once, so caching would only cost a fingerprint
+    clipped = clip_polygon(subject, clipper, operation, cache=False, output='flat',
+                           **worker_options)
+    return index, [flat.tostring() for flat in clipped]
+
+
+def clip_many(polygons, clipper=None, operation='difference', workers=None,
+              chunksize=64, ordered=True, **kwargs):
+    """Clip many polygons, in parallel.
+
+    If a clipper is given, polygons is an iterable of subject polygons
+    (lists of points) that are all clipped against it; it is prepared
+    only once in each worker. Otherwise, polygons is an iterable of
+    (subject, clipper) pairs.
+
+    Return an iterator over the results of clip_polygon for each polygon
+    (lists of CompactPolygon), as they are streamed back from the workers.
+    If ordered is False, results come as soon as they're ready, as
+    (index, result) pairs, where index is the position of the input.
+
+    The number of worker processes defaults to the number of CPUs. Tasks
+    are sent to the workers in chunks of chunksize polygons. With workers
+    set to 0, everything runs in the current process. Extra keyword
+    arguments are passed on to clip_polygon (simplify too, applied in the
+    workers, where each simplified polygon is cached), except cache:
+    results aren't cached.
+    """
+    if workers is None:
+        workers = cpu_count()
+
+    packed = None if clipper is None else pack(getattr(clipper, 'points', clipper))
+    if clipper is None:
+        tasks = ((i, pack(s), pack(c), operation) for i, (s, c) in enumerate(polygons))
+    else:
+        tasks = ((i, pack(s), None, operation) for i, s in enumerate(polygons))
+
+    if not workers:
+        init_worker(packed, kwargs)
+        results = (clip_packed(task) for task in tasks)
+        pool = None
+    else:
+        pool = Pool(workers, init_worker, (packed, kwargs))
+        if ordered:
+            results = pool.imap(clip_packed, tasks, chunksize)
+        else:
+            results = pool.imap_unordered(clip_packed, tasks, chunksize)
+
+    try:
+        for index, pieces in results:
+            pieces = [CompactPolygon.from_buffer(p) for p in pieces]
+            yield pieces if ordered else (index, pieces)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+# coordinates of the subject and clipper of a parallel intersection search,
+# as shared flat arrays of x, y pairs, set by init_strip_worker
+strip_coords = None
+
+# number of worker processes used by find_intersections_parallel (None for
+# the number of CPUs), and number of edges under which it's not worth it
+PARALLEL_WORKERS = None
+PARALLEL_MIN_EDGES = 1 << 16
+
+# number of points sampled to place the strip boundaries
+STRIP_SAMPLES = 1 << 12
+
+
+def shared_coords(points):
+    """Copy a list of points into a shared array of float64 x, y pairs."""
+    flat = array('d')
+    for x, y in points:
+        flat.append(x)
+        flat.append(y)
+    shared = RawArray('d', len(flat))
+    memmove(shared, flat.buffer_info()[0], flat.itemsize * len(flat))
+    return shared
+
+
+def init_strip_worker(subject, clipper):
+    """Set up a worker process with the shared coordinates of both polygons."""
+    global strip_coords
+    strip_coords = (subject, clipper)
+
+
+def strip_events(coords, which, left, right):
+    """Return the sweep events for the edges of a polygon overlapping the strip [left, right).
+
+    coords is a shared array of x, y pairs. The events are the same as
+    those of edge_events, for these edges only.
+    """
+    n = len(coords) // 2
+    if numpy is not None:
+        xs = numpy.ctypeslib.as_array(coords)[0::2]
+        xs2 = numpy.roll(xs, -1)
+        idx = numpy.nonzero((numpy.minimum(xs, xs2) < right) & (numpy.maximum(xs, xs2) >= left))[0].tolist()
+    else:
+        idx = []
+        for i in xrange(n):
+            xa, xb = coords[2 * i], coords[2 * ((i + 1) % n)]
+            if xa >= xb:
+                xa, xb = xb, xa
+            if xa < right and xb >= left:
+                idx.append(i)
+
+    events = []
+    for i in idx:
+        k = 2 * ((i + 1) % n)
+        x1, y1, x2, y2 = coords[2 * i], coords[2 * i + 1], coords[k], coords[k + 1]
+        events.append((min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2),
+                       which, i, x1, y1, x2, y2))
+    return events
+
+
+def sweep_strip(strip):
+    """Find the intersections in one strip [left, right), in a worker.
+
+    Return (found, contacts, pairs) as find_intersections_sweep would,
+    keeping only the pairs of edges owned by the strip: those where the
+    larger of their xmin lies in it, so that no pair is found twice.
+    """
+    left, right = strip
+    subject, clipper = strip_coords
+    events = strip_events(subject, 0, left, right) + strip_events(clipper, 1, left, right)
+    events.sort()
+    xmins = ({}, {})
+    for event in events:
+        xmins[event[4]][event[5]] = event[0]
+
+    stats, contacts = ClipStats(), []
+    found = sweep_events(events, stats, contacts)
+    owned = lambda i, j: max(xmins[0][i], xmins[1][j]) >= left
+    return ([hit for hit in found if owned(hit[0], hit[1])],
+            [pair for pair in contacts if owned(*pair)], stats.pairs)
+
+
+def strip_bounds(subject, clipper, count):
+    """Split the x range of both polygons into count strips with about as many vertices each.
+
+    Return the count + 1 boundaries, from -inf to inf, placed at quantiles
+    of a sample of the x coordinates.
+    """
+    step = max(1, (len(subject) + len(clipper)) // STRIP_SAMPLES)
+    xs = sorted([p[0] for p in subject[::step]] + [p[0] for p in clipper[::step]])
+    inner = [xs[k * len(xs) // count] for k in xrange(1, count)]
+    return [float('-inf')] + inner + [float('inf')]
+
+
+def find_intersections_parallel(subject, clipper, stats=None, contacts=None):
+    """Find edge intersections by sweeping vertical strips in parallel.
+
+    The x range of both polygons is split into as many strips as there are
+    workers (PARALLEL_WORKERS), with about as many vertices each (see
+    strip_bounds), and each strip is swept in a worker process, with the
+    edges overlapping it (see sweep_strip). The coordinates are put once
+    in shared memory, and not sent to the workers. The result is the same
+    as find_intersections_sweep's: each pair of edges is tested in every
+    strip its x ranges overlap in, but only kept in one.
+
+    Falls back to find_intersections_sweep for polygons with less than
+    PARALLEL_MIN_EDGES edges between them, with a single worker, or in a
+    daemon process (e.g., a clip_many worker), which can't start workers.
+
+    Registered in polygon.ENGINES as 'parallel' when this module is imported.
+    """
+    workers = PARALLEL_WORKERS or cpu_count()
+    if workers < 2 or len(subject) + len(clipper) < PARALLEL_MIN_EDGES or \
+       current_process().daemon:
+        return find_intersections_sweep(subject, clipper, stats, contacts)
+
+    bounds = strip_bounds(subject, clipper, workers)
+    pool = Pool(workers, init_strip_worker, (shared_coords(subject), shared_coords(clipper)))
+    try:
+        results = pool.map(sweep_strip, zip(bounds[:-1], bounds[1:]), 1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    found, degenerate = [], []
+    for hits, pairs, tested in results:
+        found.extend(hits)
+        degenerate.extend(pairs)
+        if stats is not None:
+            stats.pairs += tested
+    found.sort()
+    degenerate.sort()
+
+    if stats is not None:
+        stats.degeneracies += len(degenerate)
+    if contacts is not None:
+        contacts.extend(degenerate)
+    return found
+
+
+ENGINES['parallel'] = find_intersections_parallel
+
+
+def bounding_box(points):
+    """Return the bounding box of a list of points, as (xmin, ymin, xmax, ymax)."""
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def overlap(a, b):
+    """Test if two bounding boxes overlap."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def morton(x, y):
+    """Return the Z-order (Morton) code of a point with 16 bit integer coordinates."""
+    code = 0
+    for bit in xrange(16):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+def spatial_order(rings):
+    """Sort (bbox, ...) items along a Z-order curve of their bounding box centers."""
+    if not rings:
+        return rings
+
+    xmin = min(r[0][0] for r in rings)
+    ymin = min(r[0][1] for r in rings)
+    width = float(max(r[0][2] for r in rings) - xmin) or 1.0
+    height = float(max(r[0][3] for r in rings) - ymin) or 1.0
+
+    def key(ring):
+        x0, y0, x1, y1 = ring[0]
+        return morton(int(((x0 + x1) / 2 - xmin) / width * 0xffff),
+                      int(((y0 + y1) / 2 - ymin) / height * 0xffff))
+
+    return sorted(rings, key=key)
+
+
+def clean_ring(points):
+    """Return a ring without repeated points and zero-width spikes (or [] if nothing's left).
+
+    Clips with perturb=True leave both where edges of the two polygons
+    overlap: the same point twice, or a slit going back along itself.
+    """
+    ring = []
+    for p in points:
+        if ring and ring[-1] == p:
+            continue
+        if len(ring) > 1 and ring[-2] == p:
+            ring.pop()
+            continue
+        ring.append(p)
+
+    while len(ring) > 2:
+        if ring[0] == ring[-1] or ring[-2] == ring[0]:
+            ring.pop()
+        elif ring[1] == ring[-1]:
+            ring.pop(0)
+        else:
+            break
+    return ring if len(ring) > 2 else []
+
+
+def ring_op(a, b, operation, **kwargs):
+    """Clip two rings (lists of points) with perturb=True, returning rings.
+
+    Return the rings of the result (see clean_ring; rings of zero area are
+    dropped) and, if the boundaries don't cross, how a lies with respect
+    to b: 'inside', 'contains' or 'disjoint' (the result is then given by
+    CONTAINED); otherwise None. A union that finds no crossing is tried
+    again with the rings swapped, as perturbation moves the clipper one
+    way, and only merges rings sharing edges when that moves it into the
+    subject.
+    """
+    kwargs['perturb'] = True
+    subject, clipper = CompactPolygon(a), CompactPolygon(b)
+    pieces = getattr(subject, operation)(clipper, **kwargs)
+    crossed = not pieces or pieces[0] is not subject
+    if not crossed and operation == 'union':
+        subject = CompactPolygon(b)
+        pieces = subject.union(CompactPolygon(a), **kwargs)
+        crossed = not pieces or pieces[0] is not subject
+
+    if not crossed:
+        relation = contained_relation(CompactPolygon(a), CompactPolygon(b), True)
+        return [{'a': a, 'b': b}[p] for p in CONTAINED[operation][relation]], relation
+
+    rings = [clean_ring(piece.points) for piece in pieces]
+    return [ring for ring in rings if ring and signed_area(ring)], None
+
+
+def union_rings(a, b, **kwargs):
+    """Union two (bbox, outer, holes) items into one, or return None if they don't overlap.
+
+    The outer rings are unioned first: the largest ring of the result is
+    the new outer ring, and the others are holes. The holes of the union
+    are these, and the parts of the holes of either item not covered by
+    the other one. Rings may touch themselves at a vertex, where polygons
+    (or a hole and the outer ring) touch at a point.
+    """
+    (abox, aouter, aholes), (bbox, bouter, bholes) = a, b
+    rings, relation = ring_op(aouter, bouter, 'union', **kwargs)
+    if relation == 'disjoint':
+        return None
+
+    # items lying in a hole of the other one don't overlap it
+    if relation == 'inside' and any(ring_op(h, aouter, 'difference', **kwargs)[1] == 'contains'
+                                    for h in bholes):
+        return None
+    if relation == 'contains' and any(ring_op(h, bouter, 'difference', **kwargs)[1] == 'contains'
+                                      for h in aholes):
+        return None
+
+    outer = max(rings, key=lambda ring: abs(signed_area(ring)))
+    holes = [ring for ring in rings if ring is not outer]
+    for h in aholes:
+        holes.extend(ring_op(h, bouter, 'difference', **kwargs)[0])
+        for g in bholes:
+            holes.extend(ring_op(h, g, 'intersection', **kwargs)[0])
+    for g in bholes:
+        holes.extend(ring_op(g, aouter, 'difference', **kwargs)[0])
+
+    return bounding_box(outer), outer, holes
+
+
+def merge(a, b, **kwargs):
+    """Union two lists of disjoint (bbox, outer, holes) items into one."""
+    result = list(a)
+    for item in b:
+        merged = True
+        while merged:
+            merged = False
+            for k, other in enumerate(result):
+                if overlap(item[0], other[0]):
+                    union = union_rings(other, item, **kwargs)
+                    if union is not None:
+                        item = union
+                        del result[k]
+                        merged = True
+                        break
+        result.append(item)
+    return result
+
+
+def cascade(groups, **kwargs):
+    """Merge lists of items in a balanced binary tree, until there's one left."""
+    while len(groups) > 1:
+        merged = [merge(a, b, **kwargs) for a, b in zip(groups[0::2], groups[1::2])]
+        if len(groups) % 2:
+            merged.append(groups[-1])
+        groups = merged
+    return groups[0] if groups else []
+
+
+def union_packed(task):
+    """Union a chunk of packed polygons in a worker, returning packed (outer, holes) rings."""
+    rings, options = task
+    rings = [unpack(r) for r in rings]
+    items = cascade([[(bounding_box(r), r, [])] for r in rings], **options)
+    return [(pack(outer), [pack(h) for h in holes]) for bbox, outer, holes in items]
+
+
+def oriented(points, counterclockwise):
+    """Return the points of a ring, reversed if needed to go the given way round."""
+    if (signed_area(points) > 0) != counterclockwise:
+        return points[::-1]
+    return points
+
+
+def union_all(polygons, workers=None, simplify=None, **kwargs):
+    """Union many polygons together.
+
+    Instead of folding each polygon into a growing result, the polygons are
+    sorted along a Z-order curve (so that neighbours are merged early) and
+    merged in pairs, in a balanced binary tree. The input is split into
+    contiguous chunks whose subtrees are merged in parallel by a pool of
+    worker processes (workers defaults to the number of CPUs; 0 runs
+    everything in the current process).
+
+    Polygons sharing edges (e.g., adjacent building footprints) are merged:
+    clips are done with perturb=True (see ring_op). So are polygons
+    touching at a single point, into a ring going twice through it.
+
+    Return a list of CompactPolygon: each outer ring of the union
+    (counter-clockwise), followed by its holes (clockwise). The polygons
+    are simplified first if simplify is given (see clip_polygon). Extra
+    keyword arguments are passed on to CompactPolygon.union.
+    """
+    if workers is None:
+        workers = cpu_count()
+
+    simplify = simplifier(simplify)
+    rings = []
+    for p in polygons:
+        if simplify is not None:
+            p = simplify(p)
+        points = clean_ring(list(getattr(p, 'points', p)))
+        if points:
+            rings.append((bounding_box(points), points, []))
+    rings = spatial_order(rings)
+
+    if not workers or len(rings) < 2 * workers:
+        groups = [[r] for r in rings]
+    else:
+        size = -(-len(rings) // workers)
+        chunks = [([pack(outer) for bbox, outer, holes in rings[k:k + size]], kwargs)
+                  for k in xrange(0, len(rings), size)]
+        pool = Pool(workers)
+        try:
+            groups = [[(bounding_box(outer), outer, holes)
+                       for outer, holes in ((unpack(o), map(unpack, h)) for o, h in packed)]
+                      for packed in pool.map(union_packed, chunks)]
+        finally:
+            pool.terminate()
+            pool.join()
+
+    result = []
+    for bbox, outer, holes in cascade(groups, **kwargs):
+        result.append(CompactPolygon(oriented(outer, True)))
+        result.extend(CompactPolygon(oriented(h, False)) for h in holes)
+    return result
+
+
+class STRTree(object):
+    """Static R-tree over bounding boxes, bulk loaded with Sort-Tile-Recursive.
+
+    Items are (bbox, value) pairs, with bounding boxes as (xmin, ymin, xmax,
+    ymax). Each level of the tree is built by sorting the nodes by the x of
+    their centers, cutting them into vertical slices, and grouping them by
+    the y of their centers within each slice, node_size nodes per parent.
+    """
+
+    def __init__(self, items, node_size=16):
+        self.node_size = node_size
+        nodes = list(items)
+        self.size = len(nodes)
+        self.height = 0
+        while len(nodes) > node_size:
+            nodes = self.pack(nodes)
+            self.height += 1
+        self.root = nodes
+
+    def __len__(self):
+        return self.size
+
+    def pack(self, nodes):
+        """Group a level of nodes into parent nodes, as (bbox, children)."""
+        size = self.node_size
+        slice_size = size * int(ceil(sqrt(-(-len(nodes) // size))))
+        nodes.sort(key=lambda node: node[0][0] + node[0][2])
+
+        parents = []
+        for start in xrange(0, len(nodes), slice_size):
+            strip = nodes[start:start + slice_size]
+            strip.sort(key=lambda node: node[0][1] + node[0][3])
+            for k in xrange(0, len(strip), size):
+                group = strip[k:k + size]
+                bbox = (min(node[0][0] for node in group), min(node[0][1] for node in group),
+                        max(node[0][2] for node in group), max(node[0][3] for node in group))
+                parents.append((bbox, group))
+        return parents
+
+    def query(self, bbox):
+        """Yield the values of the items whose bounding boxes overlap bbox."""
+        stack = [(self.root, self.height)]
+        while stack:
+            nodes, depth = stack.pop()
+            for box, payload in nodes:
+                if overlap(box, bbox):
+                    if depth:
+                        stack.append((payload, depth - 1))
+                    else:
+                        yield payload
+
+
+class Layer(object):
+    """Collection of polygons indexed by an STRTree of their bounding boxes.
+
+    The polygons are a dict of id to polygon, or a sequence (ids are then
+    the positions). Polygons are prepared (see PreparedPolygon) the first
+    time they're clipped against, and kept, so a layer can be reused
+    across many overlays. If simplify is given (see clip_polygon), the
+    polygons are simplified once, when the layer is built.
+    """
+
+    def __init__(self, polygons, node_size=16, simplify=None):
+        items = polygons.iteritems() if hasattr(polygons, 'iteritems') else enumerate(polygons)
+        simplify = simplifier(simplify)
+        self.polygons, self.bboxes, self.prepared = {}, {}, {}
+        for key, polygon in items:
+            if simplify is not None:
+                polygon = simplify(polygon)
+            points = list(getattr(polygon, 'points', polygon))
+            self.polygons[key] = points
+            self.bboxes[key] = bounding_box(points)
+        self.index = STRTree([(bbox, key) for key, bbox in self.bboxes.iteritems()], node_size)
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def query(self, bbox):
+        """Yield the ids of the polygons whose bounding boxes overlap bbox."""
+        return self.index.query(bbox)
+
+    def prepare(self, key):
+        """Return the polygon with the given id, prepared."""
+        prepared = self.prepared.get(key)
+        if prepared is None:
+            prepared = self.prepared[key] = PreparedPolygon(self.polygons[key])
+        return prepared
+
+
+def within(a, b):
+    """Test if bounding box a lies within bounding box b."""
+    return b[0] <= a[0] and a[2] <= b[2] and b[1] <= a[1] and a[3] <= b[3]
+
+
+def boundary_near(prepared, bbox):
+    """Test if any edge of a prepared polygon overlaps a bounding box."""
+    xmin, ymin, xmax, ymax = bbox
+    for b in xrange(prepared.band(ymin), prepared.band(ymax) + 1):
+        for event in prepared.bands[b]:
+            if event[0] <= xmax and event[1] >= xmin and event[2] <= ymax and event[3] >= ymin:
+                return True
+    return False
+
+
+def overlay(left, right, operation='intersection', output='polygons', simplify=None, **kwargs):
+    """Overlay two layers of polygons, clipping each pair that overlaps.
+
+    Both layers are a Layer, or polygons to build one from (a dict of id
+    to polygon, or a sequence). Only the pairs whose bounding boxes
+    overlap (found with the index of the right layer) are clipped, with
+    the left polygon as the subject. A pair whose boundaries can't cross
+    (the bounding box of the left polygon lies within the right one, and
+    no edge of the right polygon gets near it) is settled by a single
+    point-in-polygon test instead of a clip.
+
+    Yield (left_id, right_id, pieces) for each of those pairs with a
+    non-empty result, where pieces are CompactPolygon objects, or as given
+    by the output (see CompactPolygon.clip). Pairs whose bounding boxes
+    don't overlap are never visited, so they're not yielded even when
+    their result isn't empty: for union and the differences, the result
+    of such a pair (both polygons, or one of them, unchanged) is left to
+    the caller. Layers built from polygons are simplified if simplify is
+    given (see Layer). Extra keyword arguments are passed on to
+    CompactPolygon.clip.
+    """
+    if operation not in CONTAINED:
+        raise ValueError("unknown operation: %r" % operation)
+    if output not in OUTPUTS:
+        raise ValueError("unknown output: %r" % output)
+
+    if not isinstance(left, Layer):
+        left = Layer(left, simplify=simplify)
+    if not isinstance(right, Layer):
+        right = Layer(right, simplify=simplify)
+
+    for lkey, points in left.polygons.iteritems():
+        bbox = left.bboxes[lkey]
+        for rkey in right.query(bbox):
+            clipper = right.prepare(rkey)
+            relation = None
+            if within(bbox, right.bboxes[rkey]) and not boundary_near(clipper, bbox):
+                relation = 'inside' if clipper.is_inside(*points[0]) else 'disjoint'
+            else:
+                if operation == 'reversed-diff':
+                    subject = clipper.polygon()
+                    pieces = subject.difference(CompactPolygon(points), **kwargs)
+                else:
+                    subject = CompactPolygon(points)
+                    pieces = getattr(subject, operation)(clipper, **kwargs)
+
+                if pieces[0] is subject:
+                    # no intersections: one contains the other, or they're disjoint
+                    relation = contained_relation(CompactPolygon(points), clipper,
+                                                  kwargs.get('perturb'),
+                                                  operation == 'reversed-diff')
+
+            if relation is not None:
+                pieces = [CompactPolygon({'a': points, 'b': right.polygons[rkey]}[p])
+                          for p in CONTAINED[operation][relation]]
+            if not pieces:
+                continue
+
+            if output == 'points':
+                pieces = [p.points for p in pieces]
+            elif output == 'flat':
+                pieces = [p.flat() for p in pieces]
+            yield lkey, rkey, pieces
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+#
+# Efficient Clipping of Arbitrary Polygons
+#
+# Copyright (c) 2011, 2012 Helder Correia <helder.mc@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Benchmarks for the clipping algorithm
+
+Run clip_polygon over seeded, reproducible polygons of several shapes
+(convex, star, spiral and random walk), sizes and roughness (which
+drives the number of intersections), for all operations. Report the
+time, peak memory and number of intersections of each case, as a table
+and optionally as JSON, and compare against a saved baseline.
+
+Each case runs in a fresh worker process, so that peak memory can be
+measured on its own.
+
+Example:
+
+    polybench.py --save baseline.json
+    polybench.py --baseline baseline.json
+"""
+
+import json
+import math
+import random
+import resource
+import sys
+import time
+from multiprocessing import Pool
+from optparse import OptionParser
+
+from polygon import clip_polygon, find_intersections
+
+
+def convex(n, roughness, rnd):
+    """Convex polygon: points on a circle, at random angles."""
+    angles = sorted(rnd.uniform(0, 2 * math.pi) for i in xrange(n))
+    return [(math.cos(a), math.sin(a)) for a in angles]
+
+
+def star(n, roughness, rnd):
+    """Star-shaped polygon: points alternating between two radii."""
+    inner = 1.0 - 0.9 * roughness
+    return [(r * math.cos(a), r * math.sin(a))
+            for r, a in ((1.0 if i % 2 else inner, 2 * math.pi * i / n) for i in xrange(n))]
+
+
+def spiral(n, roughness, rnd):
+    """Spiral band: out along one arm, and back in along the other.
+
+    The inner arm stays between the center and the outer one, so the band
+    narrows near the center instead of crossing itself, and each turn has
+    at least 8 points per arm, so that its edges don't cut across it.
+    """
+    half = n // 2
+    turns = min(1 + 4 * roughness, half / 8.0)
+    out, back = [], []
+    for i in xrange(half):
+        a = 2 * math.pi * turns * i / half
+        r = 0.1 + 0.9 * i / half
+        out.append((r * math.cos(a), r * math.sin(a)))
+        r = max(r - 0.45 / turns, r / 2)
+        back.append((r * math.cos(a), r * math.sin(a)))
+    return out + back[::-1]
+
+
+def random_walk(n, roughness, rnd):
+    """Star-shaped polygon whose radius follows a random walk around the center."""
+    r, points = 0.75, []
+    for i in xrange(n):
+        r = min(1.0, max(0.2, r + rnd.gauss(0, 0.3 * roughness + 0.01)))
+        a = 2 * math.pi * i / n
+        points.append((r * math.cos(a), r * math.sin(a)))
+    return points
+
+
+SHAPES = {
+    'convex': convex,
+    'star': star,
+    'spiral': spiral,
+    'random-walk': random_walk,
+}
+
+OPERATIONS = ['union', 'intersection', 'difference', 'reversed-diff']
+
+
+def generate(shape, n, roughness, seed, dx=0.0, dy=0.0):
+    """Generate a seeded polygon with n vertices, translated by (dx, dy)."""
+    rnd = random.Random("%s-%d-%s-%d" % (shape, n, roughness, seed))
+    return [(x + dx, y + dy) for x, y in SHAPES[shape](n, roughness, rnd)]
+
+
+def run_case(case):
+    """Run a benchmark case (in a worker process) and return its results."""
+    shape, n, m, roughness, operation, engine, repeat = case
+    subject = generate(shape, n, roughness, 1)
+    clipper = generate(shape, m, roughness, 2, 0.5, 0.3)
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = None
+    for k in xrange(repeat):
+        start = time.time()
+        clipped = clip_polygon(subject, clipper, operation, engine=engine, cache=False)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+    return {
+        'case': "%s-%dx%d-%s-%s" % (shape, n, m, roughness, operation),
+        'time': best,
+        'memory': peak,
+        'intersections': len(find_intersections(subject, clipper, engine)),
+        'pieces': len(clipped),
+    }
+
+
+def run(cases):
+    """Run each case in a fresh worker process, yielding the results."""
+    pool = Pool(1, maxtasksperchild=1)
+    try:
+        for result in pool.imap(run_case, cases):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def compare(result, baseline, threshold):
+    """Return the time ratio to the baseline and whether it's a regression."""
+    base = baseline.get(result['case'])
+    if not base or not base['time']:
+        return None, False
+    ratio = result['time'] / base['time']
+    return ratio, ratio > 1 + threshold
+
+
+class Arguments(object):
+    """Define and parse command line arguments."""
+
+    def __init__(self, *args, **kwargs):
+        self.parser = OptionParser(*args, **kwargs)
+
+        self.add_option("--shapes", default=",".join(sorted(SHAPES)),
+                        help="comma separated shapes to run [default: %default]")
+        self.add_option("--sizes", default="100x100,1000x100,1000x1000",
+                        help="comma separated subject x clipper vertex counts [default: %default]")
+        self.add_option("--roughness", default="0.1,0.9",
+                        help="comma separated roughness levels, from 0 to 1; rougher "
+                             "polygons have more intersections [default: %default]")
+        self.add_option("--operations", default=",".join(OPERATIONS),
+                        help="comma separated operations [default: %default]")
+        self.add_option("--engine", default=None,
+                        help="intersection engine (see polygon.ENGINES)")
+        self.add_option("--repeat", type="int", default=3,
+                        help="runs per case, the best time is kept [default: %default]")
+        self.add_option("--json", metavar="FILE",
+                        help="write the results as JSON to FILE ('-' for standard output)")
+        self.add_option("--save", metavar="FILE",
+                        help="save the results as a baseline to FILE")
+        self.add_option("--baseline", metavar="FILE",
+                        help="compare the results against a baseline in FILE")
+        self.add_option("--threshold", type="float", default=0.1,
+                        help="relative slowdown reported as a regression [default: %default]")
+
+    def add_option(self, *args, **kwargs):
+        self.parser.add_option(*args, **kwargs)
+
+    def parse_args(self, args):
+        options, args = self.parser.parse_args(args)
+
+        options.shapes = options.shapes.split(',')
+        for shape in options.shapes:
+            if shape not in SHAPES:
+                self.parser.error("unknown shape: %s" % shape)
+
+        try:
+            options.sizes = [tuple(int(v) for v in s.split('x')) for s in options.sizes.split(',')]
+            options.roughness = [float(r) for r in options.roughness.split(',')]
+        except ValueError:
+            self.parser.error("invalid sizes or roughness")
+
+        options.operations = options.operations.split(',')
+        for operation in options.operations:
+            if operation not in OPERATIONS:
+                self.parser.error("unknown operation: %s" % operation)
+
+        return options, args
+
+
+if __name__ == '__main__':
+    options = Arguments().parse_args(sys.argv[1:])[0]
+
+    baseline = {}
+    if options.baseline:
+        for result in json.load(open(options.baseline)):
+            baseline[result['case']] = result
+
+    cases = [(shape, n, m, roughness, operation, options.engine, options.repeat)
+             for shape in options.shapes
+             for n, m in options.sizes
+             for roughness in options.roughness
+             for operation in options.operations]
+
+    # the table is left out when the JSON goes to standard output
+    table = options.json != '-'
+    if table:
+        print "%-42s %10s %10s %8s %6s %8s" % ("case", "time (s)", "peak (KB)", "inters.", "pieces", "vs base")
+    results, regressions = [], 0
+    for result in run(cases):
+        results.append(result)
+        ratio, regression = compare(result, baseline, options.threshold)
+        regressions += regression
+        if not table:
+            continue
+        print "%-42s %10.4f %10d %8d %6d %8s%s" % (
+            result['case'], result['time'], result['memory'],
+            result['intersections'], result['pieces'],
+            '%.2fx' % ratio if ratio else '-',
+            ' REGRESSION' if regression else '')
+        sys.stdout.flush()
+
+    if options.json:
+        output = sys.stdout if options.json == '-' else open(options.json, 'w')
+        json.dump(results, output, indent=2)
+        output.write('\n')
+
+    if options.save:
+        json.dump(results, open(options.save, 'w'), indent=2)
+
+    if baseline:
+        summary = "%d regression(s) over %d%% against %s" % (
+            regressions, options.threshold * 100, options.baseline)
+        if table:
+            print
+            print summary
+        else:
+            sys.stderr.write(summary + '\n')
+        sys.exit(1 if regressions else 0)
@@ -23,16 +23,18 @@
 
 Demonstrate the algorithm from Günther/Greiner with OpenGL.
 
+There's also a headless batch mode, which doesn't need OpenGL, to clip
+a stream of GeoJSON or WKT polygons against a fixed clipper.
+
 You should have received the README file along with this program.
 If not, see <https://github.com/helderco/polyclip>
 """
 
 
-import OpenGL
-OpenGL.ERROR_ON_COPY = True
-from OpenGL.GL import *
-from OpenGL.GLU import *
-from OpenGL.GLUT import *
+import json
+import re
+import sys
+from array import array
 
 from polygon import *
 from optparse import OptionParser, OptionGroup, OptionValueError
@@ -45,15 +47,128 @@ cpoly = [(5.0, 4.5), (3.0, 5.5), (1.0, 4.0), (1.5, 3.5),
          (0.0, 2.0), (3.0, 2.3), (2.5, 1.0), (5.5, 0.0)]
 
 
+def import_opengl():
+    """Import OpenGL into the module namespace.
+
+    This is only done when the graphic window is needed, so the batch mode
+    starts fast and works on systems without OpenGL or a display.
+    """
+    import OpenGL
+    OpenGL.ERROR_ON_COPY = True
+    from OpenGL import GL, GLU, GLUT
+
+    for module in (GL, GLU, GLUT):
+        for name in dir(module):
+            if not name.startswith('_'):
+                globals()[name] = getattr(module, name)
+
+
+OPERATIONS = ['difference', 'union', 'intersection', 'reversed-diff']
+
+
+def tessellate(rings):
+    """Triangulate polygons with the GLU tessellator (odd winding rule).
+
+    All rings are tessellated together, so rings inside others are holes.
+    Return the vertices of the triangles, as an array of x, y pairs
+    (array('f')).
+    """
+    triangles = array('f')
+
+    def vertex(point):
+        triangles.extend(point)
+
+    def combine(coords, data, weights):
+        return coords[0], coords[1]
+
+    def error(code):
+        raise RuntimeError("tessellation failed: %s" % gluErrorString(code))
+
+    tess = gluNewTess()
+    try:
+        gluTessProperty(tess, GLU_TESS_WINDING_RULE, GLU_TESS_WINDING_ODD)
+        gluTessCallback(tess, GLU_TESS_BEGIN, lambda type: None)
+        gluTessCallback(tess, GLU_TESS_EDGE_FLAG, lambda flag: None)  # triangles only
+        gluTessCallback(tess, GLU_TESS_VERTEX, vertex)
+        gluTessCallback(tess, GLU_TESS_COMBINE, combine)
+        gluTessCallback(tess, GLU_TESS_END, lambda: None)
+        gluTessCallback(tess, GLU_TESS_ERROR, error)
+
+        gluTessBeginPolygon(tess, None)
+        for points in rings:
+            gluTessBeginContour(tess)
+            for x, y in points:
+                gluTessVertex(tess, (x, y, 0.0), (x, y))
+            gluTessEndContour(tess)
+        gluTessEndPolygon(tess)
+    finally:
+        gluDeleteTess(tess)
+
+    return triangles
+
+
+class Mesh(object):
+    """Vertices uploaded once to a vertex buffer object, and drawn from it.
+
+    The vertices (an array('f') of x, y pairs) are drawn in the given mode,
+    as one primitive for each (first, count) range.
+    """
+
+    def __init__(self, vertices, mode, ranges=None):
+        self.mode = mode
+        self.ranges = ranges if ranges is not None else [(0, len(vertices) // 2)]
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, len(vertices) * vertices.itemsize,
+                     vertices.tostring(), GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    @classmethod
+    def fill(cls, rings):
+        """Mesh for the inside of polygons, tessellated into triangles."""
+        return cls(tessellate(rings), GL_TRIANGLES)
+
+    @classmethod
+    def outline(cls, rings):
+        """Mesh for the border lines of polygons, one line loop per ring."""
+        vertices, ranges = array('f'), []
+        for points in rings:
+            ranges.append((len(vertices) // 2, len(points)))
+            for x, y in points:
+                vertices.append(x)
+                vertices.append(y)
+        return cls(vertices, GL_LINE_LOOP, ranges)
+
+    def draw(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, None)
+        for first, count in self.ranges:
+            glDrawArrays(self.mode, first, count)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        glDeleteBuffers(1, (GLuint * 1)(self.buffer))
+
+
 class Graphics(object):
-    """Use the algorithm by Günther/Greiner with OpenGL."""
+    """Use the algorithm by Günther/Greiner with OpenGL.
+
+    The polygons are tessellated and uploaded to vertex buffer objects
+    only when they (or the operation) change; every redisplay is drawn
+    from the buffers.
+    """
 
     def __init__(self, options, default_subject=[], default_clipper=[]):
         self.options = options
         self.subject_polygon = options.subj_poly or default_subject
         self.clipper_polygon = options.clip_poly or default_clipper
+        self.cache = ClipCache(maxsize=8)
+        self.meshes = None
 
     def run(self, title):
+        import_opengl()
         glutInit(sys.argv)
         glutInitDisplayMode(GLUT_SINGLE | GLUT_RGB | GLUT_DEPTH)
 
@@ -80,41 +195,74 @@ class Graphics(object):
         glShadeModel(GL_SMOOTH)
 
     def key(self, k, x, y):
-        """Allows exiting upon Esc."""
+        """Allows exiting upon Esc, and switching the operation with o."""
         if ord(k) == 27: # Esc key
             sys.exit(0)
-
-    def draw(self):
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        if k == 'o' and not self.options.original:
+            operation = OPERATIONS.index(self.options.operation) + 1
+            self.update(operation=OPERATIONS[operation % len(OPERATIONS)])
+
+    def update(self, subject=None, clipper=None, operation=None):
+        """Change the polygons or the operation, rebuilding the buffers on the next redisplay."""
+        if subject is not None:
+            self.subject_polygon = subject
+        if clipper is not None:
+            self.clipper_polygon = clipper
+        if operation is not None:
+            self.options.operation = operation
+            print "Operation:", operation
+
+        if self.meshes is not None:
+            for color, mesh in self.meshes:
+                mesh.delete()
+        self.meshes = None
+        glutPostRedisplay()
+
+    def build(self):
+        """Clip the polygons and return the meshes to draw, as (color, mesh) pairs."""
+        meshes = []
 
         if not self.options.original:
-            glColor3f(0.5, 0.5, 1.0)
-            clipped = clip_polygon(self.subject_polygon, self.clipper_polygon, self.options.operation)
+            stats = ClipStats() if self.options.debug else None
+            clipped = clip_polygon(self.subject_polygon, self.clipper_polygon,
+                                   self.options.operation, cache=self.cache,
+                                   stats=stats, output='points',
+                                   perturb=self.options.perturb)
 
-            for poly in clipped:
-                if self.options.debug:
-                    print poly
-                self.draw_polygon(poly.points)
+            if self.options.debug:
+                print stats
+                print self.cache
+                for points in clipped:
+                    print points
+
+            meshes.append(((0.5, 0.5, 1.0), self.mesh(clipped)))
 
         if self.options.original or self.options.clipper or self.options.subject:
             self.options.wireframe |= self.options.clipper | self.options.subject
             m = 0.0 if self.options.clipper and not self.options.wireframe else 0.5
 
             if self.options.original or self.options.clipper:
-                glColor3f(1.0, 1.0 * m, 1.0 * m)
-                self.draw_polygon(self.clipper_polygon)
+                meshes.append(((1.0, 1.0 * m, 1.0 * m), self.mesh([self.clipper_polygon])))
 
             if self.options.original or self.options.subject:
-                glColor3f(1.0 * m, 1.0 * m, 1.0)
-                self.draw_polygon(self.subject_polygon)
+                meshes.append(((1.0 * m, 1.0 * m, 1.0), self.mesh([self.subject_polygon])))
 
-        glFlush()
+        return meshes
+
+    def mesh(self, rings):
+        return Mesh.outline(rings) if self.options.wireframe else Mesh.fill(rings)
 
-    def draw_polygon(self, points):
-        glBegin(GL_LINE_LOOP if self.options.wireframe else GL_POLYGON)
-        for x, y in points:
-            glVertex2f(x, y)
-        glEnd()
+    def draw(self):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+        if self.meshes is None:
+            self.meshes = self.build()
+
+        for color, mesh in self.meshes:
+            glColor3f(*color)
+            mesh.draw()
+
+        glFlush()
 
     # new window size or exposure
     def reshape(self, width, height):
@@ -129,6 +277,148 @@ class Graphics(object):
         glTranslatef(ox, oy, oz)
 
 
+WKT_POLYGON = re.compile(r'\(\s*(\([^()]*\))')
+WKT_RING = re.compile(r'\([^()]*\)')
+WKT_POINT = re.compile(r'([-+.\deE]+)\s+([-+.\deE]+)')
+
+
+def parse_geometry(text):
+    """Parse a GeoJSON or WKT polygon (or multipolygon).
+
+    Return (format, rings, properties), where format is 'geojson' or 'wkt',
+    rings is a list with the exterior ring of each polygon and properties
+    are those of a GeoJSON feature, if any. Polygons with holes aren't
+    supported, and raise ValueError, as do other geometry types.
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        geometry, properties = json.loads(text), None
+        if geometry.get('type') == 'Feature':
+            geometry, properties = geometry['geometry'], geometry.get('properties')
+
+        if geometry['type'] == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            raise ValueError("unsupported geometry type: %s" % geometry['type'])
+        if any(len(p) > 1 for p in polygons):
+            raise ValueError("polygons with holes are not supported")
+
+        rings = [[(float(x), float(y)) for x, y in p[0]] for p in polygons]
+        return 'geojson', [open_ring(r) for r in rings], properties
+
+    kind = text.split('(', 1)[0].strip().upper()
+    if kind not in ('POLYGON', 'MULTIPOLYGON'):
+        raise ValueError("unsupported geometry type: %s" % kind)
+
+    # the exterior ring is the first one after each opening parenthesis;
+    # any other ring is a hole
+    rings = [[(float(x), float(y)) for x, y in WKT_POINT.findall(r)]
+             for r in WKT_POLYGON.findall(text)]
+    if len(WKT_RING.findall(text)) > len(rings):
+        raise ValueError("polygons with holes are not supported")
+    return 'wkt', [open_ring(r) for r in rings if r], None
+
+
+def open_ring(points):
+    """Remove the closing point of a ring, if it repeats the first one."""
+    if len(points) > 1 and points[0] == points[-1]:
+        return points[:-1]
+    return points
+
+
+def close_ring(points):
+    """Add the closing point to a ring, if missing."""
+    if points and points[0] != points[-1]:
+        return points + points[:1]
+    return points
+
+
+def format_geometry(format, rings, properties=None):
+    """Format a list of rings as a GeoJSON or WKT multipolygon (see parse_geometry)."""
+    rings = [close_ring(r) for r in rings]
+    if format == 'wkt':
+        if not rings:
+            return 'MULTIPOLYGON EMPTY'
+        return 'MULTIPOLYGON (%s)' % ', '.join(
+            '((%s))' % ', '.join('%r %r' % p for p in r) for r in rings)
+
+    geometry = {'type': 'MultiPolygon', 'coordinates': [[r] for r in rings]}
+    if properties is not None:
+        geometry = {'type': 'Feature', 'geometry': geometry, 'properties': properties}
+    return json.dumps(geometry)
+
+
+class Batch(object):
+    """Clip a stream of polygons against a fixed clipper, without OpenGL.
+
+    Each line of input is a GeoJSON (geometry or feature) or WKT polygon
+    or multipolygon. Results are written, one line per input line and in
+    the same format, as soon as each is ready. Lines that can't be clipped
+    (e.g., polygons with holes) are reported on standard error, and
+    skipped.
+    """
+
+    def __init__(self, options, default_clipper=[]):
+        self.options = options
+        self.clipper = PreparedPolygon(options.clip_poly or default_clipper)
+        self.stats = ClipStats() if options.debug else None
+
+    def run(self, files):
+        for name in files or ['-']:
+            input = sys.stdin if name == '-' else open(name)
+            try:
+                for number, line in enumerate(input):
+                    if not line.strip():
+                        continue
+                    try:
+                        format, rings, properties = parse_geometry(line)
+                    except (ValueError, KeyError, TypeError), e:
+                        sys.stderr.write("%s:%d: skipped: %s\n" % (name, number + 1, e))
+                        continue
+
+                    sys.stdout.write(format_geometry(format, self.clip(rings), properties))
+                    sys.stdout.write('\n')
+                    sys.stdout.flush()
+            finally:
+                if input is not sys.stdin:
+                    input.close()
+
+        if self.stats is not None:
+            sys.stderr.write(repr(self.stats))
+
+    def clip(self, rings):
+        """Clip each ring against the clipper, returning the pieces as lists of points.
+
+        Rings whose boundary doesn't cross the clipper's are settled with
+        a point-in-polygon test (see CONTAINED). Results aren't cached, as
+        a stream doesn't repeat itself.
+        """
+        operation, perturb = self.options.operation, self.options.perturb
+        clipped = []
+        for ring in rings:
+            subject = CompactPolygon(ring)
+            if operation == 'reversed-diff':
+                first = self.clipper.polygon()
+                pieces = first.difference(subject, stats=self.stats, perturb=perturb)
+            else:
+                first = subject
+                pieces = getattr(subject, operation)(self.clipper, stats=self.stats,
+                                                     perturb=perturb)
+
+            if pieces and pieces[0] is first:
+                # no intersections: one contains the other, or they're disjoint
+                points = subject.points
+                relation = contained_relation(subject, self.clipper, perturb,
+                                              operation == 'reversed-diff')
+                clipped.extend({'a': points, 'b': list(self.clipper.points)}[p]
+                               for p in CONTAINED[operation][relation])
+            else:
+                clipped.extend(p.points for p in pieces)
+        return clipped
+
+
 class Arguments(object):
     """Define and parse command line arguments."""
 
@@ -150,6 +440,15 @@ class Arguments(object):
         self.add_option("-d", "--debug",
                         action="store_true", default=False, dest="debug",
                         help="show debug information on screen")
+        self.add_option("-p", "--perturb",
+                        action="store_true", default=False, dest="perturb",
+                        help="decide degenerate cases (polygons sharing edges or "
+                             "vertices) by perturbation")
+        self.add_option("-b", "--batch",
+                        action="store_true", default=False, dest="batch",
+                        help="clip GeoJSON or WKT polygons, one per line, from FILES "
+                             "(or standard input) against the clipper polygon, "
+                             "writing results to standard output (no OpenGL)")
 
         oper = OptionGroup(self.parser, "Available Operations")
 
@@ -182,7 +481,8 @@ class Arguments(object):
             """This program is provided as a demo, but you can override the pre-
             defined polygons without editing the file by using these options.
             POLY needs to be a string with pairs of floats (representing the
-            the x and y coordinates of the vertexes), separated by semi-colons.
+            the x and y coordinates of the vertexes), separated by semi-colons,
+            or a GeoJSON or WKT polygon.
 
             Example: %s --subj-poly="1.5,1.25;7.5,2.5;4,3;4.5,6.5"
             """ % sys.argv[0])
@@ -198,16 +498,34 @@ class Arguments(object):
     def set_polygon(self, option, opt_str, value, parser):
         poly = parse_polygon(value)
 
+        if not poly:
+            try:
+                poly = parse_geometry(value)[1][0]
+            except ValueError, e:
+                raise OptionValueError("invalid polygon on option %s: %s." % (opt_str, e))
+            except (KeyError, TypeError, IndexError):
+                pass
+
         if not poly:
             raise OptionValueError("invalid syntax for polygon definition on option %s." % opt_str)
 
         setattr(parser.values, option.dest, poly)
 
     def parse_args(self, args):
-        return self.parser.parse_args(args)
+        options, args = self.parser.parse_args(args)
+        if options.batch and options.subj_poly:
+            self.parser.error("--subj-poly can't be used with --batch: "
+                              "the subjects are read from FILES")
+        return options, args
 
 
 if __name__ == '__main__':
+    options, args = Arguments(usage="%prog [options] [FILES]", epilog="\n").parse_args(sys.argv[1:])
+
+    if options.batch:
+        Batch(options, cpoly).run(args)
+        sys.exit(0)
+
     print
     print "Efficient Clipping of Arbitrary Polygons using OpenGPL"
     print
@@ -217,8 +535,8 @@ if __name__ == '__main__':
     print "it under certain conditions; see source for details."
     print
     print "Run with -h or --help for available options."
+    print "Press o to switch the operation."
     print "Press Esc to exit graphic window."
     print
 
-    options = Arguments(epilog="\n").parse_args(sys.argv[1:])[0]
     Graphics(options, spoly, cpoly).run(title="Polygon Clipping")
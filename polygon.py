@@ -30,6 +30,114 @@ You should have received the README file along with this program.
 If not, see <https://github.com/helderco/polyclip>
 """
 
+from __future__ import with_statement
+
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from heapq import heapify, heappush, heappop, merge
+from itertools import islice, izip
+from math import hypot
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ClipStats(object):
+    """Counters and timings collected by clip, when given a stats object.
+
+    The same object can be given to many clips, to add them up. If a
+    callback is set, it's called with the stats at the end of each clip.
+    """
+
+    PHASES = ('intersections', 'labelling', 'construction')
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.clips = 0          # number of clips
+        self.times = dict.fromkeys(self.PHASES, 0.0)  # seconds spent in each phase
+        self.pairs = 0          # edge pairs tested for intersections
+        self.intersections = 0  # intersections inserted (in each polygon)
+        self.degeneracies = 0   # degenerate cases (touching or collinear edges)
+        self.walked = 0         # vertices walked by insertions to sort intersections
+        self.vertices = 0       # vertices allocated (intersections and results)
+        self.last = None
+
+    def start(self):
+        """Start timing a clip."""
+        self.last = time.time()
+
+    def lap(self, phase):
+        """Add the time since the last lap (or start) to the given phase."""
+        now = time.time()
+        self.times[phase] += now - self.last
+        self.last = now
+
+    def done(self):
+        """Finish a clip, calling the callback if set."""
+        self.clips += 1
+        if self.callback is not None:
+            self.callback(self)
+
+    def __repr__(self):
+        """Report of the collected stats, for debugging purposes."""
+        out = "%d clip(s)\n" % self.clips
+        for phase in self.PHASES:
+            out += "  %-14s %.6fs\n" % (phase, self.times[phase])
+        for name in ('pairs', 'intersections', 'degeneracies', 'walked', 'vertices'):
+            out += "  %-14s %d\n" % (name, getattr(self, name))
+        return out
+
+
+class ClipMetrics(object):
+    """Measures of the polygons resulting from a clip, without the polygons.
+
+    Returned by CompactPolygon.clip with output 'metrics', and by
+    clip_metrics. The pieces are counted as they would be returned by the
+    clip (holes are separate pieces), but the area is that of the result:
+    the area of holes is subtracted. The bounding box is (xmin, ymin,
+    xmax, ymax), or None when there are no pieces.
+    """
+
+    def __init__(self, intersections=0):
+        self.intersections = intersections  # intersections found by the clip
+        self.pieces = 0         # number of resulting polygons
+        self.area = 0.0         # total area
+        self.perimeter = 0.0    # total length of the boundaries
+        self.bbox = None
+
+    def add(self, area, perimeter, bbox):
+        """Add a piece, given its area (negative for a hole), perimeter and bounding box."""
+        self.pieces += 1
+        self.area += area
+        self.perimeter += perimeter
+        if self.bbox is None:
+            self.bbox = bbox
+        else:
+            self.bbox = (min(self.bbox[0], bbox[0]), min(self.bbox[1], bbox[1]),
+                         max(self.bbox[2], bbox[2]), max(self.bbox[3], bbox[3]))
+
+    def add_points(self, points, hole=False):
+        """Add a whole polygon as a piece, given as a list of points, or a hole in one."""
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        area = abs(signed_area(points))
+        self.add(-area if hole else area,
+                 sum(hypot(x2 - x1, y2 - y1) for x1, y1, x2, y2 in edges(points)),
+                 (min(xs), min(ys), max(xs), max(ys)))
+
+    @property
+    def empty(self):
+        return not self.pieces
+
+    def __repr__(self):
+        """Report of the measures, for debugging purposes."""
+        return "%d piece(s), area %r, perimeter %r, bbox %r\n" % (
+            self.pieces, self.area, self.perimeter, self.bbox)
+
 
 class Vertex(object):
     """Node in a circular doubly linked list.
@@ -56,18 +164,13 @@ class Vertex(object):
 
         This function calculates the "winding" number for a point, which
         represents the number of times a ray emitted from the point to
-        infinity intersects any edge of the polygon.
+        infinity intersects any edge of the polygon (see is_inside_points).
 
         An even winding number means the point lies OUTSIDE the polygon;
         an odd number means it lies INSIDE it.
         """
-        winding_number = 0
-        infinity = Vertex((1000000, self.y))
-        for q in poly.iter():
-            if not q.intersect and intersect(self, infinity, q, poly.next(q.next)):
-                winding_number += 1
-
-        return (winding_number % 2) != 0
+        return is_inside_points([(q.x, q.y) for q in poly.iter() if not q.intersect],
+                                self.x, self.y)
 
     def setChecked(self):
         self.checked = True
@@ -114,16 +217,20 @@ class Polygon(object):
         the original polygon). If there are multiple intersection points
         between the two vertices, then the new vertex is inserted based on
         its alpha value.
+
+        Return the number of vertices walked to find the insertion point.
         """
-        curr = start
+        curr, steps = start, 0
         while curr != end and curr.alpha < vertex.alpha:
             curr = curr.next
+            steps += 1
 
         vertex.next = curr
         prev = curr.prev
         vertex.prev = prev
         prev.next = vertex
         curr.prev = vertex
+        return steps
 
     def next(self, v):
         """Return the next non intersecting vertex after the one specified."""
@@ -160,16 +267,342 @@ class Polygon(object):
                 return True
         return False
 
-    def union(self, clip):
-        return self.clip(clip, False, False)
+    def contains(self, points):
+        """Test if many points lie inside the polygon, with a PointIndex built for them."""
+        return PointIndex([(v.x, v.y) for v in self.iter() if not v.intersect]).contains(points)
+
+    def union(self, clip, **kwargs):
+        return self.clip(clip, False, False, **kwargs)
+
+    def intersection(self, clip, **kwargs):
+        return self.clip(clip, True, True, **kwargs)
+
+    def difference(self, clip, **kwargs):
+        return self.clip(clip, False, True, **kwargs)
+
+    def clip(self, clip, s_entry, c_entry, engine=None, stats=None, perturb=False):
+        """Clip this polygon using another one as a clipper.
+
+        The clip is done by CompactPolygon.clip, on compact copies of both
+        polygons, which are left untouched; see there for the arguments.
+        Return a list of Polygon objects, or a list with this polygon if the
+        boundaries don't cross.
+        """
+        subject = CompactPolygon.from_polygon(self)
+        if isinstance(clip, Polygon):
+            clip = CompactPolygon.from_polygon(clip)
+        else:
+            clip = compact(clip)
+
+        clipped = subject.clip(clip, s_entry, c_entry, engine, stats, perturb=perturb)
+        if clipped[0] is subject:
+            return [self]
+        return [poly.to_polygon() for poly in clipped]
+
+    def __repr__(self):
+        """String representation of the polygon for debugging purposes."""
+        count, out = 1, "\n"
+        for s in self.iter():
+            out += "%02d: %s\n" % (count, str(s))
+            count += 1
+        return out
+
+    def iter(self):
+        """Iterator generator for this doubly linked list."""
+        s = self.first
+        while True:
+            yield s
+            s = s.next
+            if s == self.first:
+                return
+
+    def show_points(self):
+        """Draw points in screen for debugging purposes. Depends on OpenGL."""
+        glBegin(GL_POINTS)
+        for s in self.iter():
+            glVertex2f(s.x, s.y)
+        glEnd()
+
+# what CompactPolygon.clip may return the resulting polygons as
+OUTPUTS = ('polygons', 'points', 'flat')
+
+# bit flags for the vertices of a CompactPolygon
+INTERSECT = 1   # vertex is an intersection
+ENTRY = 2       # intersection is an entry point
+CHECKED = 4     # vertex has been checked (last phase)
+
+
+class PointsView(object):
+    """Read-only sequence of the first n points of two coordinate arrays, as (x, y) tuples.
+
+    Used to give the vertices of a CompactPolygon to the engines, without
+    a list of tuples: each tuple is built when it's read, and engines that
+    know about views read the arrays directly (see coordinates).
+    """
+
+    __slots__ = ('xs', 'ys', 'n')
+
+    def __init__(self, xs, ys, n=None):
+        self.xs = xs
+        self.ys = ys
+        self.n = len(xs) if n is None else n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            k = slice(*k.indices(self.n))
+            return zip(self.xs[k], self.ys[k])
+        if k < 0:
+            k += self.n
+        if not 0 <= k < self.n:
+            raise IndexError("point index out of range")
+        return self.xs[k], self.ys[k]
+
+    def __iter__(self):
+        if len(self.xs) == self.n:
+            return izip(self.xs, self.ys)
+        return izip(islice(self.xs, self.n), islice(self.ys, self.n))
+
+
+class CompactPolygon(object):
+    """Polygon stored as a struct of arrays instead of linked Vertex objects.
+
+    Each vertex is an index into parallel arrays: float64 coordinates and
+    alphas, int32 next/prev/neighbour indexes (neighbours index into the
+    partner polygon of the last clip) and a byte of bit flags (INTERSECT,
+    ENTRY, CHECKED). This takes a few dozen bytes per vertex, where a
+    Vertex object with its __dict__ takes several hundred.
+
+    The Polygon interface (first, iter, next, points, union, ...) is kept,
+    with vertices returned as VertexView objects over the arrays.
+    """
+
+    def __init__(self, points=()):
+        xs, ys = [], []
+        for x, y in points:
+            xs.append(x)
+            ys.append(y)
+
+        self.set_coordinates(array('d', xs), array('d', ys))
+
+    def set_coordinates(self, xs, ys):
+        """Replace all the vertices with the given coordinate arrays, as a new ring."""
+        n = len(xs)
+        self.xs = xs
+        self.ys = ys
+        self.alphas = array('d', [0.0]) * n
+        self.nexts = array('i', xrange(1, n + 1))
+        self.prevs = array('i', xrange(-1, n - 1))
+        self.neighbours = array('i', [-1]) * n
+        self.flags = array('B', [0]) * n
+        self.head = 0
+        self.partner = None
+        self.prepared = None
+
+        if n:
+            self.nexts[-1] = 0
+            self.prevs[0] = n - 1
+
+    @classmethod
+    def from_buffer(cls, data):
+        """Create a polygon from a buffer of float64 x, y pairs (native byte order).
+
+        The coordinates are copied straight from the buffer into the arrays,
+        without creating a Python object per point.
+        """
+        flat = array('d')
+        flat.fromstring(data)
+
+        poly = cls()
+        poly.set_coordinates(flat[0::2], flat[1::2])
+        return poly
+
+    @classmethod
+    def from_polygon(cls, poly):
+        """Create a compact copy of a Polygon (only coordinates are copied)."""
+        return cls(poly.points)
+
+    def copy(self):
+        """Return a copy of the polygon (the arrays are copied)."""
+        poly = CompactPolygon.__new__(CompactPolygon)
+        for name in ('xs', 'ys', 'alphas', 'nexts', 'prevs', 'neighbours', 'flags'):
+            setattr(poly, name, getattr(self, name)[:])
+        poly.head = self.head
+        poly.partner = self.partner
+        poly.prepared = self.prepared
+        return poly
+
+    def to_polygon(self):
+        """Create a Polygon of Vertex objects with the same points."""
+        poly = Polygon()
+        for p in self.points:
+            poly.add(Vertex(p))
+        return poly
+
+    def append(self, x, y, alpha=0.0, flags=0):
+        """Append an unlinked vertex to the arrays and return its index."""
+        self.xs.append(x)
+        self.ys.append(y)
+        self.alphas.append(alpha)
+        self.nexts.append(-1)
+        self.prevs.append(-1)
+        self.neighbours.append(-1)
+        self.flags.append(flags)
+        return len(self.xs) - 1
+
+    def add(self, vertex):
+        """Add a vertex to the polygon (vertex is added at the 'end' of the list)."""
+        if isinstance(vertex, (Vertex, VertexView)):
+            vertex = (vertex.x, vertex.y)
+
+        self.prepared = None
+        k = self.append(*vertex)
+        if k == 0:
+            self.nexts[k] = self.prevs[k] = self.head = k
+        else:
+            nexts, prevs = self.nexts, self.prevs
+            prev = prevs[self.head]
+            nexts[k], prevs[k] = self.head, prev
+            nexts[prev] = prevs[self.head] = k
+
+    def link(self, k, start, end):
+        """Link vertex k between start and end, sorted by alpha (like Polygon.insert).
+
+        Return the number of vertices walked to find the insertion point.
+        """
+        nexts, prevs, alphas = self.nexts, self.prevs, self.alphas
+        alpha = alphas[k]
+        curr, steps = start, 0
+        while curr != end and alphas[curr] < alpha:
+            curr = nexts[curr]
+            steps += 1
+
+        prev = prevs[curr]
+        nexts[k], prevs[k] = curr, prev
+        nexts[prev] = prevs[curr] = k
+        return steps
+
+    def ring(self):
+        """Iterate over the vertex indexes, in order, starting at the head."""
+        nexts = self.nexts
+        k = self.head
+        while True:
+            yield k
+            k = nexts[k]
+            if k == self.head:
+                return
+
+    def originals(self):
+        """Return the indexes and points of the vertices that aren't intersections, in order.
+
+        The points are a PointsView: over the arrays of the polygon, if it
+        has no intersections (its vertices are in order in the arrays), or
+        over copies of them.
+        """
+        xs, ys, flags = self.xs, self.ys, self.flags
+        n = len(xs)
+        if self.prepared is not None and n == len(self.prepared.points):
+            return xrange(n), self.prepared.points
+        if self.head == 0 and flags.count(0) == n:
+            return xrange(n), PointsView(xs, ys, n)
+
+        idx = array('i', (k for k in self.ring() if not flags[k] & INTERSECT))
+        return idx, PointsView(array('d', (xs[k] for k in idx)), array('d', (ys[k] for k in idx)))
+
+    def intersections(self, idx, groups):
+        """Return the indexes of the intersection vertices, in order.
+
+        Only the edges in groups (a dict of edge index to the intersections
+        added on it by clip) are walked, unless there are intersections left
+        from an earlier clip.
+        """
+        flags, nexts = self.flags, self.nexts
+        if len(idx) + sum(len(g) for g in groups.itervalues()) < len(flags):
+            return [k for k in self.ring() if flags[k] & INTERSECT]
+
+        order = []
+        for i in sorted(groups):
+            k = nexts[idx[i]]
+            while flags[k] & INTERSECT:
+                order.append(k)
+                k = nexts[k]
+        return order
+
+    def is_inside(self, x, y):
+        """Test if a point lies inside the polygon (odd-even rule, as Vertex.isInside).
+
+        The index of a prepared polygon is used, if this is a copy of one.
+        """
+        if self.prepared is not None:
+            return self.prepared.is_inside(x, y)
+        return is_inside_points(self.originals()[1], x, y)
 
-    def intersection(self, clip):
-        return self.clip(clip, True, True)
+    def contains(self, points):
+        """Test if many points lie inside the polygon (see PointIndex.contains).
 
-    def difference(self, clip):
-        return self.clip(clip, False, True)
+        The index of a prepared polygon is used, if this is a copy of one;
+        otherwise, one is built for these points.
+        """
+        if self.prepared is not None:
+            return self.prepared.contains(points)
+        return PointIndex(self.originals()[1]).contains(points)
+
+    def first_unchecked(self):
+        """Return the index of the first unchecked intersection, or -1."""
+        flags = self.flags
+        for k in self.ring():
+            if flags[k] & (INTERSECT | CHECKED) == INTERSECT:
+                return k
+        return -1
+
+    @property
+    def first(self):
+        return VertexView(self, self.head) if len(self.xs) else None
 
-    def clip(self, clip, s_entry, c_entry):
+    def next(self, v):
+        """Return the next non intersecting vertex after the one specified."""
+        c = v
+        while c.intersect:
+            c = c.next
+        return c
+
+    @property
+    def first_intersect(self):
+        """Return the first unchecked intersection point in the polygon."""
+        return VertexView(self, self.first_unchecked())
+
+    @property
+    def points(self):
+        """Return the polygon's points as a list of tuples (ordered coordinates pair)."""
+        xs, ys = self.xs, self.ys
+        return [(xs[k], ys[k]) for k in self.ring()]
+
+    def flat(self):
+        """Return the polygon's points as an array of x, y pairs (array('d'))."""
+        xs, ys = self.xs, self.ys
+        flat = array('d')
+        for k in self.ring():
+            flat.append(xs[k])
+            flat.append(ys[k])
+        return flat
+
+    def unprocessed(self):
+        """Check if any unchecked intersections remain in the polygon."""
+        return self.first_unchecked() >= 0
+
+    def union(self, clip, **kwargs):
+        return self.clip(clip, False, False, **kwargs)
+
+    def intersection(self, clip, **kwargs):
+        return self.clip(clip, True, True, **kwargs)
+
+    def difference(self, clip, **kwargs):
+        return self.clip(clip, False, True, **kwargs)
+
+    def clip(self, clip, s_entry, c_entry, engine=None, stats=None, output='polygons',
+             perturb=False):
         """Clip this polygon using another one as a clipper.
 
         This is where the algorithm is executed. It allows you to make
@@ -196,70 +629,230 @@ class Polygon(object):
         B\A   f   b
 
         f = True, b = False when stored in the entry record
+
+        The engine selects how intersections are found in phase one (see
+        find_intersections); all engines produce the same result.
+
+        If a ClipStats object is given, the time spent in each phase and
+        other counters are collected in it.
+
+        Degenerate cases (a vertex of one polygon lying on an edge of the
+        other, or overlapping edges) are skipped, and may give wrong
+        results. If perturb is True, they're decided deterministically as
+        if the clipper was moved by an infinitely small amount instead
+        (see resolve_contacts): a touching vertex either crosses the edge
+        or doesn't, so the result is always consistent. Intersections
+        found this way are at vertices of the polygons, which then appear
+        twice in a row in the result.
+
+        The clipper may be a PreparedPolygon, which is left untouched. If
+        either polygon is a copy of a prepared one, its cached index is used
+        to find the intersections.
+
+        The output selects what the resulting polygons are returned as:
+        'polygons' for CompactPolygon objects, 'points' for lists of
+        (x, y) tuples, or 'flat' for arrays of x, y pairs (array('d')).
+        With 'metrics', the polygons aren't built at all: a ClipMetrics
+        object is returned instead, measured while walking them (see
+        measure).
         """
-        # phase one - find intersections
-        for s in self.iter(): # for each vertex Si of subject polygon do
-            if not s.intersect:
-                for c in clip.iter(): # for each vertex Cj of clip polygon do
-                    if not c.intersect:
-                        try:
-                            i, alphaS, alphaC = intersect(s, self.next(s.next),
-                                                          c, clip.next(c.next))
-                            iS = Vertex(i, alphaS, intersect=True, entry=False)
-                            iC = Vertex(i, alphaC, intersect=True, entry=False)
-                            iS.neighbour = iC
-                            iC.neighbour = iS
-
-                            self.insert(iS, s, self.next(s.next))
-                            clip.insert(iC, c, clip.next(c.next))
-                        except TypeError:
-                            pass # this simply means intersect() returned None
+        if output not in OUTPUTS and output != 'metrics':
+            raise ValueError("unknown output: %r" % output)
 
-        # phase two - identify entry/exit points
-        s_entry ^= self.first.isInside(clip)
-        for s in self.iter():
-            if s.intersect:
-                s.entry = s_entry
-                s_entry = not s_entry
+        if stats is not None:
+            stats.start()
 
-        c_entry ^= clip.first.isInside(self)
-        for c in clip.iter():
-            if c.intersect:
-                c.entry = c_entry
-                c_entry = not c_entry
+        if isinstance(clip, PreparedPolygon):
+            clip = clip.polygon()
 
-        # phase three - construct a list of clipped polygons
+        # phase one - find intersections
+        sidx, spoints = self.originals()
+        cidx, cpoints = clip.originals()
+        sgroups, cgroups = {}, {}
+        contacts = [] if perturb else None
+
+        if clip.prepared is not None:
+            hits = clip.prepared.intersections(spoints, engine, False, stats, contacts)
+        elif self.prepared is not None:
+            hits = self.prepared.intersections(cpoints, engine, True, stats, contacts)
+        else:
+            hits = find_intersections(spoints, cpoints, engine, stats, contacts)
+        if contacts:
+            hits = hits + resolve_contacts(spoints, cpoints, contacts)
+
+        for i, j, (x, y), alphaS, alphaC in hits:
+            iS = self.append(x, y, alphaS, INTERSECT)
+            iC = clip.append(x, y, alphaC, INTERSECT)
+            self.neighbours[iS] = iC
+            clip.neighbours[iC] = iS
+            sgroups.setdefault(i, []).append(iS)
+            cgroups.setdefault(j, []).append(iC)
+
+        self.partner, clip.partner = clip, self
+        steps = 0
+        for poly, idx, groups in ((self, sidx, sgroups), (clip, cidx, cgroups)):
+            for i, group in groups.iteritems():
+                for k in group:
+                    steps += poly.link(k, idx[i], idx[(i + 1) % len(idx)])
+
+        if stats is not None:
+            stats.intersections += len(hits)
+            stats.walked += steps
+            stats.vertices += 2 * len(hits)
+            stats.lap('intersections')
+
+        # phase two - identify entry/exit points
+        for poly, other, entry, idx, groups in ((self, clip, s_entry, sidx, sgroups),
+                                                (clip, self, c_entry, cidx, cgroups)):
+            flags = poly.flags
+            x, y = poly.xs[poly.head], poly.ys[poly.head]
+            points = cpoints if poly is self else spoints
+            if perturb:
+                entry ^= is_inside_perturbed(points, x, y, -1 if poly is self else 1)
+            elif other.prepared is not None:
+                entry ^= other.prepared.is_inside(x, y)
+            else:
+                entry ^= is_inside_points(points, x, y)
+            order = poly.intersections(idx, groups)
+            for k in order:
+                flags[k] = flags[k] | ENTRY if entry else flags[k] & ~ENTRY
+                entry = not entry
+
+            if poly is self:
+                worklist = order
+
+        if stats is not None:
+            stats.lap('labelling')
+
+        if output == 'metrics':
+            # the result lies on the left of the subject's edges followed
+            # forward if it's counter-clockwise, and on their right if it's
+            # clockwise; the other way around in B\A (outside the subject)
+            if self.prepared is not None:
+                orientation = self.prepared.orientation
+            else:
+                orientation = cmp(signed_area(spoints), 0)
+            if s_entry and not c_entry:
+                orientation = -orientation
+            metrics = self.measure(worklist, ClipMetrics(len(hits)), orientation)
+            if not metrics.intersections:
+                metrics.add_points(self.points)
+
+            if stats is not None:
+                stats.lap('construction')
+                stats.done()
+
+            return metrics
+
+        # phase three - construct a list of clipped polygons, starting from
+        # each intersection of the subject still unchecked, in order
         list = []
-        while self.unprocessed():
-            current = self.first_intersect
-            clipped = Polygon()
-            clipped.add(Vertex(current))
+        for start in worklist:
+            if self.flags[start] & CHECKED:
+                continue
+
+            poly, current = self, start
+            flat = array('d', (poly.xs[current], poly.ys[current]))
             while True:
-                current.setChecked()
-                if current.entry:
-                    while True:
-                        current = current.next
-                        clipped.add(Vertex(current))
-                        if current.intersect:
-                            break
-                else:
-                    while True:
-                        current = current.prev
-                        clipped.add(Vertex(current))
-                        if current.intersect:
-                            break
-
-                current = current.neighbour
-                if current.checked:
+                poly.flags[current] |= CHECKED
+                poly.partner.flags[poly.neighbours[current]] |= CHECKED
+
+                xs, ys, flags = poly.xs, poly.ys, poly.flags
+                step = poly.nexts if flags[current] & ENTRY else poly.prevs
+                while True:
+                    current = step[current]
+                    flat.append(xs[current])
+                    flat.append(ys[current])
+                    if flags[current] & INTERSECT:
+                        break
+
+                current = poly.neighbours[current]
+                poly = poly.partner
+                if poly.flags[current] & CHECKED:
                     break
 
-            list.append(clipped)
+            list.append(flat)
+
+        if stats is not None:
+            stats.vertices += sum(len(flat) for flat in list) // 2
+
+        if output == 'polygons':
+            for k, flat in enumerate(list):
+                list[k] = CompactPolygon()
+                list[k].set_coordinates(flat[0::2], flat[1::2])
+        elif output == 'points':
+            list = [zip(flat[0::2], flat[1::2]) for flat in list]
 
         if not list:
-            list.append(self)
+            if output == 'polygons':
+                list.append(self)
+            else:
+                list.append(self.points if output == 'points' else self.flat())
+
+        if stats is not None:
+            stats.lap('construction')
+            stats.done()
 
         return list
 
+    def measure(self, worklist, metrics, orientation=1):
+        """Walk the clipped polygons as in phase three of clip, adding up their measures.
+
+        Nothing is allocated for the polygons: the shoelace sum, perimeter
+        and bounding box of each one are accumulated as its vertices are
+        walked, and added to metrics (a ClipMetrics), which is returned.
+
+        orientation is 1 if the result lies on the left of the subject's
+        edges followed forward, and -1 if it lies on their right. Pieces
+        walked the other way along the subject are turned around, so that
+        holes come out with a negative area, whatever the direction the
+        algorithm walks them in.
+        """
+        for start in worklist:
+            if self.flags[start] & CHECKED:
+                continue
+
+            sign = orientation if self.flags[start] & ENTRY else -orientation
+
+            poly, current = self, start
+            x0, y0 = px, py = poly.xs[current], poly.ys[current]
+            xmin = xmax = x0
+            ymin = ymax = y0
+            area = length = 0.0
+            while True:
+                poly.flags[current] |= CHECKED
+                poly.partner.flags[poly.neighbours[current]] |= CHECKED
+
+                xs, ys, flags = poly.xs, poly.ys, poly.flags
+                step = poly.nexts if flags[current] & ENTRY else poly.prevs
+                while True:
+                    current = step[current]
+                    x, y = xs[current], ys[current]
+                    area += px * y - x * py
+                    length += hypot(x - px, y - py)
+                    if x < xmin:
+                        xmin = x
+                    elif x > xmax:
+                        xmax = x
+                    if y < ymin:
+                        ymin = y
+                    elif y > ymax:
+                        ymax = y
+                    px, py = x, y
+                    if flags[current] & INTERSECT:
+                        break
+
+                current = poly.neighbours[current]
+                poly = poly.partner
+                if poly.flags[current] & CHECKED:
+                    break
+
+            area += px * y0 - x0 * py
+            length += hypot(x0 - px, y0 - py)
+            metrics.add(sign * area / 2, length, (xmin, ymin, xmax, ymax))
+
+        return metrics
+
     def __repr__(self):
         """String representation of the polygon for debugging purposes."""
         count, out = 1, "\n"
@@ -269,50 +862,1016 @@ class Polygon(object):
         return out
 
     def iter(self):
-        """Iterator generator for this doubly linked list."""
-        s = self.first
+        """Iterator generator over the vertices, as VertexView objects."""
+        for k in self.ring():
+            yield VertexView(self, k)
+
+
+class VertexView(object):
+    """Read-only view of a vertex in a CompactPolygon, with the Vertex interface."""
+
+    __slots__ = ('polygon', 'index')
+
+    def __init__(self, polygon, index):
+        self.polygon = polygon
+        self.index = index
+
+    x = property(lambda self: self.polygon.xs[self.index])
+    y = property(lambda self: self.polygon.ys[self.index])
+    alpha = property(lambda self: self.polygon.alphas[self.index])
+    intersect = property(lambda self: bool(self.polygon.flags[self.index] & INTERSECT))
+    entry = property(lambda self: bool(self.polygon.flags[self.index] & ENTRY))
+    checked = property(lambda self: bool(self.polygon.flags[self.index] & CHECKED))
+    next = property(lambda self: VertexView(self.polygon, self.polygon.nexts[self.index]))
+    prev = property(lambda self: VertexView(self.polygon, self.polygon.prevs[self.index]))
+
+    @property
+    def neighbour(self):
+        k = self.polygon.neighbours[self.index]
+        return VertexView(self.polygon.partner, k) if k >= 0 else None
+
+    def isInside(self, poly):
+        """Test if a vertex lies inside a polygon (odd-even rule)."""
+        if isinstance(poly, CompactPolygon):
+            return poly.is_inside(self.x, self.y)
+        return Vertex((self.x, self.y)).isInside(poly)
+
+    def __eq__(self, other):
+        return isinstance(other, VertexView) and \
+            self.polygon is other.polygon and self.index == other.index
+
+    def __ne__(self, other):
+        return not self == other
+
+    __repr__ = Vertex.__repr__.im_func
+
+class PreparedPolygon(object):
+    """Polygon prepared once, to be clipped against many times.
+
+    It caches the bounding box, the orientation, the edges sorted for the
+    sweep and an index of the edges by horizontal bands, used to select
+    the candidate edges for intersections, and a PointIndex for
+    point-in-polygon tests.
+
+    A prepared polygon is never modified after it is created (clipping
+    works on a copy of its arrays), so it can be reused across calls and
+    shared between threads.
+    """
+
+    def __init__(self, points, bands=None):
+        self.points = tuple((float(p[0]), float(p[1])) for p in points)
+        self.template = CompactPolygon(self.points)
+
+        xs, ys = self.template.xs, self.template.ys
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        self.area = signed_area(self.points)
+        self.orientation = cmp(self.area, 0)  # 1 if counter-clockwise, -1 if clockwise
+
+        self.events = edge_events(self.points, 1)
+        self.events.sort()
+        self.fingerprint = None  # set by fingerprint(), when first needed
+        self.index = None        # PointIndex, set by is_inside or contains, when first needed
+
+        nbands = bands or max(1, len(self.points) // 4)
+        self.band_height = float(self.bbox[3] - self.bbox[1]) / nbands or 1.0
+        self.bands = [[] for b in xrange(nbands)]
+        for event in self.events:
+            for b in xrange(self.band(event[2]), self.band(event[3]) + 1):
+                self.bands[b].append(event)
+
+    def band(self, y):
+        """Return the index of the band for a y coordinate."""
+        b = int((y - self.bbox[1]) / self.band_height)
+        return min(len(self.bands) - 1, max(0, b))
+
+    def polygon(self):
+        """Return a new CompactPolygon with the points of this one, to be clipped."""
+        poly = self.template.copy()
+        poly.prepared = self
+        return poly
+
+    def point_index(self):
+        """Return the PointIndex of the polygon, built the first time."""
+        if self.index is None:
+            self.index = PointIndex(self.points)
+        return self.index
+
+    def is_inside(self, x, y):
+        """Test if a point lies inside the polygon (odd-even rule, as Vertex.isInside).
+
+        Points outside the bounding box are rejected right away, and
+        others are looked up in the PointIndex of the polygon.
+        """
+        xmin, ymin, xmax, ymax = self.bbox
+        if x > xmax or not ymin <= y <= ymax:
+            return False
+        return self.point_index().contains_point(x, y)
+
+    def contains(self, points):
+        """Test if many points lie inside the polygon (see PointIndex.contains)."""
+        return self.point_index().contains(points)
+
+    def intersections(self, points, engine=None, subject=False, stats=None, contacts=None):
+        """Find the intersections between this polygon's edges and another's.
+
+        The result is the same as find_intersections(points, self.points),
+        or find_intersections(self.points, points) if subject is True. Only
+        the edges of this polygon in the bands overlapping the bounding box
+        of the other polygon are swept. Engines other than sweep and auto
+        don't use the index.
+        """
+        if engine not in (None, 'auto', 'sweep'):
+            if subject:
+                return find_intersections(self.points, points, engine, stats, contacts)
+            return find_intersections(points, self.points, engine, stats, contacts)
+
+        xs, ys = coordinates(points)
+        xmin, ymin, xmax, ymax = min(xs), min(ys), max(xs), max(ys)
+        if xmin > self.bbox[2] or xmax < self.bbox[0] or \
+           ymin > self.bbox[3] or ymax < self.bbox[1]:
+            return []
+
+        candidates = {}
+        for b in xrange(self.band(ymin), self.band(ymax) + 1):
+            for event in self.bands[b]:
+                if event[1] >= xmin and event[0] <= xmax:
+                    candidates[event[5]] = event
+
+        if subject:
+            events = merge(sorted_edge_events(points, 1),
+                           sorted(e[:4] + (0,) + e[5:] for e in candidates.itervalues()))
+        else:
+            events = merge(sorted_edge_events(points, 0), sorted(candidates.itervalues()))
+        return sweep_events(events, stats, contacts)
+
+    def union(self, clip, **kwargs):
+        return self.polygon().union(clip, **kwargs)
+
+    def intersection(self, clip, **kwargs):
+        return self.polygon().intersection(clip, **kwargs)
+
+    def difference(self, clip, **kwargs):
+        return self.polygon().difference(clip, **kwargs)
+
+    def clip(self, clip, s_entry, c_entry, **kwargs):
+        return self.polygon().clip(clip, s_entry, c_entry, **kwargs)
+
+
+class PointIndex(object):
+    """Index of the edges of a polygon, for point-in-polygon queries.
+
+    The y range of the polygon is split into bands (about one per four
+    vertices). The edges crossing a band from bottom to top can't cross
+    each other inside it (in a simple polygon), so they're kept sorted by
+    x, and the number of them on the right of a point is found by binary
+    search; the few edges ending inside the band are tested one by one.
+    A query costs O(log n) for most polygons, after O(n log n) to build.
+
+    Edges are counted with the same rule as is_inside_points, with exact
+    orientations (see orient2d). A band whose edges can't be sorted (the
+    polygon crosses itself there) is searched linearly.
+    """
+
+    def __init__(self, points, bands=None):
+        points = [(float(p[0]), float(p[1])) for p in points]
+        self.bounds = []
+        if len(points) < 3:
+            return
+
+        ys = [p[1] for p in points]
+        ymin, ymax = min(ys), max(ys)
+        if ymin == ymax:
+            return
+
+        nbands = bands or max(1, len(points) // 4)
+        height = (ymax - ymin) / nbands
+        self.bounds = [ymin + b * height for b in xrange(nbands)] + [ymax]
+        self.spanning = [[] for b in xrange(nbands)]
+        self.partial = [[] for b in xrange(nbands)]
+        for x1, y1, x2, y2 in edges(points):
+            if y1 == y2:
+                continue  # horizontal edges never count
+            if y1 > y2:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            for b in xrange(self.band(y1), self.band(y2) + 1):
+                if y1 <= self.bounds[b] and y2 >= self.bounds[b + 1]:
+                    self.spanning[b].append((x1, y1, x2, y2))
+                elif y2 > self.bounds[b]:
+                    self.partial[b].append((x1, y1, x2, y2))
+
+        self.sorted = []
+        for b, band in enumerate(self.spanning):
+            bottom, top = self.bounds[b], self.bounds[b + 1]
+            band.sort(key=lambda e: x_at(e, (bottom + top) / 2))
+            self.sorted.append(all(x_at(e1, y) <= x_at(e2, y)
+                                   for e1, e2 in zip(band, band[1:]) for y in (bottom, top)))
+
+        self.arrays = None  # flat NumPy arrays of the index, set by contains when needed
+
+    def band(self, y):
+        """Return the index of the band for a y coordinate (clamped to the bands)."""
+        return min(len(self.bounds) - 2, max(0, bisect_right(self.bounds, y) - 1))
+
+    def contains_point(self, x, y):
+        """Test if a point lies inside the polygon (odd-even rule)."""
+        bounds = self.bounds
+        if not bounds or not bounds[0] <= y < bounds[-1]:
+            return False
+
+        b = bisect_right(bounds, y) - 1
+        inside = False
+        for x1, y1, x2, y2 in self.partial[b]:
+            if y1 <= y < y2 and orient2d(x1, y1, x2, y2, x, y) > 0:
+                inside = not inside
+
+        band = self.spanning[b]
+        if self.sorted[b]:
+            lo, hi = 0, len(band)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if orient2d(*(band[mid] + (x, y))) > 0:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            right = len(band) - lo
+        else:
+            right = sum(1 for e in band if orient2d(*(e + (x, y))) > 0)
+
+        return inside != (right % 2 == 1)
+
+    def contains(self, points):
+        """Test if many points lie inside the polygon.
+
+        points is a list of (x, y) tuples, or a NumPy array of shape (n, 2).
+        Return a list of booleans, or a NumPy array of booleans if a NumPy
+        array is given. With NumPy, at least CONTAINS_NUMPY_MIN points are
+        tested at once (see contains_numpy).
+        """
+        if numpy is not None and (isinstance(points, numpy.ndarray) or
+                                  len(points) >= CONTAINS_NUMPY_MIN):
+            inside = self.contains_numpy(numpy.asarray(points, dtype=float).reshape(-1, 2))
+            return inside if isinstance(points, numpy.ndarray) else inside.tolist()
+        return [self.contains_point(p[0], p[1]) for p in points]
+
+    def contains_numpy(self, points):
+        """Test if the points of a (n, 2) NumPy array lie inside the polygon, at once.
+
+        The binary searches of all the points run side by side, one step
+        for all of them at a time, and so do the tests of the edges ending
+        in their bands. Points for which an orientation is too close to 0
+        to be sure of its sign (see orient2d), or in a band that isn't
+        sorted, are tested again one by one.
+        """
+        inside = numpy.zeros(len(points), dtype=bool)
+        if not self.bounds or not len(points):
+            return inside
+
+        if self.arrays is None:
+            self.arrays = {}
+            for name, bands in (('spanning', self.spanning), ('partial', self.partial)):
+                counts = numpy.array([len(band) for band in bands], dtype=int)
+                flat = [e for band in bands for e in band]
+                self.arrays[name] = (numpy.array(flat, dtype=float).reshape(-1, 4),
+                                     numpy.cumsum(counts) - counts, counts)
+            self.arrays['sorted'] = numpy.array(self.sorted, dtype=bool)
+
+        px, py = points[:, 0], points[:, 1]
+        valid = (py >= self.bounds[0]) & (py < self.bounds[-1])
+        bands = numpy.searchsorted(self.bounds, py, 'right') - 1
+        bands = numpy.clip(bands, 0, len(self.bounds) - 2)
+        retry = valid & ~self.arrays['sorted'][bands]
+
+        def left(edges, k, which):
+            # orientation of the points in which against their edges k,
+            # flagging the uncertain ones for a retry
+            x1, y1, x2, y2 = edges[k].T
+            t1 = (x2 - x1) * (py[which] - y1)
+            t2 = (y2 - y1) * (px[which] - x1)
+            det = t1 - t2
+            retry[which[numpy.abs(det) <= ERRBOUND * (numpy.abs(t1) + numpy.abs(t2))]] = True
+            return det > 0
+
+        edges, starts, counts = self.arrays['partial']
+        active = numpy.nonzero(valid & ~retry)[0]
+        for j in xrange(int(counts.max()) if len(counts) else 0):
+            which = active[counts[bands[active]] > j]
+            if not len(which):
+                break
+            k = starts[bands[which]] + j
+            y = py[which]
+            crossing = (edges[k, 1] <= y) & (y < edges[k, 3])
+            which, k = which[crossing], k[crossing]
+            inside[which[left(edges, k, which)]] ^= True
+
+        edges, starts, counts = self.arrays['spanning']
+        lo = starts[bands[active]]
+        hi = lo + counts[bands[active]]
+        end = hi.copy()
         while True:
-            yield s
-            s = s.next
-            if s == self.first:
-                return
+            searching = lo < hi
+            if not searching.any():
+                break
+            which = active[searching]
+            mid = (lo[searching] + hi[searching]) // 2
+            is_left = left(edges, mid, which)
+            hi[searching] = numpy.where(is_left, mid, hi[searching])
+            lo[searching] = numpy.where(is_left, lo[searching], mid + 1)
+        inside[active] ^= (end - lo) % 2 == 1
+
+        for i in numpy.nonzero(retry)[0].tolist():
+            inside[i] = self.contains_point(float(px[i]), float(py[i]))
+        return inside
+
+
+# number of points from which PointIndex.contains uses NumPy, if installed
+CONTAINS_NUMPY_MIN = 64
+
+
+def x_at(edge, y):
+    """Return the x coordinate of a (non horizontal) edge at a given y."""
+    x1, y1, x2, y2 = edge
+    return x1 + (y - y1) * (x2 - x1) / (y2 - y1)
 
-    def show_points(self):
-        """Draw points in screen for debugging purposes. Depends on OpenGL."""
-        glBegin(GL_POINTS)
-        for s in self.iter():
-            glVertex2f(s.x, s.y)
-        glEnd()
+
+# returned by intersect_segments for degenerate cases
+DEGENERATE = ()
+
+# relative error bound of a 2x2 determinant computed in floating point as
+# a * b - c * d: the computed sign is right when the result is larger than
+# ERRBOUND * (|a * b| + |c * d|) (Shewchuk's orient2d bound, (3 + 16e) e)
+ERRBOUND = 3.3306690738754716e-16
+
+# alpha of a contact resolved by perturbation at the start of an edge (see
+# resolve_contacts), closer to it than any actual intersection gets
+CONTACT_ALPHA = 1e-300
 
 
 def intersect(s1, s2, c1, c2):
     """Test the intersection between two lines (two pairs of coordinates for two points).
 
-    Return the coordinates for the intersection and the subject and clipper alphas if the test passes.
+    Return the coordinates for the intersection and the subject and clipper alphas if the test passes,
+    or None otherwise (degenerate cases included).
 
     Algorithm based on: http://paulbourke.net/geometry/lineline2d/
     """
-    den = (c2.y - c1.y) * (s2.x - s1.x) - (c2.x - c1.x) * (s2.y - s1.y)
+    # DEGENERATE stays internal to intersect_segments and the engines
+    return intersect_segments(s1.x, s1.y, s2.x, s2.y, c1.x, c1.y, c2.x, c2.y) or None
+
+
+def intersect_segments(s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y):
+    """Same as intersect(), but taking plain coordinates instead of vertices.
+
+    Degenerate cases (an end point of one segment lying on the other, or
+    overlapping collinear segments) are not handled, and return DEGENERATE,
+    which is false like None (intersect() returns None for them).
+
+    The test is decided in floating point when the signs of the
+    determinants involved are certain (see ERRBOUND), which is almost
+    always. Otherwise, it's done again with exact arithmetic (see
+    intersect_exact), so that degenerate cases are always detected, and
+    edges almost touching are never taken for crossing, or missed.
+    """
+    sdx, sdy = s2x - s1x, s2y - s1y
+    cdx, cdy = c2x - c1x, c2y - c1y
+    dx, dy = s1x - c1x, s1y - c1y
+
+    t1, t2 = cdy * sdx, cdx * sdy
+    den = t1 - t2
+    eden = ERRBOUND * (abs(t1) + abs(t2))
+    if not eden:
+        # den is exactly 0 (e.g., both segments horizontal, or one of them a
+        # single point): parallel, and degenerate if collinear and overlapping
+        t3, t4 = cdx * dy, cdy * dx
+        ns = t3 - t4
+        ens = ERRBOUND * (abs(t3) + abs(t4))
+        t5, t6 = sdx * dy, sdy * dx
+        nc = t5 - t6
+        enc = ERRBOUND * (abs(t5) + abs(t6))
+        if abs(ns) > ens or abs(nc) > enc:
+            return None
+        if not ens and not enc:
+            if max(min(s1x, s2x), min(c1x, c2x)) > min(max(s1x, s2x), max(c1x, c2x)) or \
+               max(min(s1y, s2y), min(c1y, c2y)) > min(max(s1y, s2y), max(c1y, c2y)):
+                return None
+            return DEGENERATE
+
+    elif abs(den) > eden:
+        # us = ns / den and uc = nc / den, and the segments cross if both
+        # are strictly between 0 and 1; reject as soon as a sign is certain
+        # to be wrong
+        positive = den > 0
+        t3, t4 = cdx * dy, cdy * dx
+        ns = t3 - t4
+        ens = ERRBOUND * (abs(t3) + abs(t4))
+        if (ns > 0) != positive and abs(ns) > ens:
+            return None
+
+        t5, t6 = sdx * dy, sdy * dx
+        nc = t5 - t6
+        enc = ERRBOUND * (abs(t5) + abs(t6))
+        if (nc > 0) != positive and abs(nc) > enc:
+            return None
+
+        # den - ns and den - nc, with the errors of both terms
+        rs, rc = den - ns, den - nc
+        ers, erc = 1.0000000000000003 * (eden + ens), 1.0000000000000003 * (eden + enc)
+        if (rs > 0) != positive and abs(rs) > ers or \
+           (rc > 0) != positive and abs(rc) > erc:
+            return None
+
+        if abs(ns) > ens and abs(nc) > enc and abs(rs) > ers and abs(rc) > erc:
+            us = ns / den
+            uc = nc / den
+            x = s1x + us * sdx
+            y = s1y + us * sdy
+            return (x, y), us, uc
+
+    return intersect_exact(s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y)
+
+
+def intersect_exact(s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y):
+    """Same as intersect_segments, with exact rational arithmetic.
+
+    About a hundred times slower; intersect_segments only falls back to it
+    for the few pairs of edges its floating point test can't decide.
+    """
+    from fractions import Fraction  # Python 2.6+, only needed in rare cases
+
+    s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y = [
+        Fraction.from_float(float(v)) for v in (s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y)]
+
+    den = (c2y - c1y) * (s2x - s1x) - (c2x - c1x) * (s2y - s1y)
+    ns = (c2x - c1x) * (s1y - c1y) - (c2y - c1y) * (s1x - c1x)
+    nc = (s2x - s1x) * (s1y - c1y) - (s2y - s1y) * (s1x - c1x)
 
     if not den:
-        return None
+        # parallel, and degenerate if collinear and overlapping
+        if ns or nc or \
+           max(min(s1x, s2x), min(c1x, c2x)) > min(max(s1x, s2x), max(c1x, c2x)) or \
+           max(min(s1y, s2y), min(c1y, c2y)) > min(max(s1y, s2y), max(c1y, c2y)):
+            return None
+        return DEGENERATE
 
-    us = ((c2.x - c1.x) * (s1.y - c1.y) - (c2.y - c1.y) * (s1.x - c1.x)) / den
-    uc = ((s2.x - s1.x) * (s1.y - c1.y) - (s2.y - s1.y) * (s1.x - c1.x)) / den
+    us = ns / den
+    uc = nc / den
 
     if (us == 0 or us == 1) and (0 <= uc <= 1) or\
        (uc == 0 or uc == 1) and (0 <= us <= 1):
-        print "whoops! degenerate case!"
-        return None
+        return DEGENERATE
 
     elif (0 < us < 1) and (0 < uc < 1):
-        x = s1.x + us * (s2.x - s1.x)
-        y = s1.y + us * (s2.y - s1.y)
-        return (x, y), us, uc
+        x = s1x + us * (s2x - s1x)
+        y = s1y + us * (s2y - s1y)
+        return (float(x), float(y)), float(us), float(uc)
 
     return None
 
 
+def orient2d(ax, ay, bx, by, cx, cy):
+    """Return a number with the sign of the orientation of the points a, b and c.
+
+    It's positive if c lies on the left of the line from a to b, negative
+    if it lies on its right, and 0 if the three points are collinear. The
+    sign is exact: the determinant is computed in floating point and, only
+    when it's too close to 0 to be sure of its sign, with exact arithmetic.
+    """
+    t1, t2 = (bx - ax) * (cy - ay), (by - ay) * (cx - ax)
+    det = t1 - t2
+    if abs(det) > ERRBOUND * (abs(t1) + abs(t2)):
+        return det
+
+    from fractions import Fraction
+    ax, ay, bx, by, cx, cy = [Fraction.from_float(float(v)) for v in (ax, ay, bx, by, cx, cy)]
+    det = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    return float(det) or cmp(det, 0) * 5e-324
+
+
+def perturbed(det, dx, dy, shift):
+    """Return the sign of orient2d(a, b, p), with p moved by shift * (e, e*e).
+
+    The determinant (det) is orient2d(a, b, p) for the unmoved point, and
+    (dx, dy) is b - a; e is an infinitely small positive number, so the
+    result is never 0 unless a and b are the same point. Moving p this way
+    is the same as moving a and b by the opposite.
+    """
+    if det:
+        return 1 if det > 0 else -1
+    if dy:
+        return -shift if dy > 0 else shift
+    return cmp(dx, 0) * shift
+
+
+def intersect_perturbed(s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y):
+    """Same as intersect_segments, as if the clipper was moved by (e, e*e).
+
+    The clipper is moved by an infinitely small amount (simulation of
+    simplicity), so no end point lies exactly on the other segment, and
+    degenerate cases are decided one way or the other: as crossing, or
+    not. This only matters for segments that are degenerate, which are the
+    ones to call it for; it uses exact arithmetic.
+
+    Return None, or the intersection point (an end point of a segment),
+    the alphas, and for each alpha a key ordering the intersections at the
+    same point of a segment as they are after the perturbation.
+    """
+    from fractions import Fraction
+
+    s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y = [
+        Fraction.from_float(float(v)) for v in (s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y)]
+    sdx, sdy = s2x - s1x, s2y - s1y
+    cdx, cdy = c2x - c1x, c2y - c1y
+    o1 = cdx * (s1y - c1y) - cdy * (s1x - c1x)
+    o2 = cdx * (s2y - c1y) - cdy * (s2x - c1x)
+    o3 = sdx * (c1y - s1y) - sdy * (c1x - s1x)
+    o4 = sdx * (c2y - s1y) - sdy * (c2x - s1x)
+
+    if perturbed(o1, cdx, cdy, -1) == perturbed(o2, cdx, cdy, -1) or \
+       perturbed(o3, sdx, sdy, 1) == perturbed(o4, sdx, sdy, 1):
+        return None
+
+    # moving the subject end points by -(e, e*e) adds cdy e - cdx e*e to
+    # o1 and o2, and moving the clipper's by (e, e*e) adds sdx e*e - sdy e
+    # to o3 and o4; the alphas are us = o1 / (o1 - o2), uc = o3 / (o3 - o4)
+    us, uc = o1 / (o1 - o2), o3 / (o3 - o4)
+    if not o1 or not o2:
+        point = (s1x, s1y) if not o1 else (s2x, s2y)
+    else:
+        point = (c1x, c1y) if not o3 else (c2x, c2y)
+
+    return ((float(point[0]), float(point[1])), float(us), float(uc),
+            (cdy / (o1 - o2), -cdx / (o1 - o2)), (-sdy / (o3 - o4), sdx / (o3 - o4)))
+
+
+def resolve_contacts(subject, clipper, contacts):
+    """Decide the degenerate pairs of edges found by an engine, by perturbation.
+
+    The contacts are (i, j) pairs of subject and clipper edges, found
+    degenerate (see intersect_segments). Return the intersections among
+    them when the clipper is moved by (e, e*e) (see intersect_perturbed),
+    in the format of find_intersections.
+
+    Intersections at the same point of an edge are given alphas a few ulps
+    apart (CONTACT_ALPHA after 0, or before 1), ordered as they are along
+    the edge after the perturbation.
+    """
+    n, m = len(subject), len(clipper)
+    found, groups = [], {}
+    for i, j in contacts:
+        hit = intersect_perturbed(*(subject[i] + subject[(i + 1) % n] +
+                                    clipper[j] + clipper[(j + 1) % m]))
+        if hit is None:
+            continue
+
+        point, us, uc, ks, kc = hit
+        found.append([i, j, point, us, uc])
+        for side, edge, order in ((3, i, ks), (4, j, kc)):
+            groups.setdefault((side, edge, point), []).append((order, len(found) - 1))
+
+    for (side, edge, point), group in groups.iteritems():
+        group.sort()
+        for rank, (order, h) in enumerate(group):
+            alpha = found[h][side]
+            if alpha == 0.0:
+                found[h][side] = (rank + 1) * CONTACT_ALPHA
+            elif alpha == 1.0:
+                found[h][side] = 1.0 - (len(group) - rank) * 2.0 ** -53
+            else:
+                found[h][side] = alpha * (1 + rank * 2.0 ** -52)
+
+    found = [tuple(hit) for hit in found]
+    found.sort()
+    return found
+
+
+def is_inside_points(points, x, y):
+    """Test if a point lies inside a polygon, given as a list of points, in O(n).
+
+    The edges crossing the horizontal line of the point on its right are
+    counted (odd-even rule). An edge counts if one end is above the line
+    and the other is on it or below, so a line through a vertex counts
+    the two edges at it once, or twice, as it should. The side of the
+    point is found with an exact orientation (see orient2d); points on an
+    edge crossing the line aren't on its right.
+    """
+    inside = False
+    x1, y1 = points[-1]
+    for x2, y2 in points:
+        if (y1 > y) != (y2 > y):
+            side = orient2d(x1, y1, x2, y2, x, y)
+            if side and (side > 0) == (y2 > y1):
+                inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def is_inside_perturbed(points, x, y, shift):
+    """Test if a point lies inside a polygon, with the point moved by shift * (e, e*e).
+
+    The polygon is a list of points. This is the point-in-polygon test
+    matching intersect_perturbed: subject points are tested against the
+    clipper with shift -1, and clipper points against the subject with 1.
+    Every edge is tested, with exact orientations.
+    """
+    inside = False
+    x1, y1 = points[-1]
+    for x2, y2 in points:
+        # the edge crosses the horizontal line of the moved point; with
+        # shift -1 (point below) a vertex at the same height is above it
+        above1 = y1 >= y if shift < 0 else y1 > y
+        above2 = y2 >= y if shift < 0 else y2 > y
+        if above1 != above2:
+            side = perturbed(orient2d(x1, y1, x2, y2, x, y), x2 - x1, y2 - y1, shift)
+            if (side > 0) == (y2 > y1):
+                inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def edges(points):
+    """Return the edges of a closed ring of points as (x1, y1, x2, y2) tuples."""
+    n = len(points)
+    return [points[i] + points[(i + 1) % n] for i in xrange(n)]
+
+
+def coordinates(points):
+    """Return the x and y coordinates of a list of points, as two arrays.
+
+    The arrays of a PointsView are returned as they are (when the view
+    covers all of them), without a copy.
+    """
+    if isinstance(points, PointsView):
+        if len(points.xs) == points.n:
+            return points.xs, points.ys
+        return points.xs[:points.n], points.ys[:points.n]
+    return array('d', (p[0] for p in points)), array('d', (p[1] for p in points))
+
+
+def signed_area(points):
+    """Return the signed area of a polygon (positive if counter-clockwise)."""
+    area = 0.0
+    for x1, y1, x2, y2 in edges(points):
+        area += x1 * y2 - x2 * y1
+    return area / 2
+
+
+def find_intersections_brute(subject, clipper, stats=None, contacts=None):
+    """Find edge intersections by testing every pair of edges: O(n*m).
+
+    This is the original phase one of the algorithm, kept as a reference
+    to compare the results of the other engines with.
+    """
+    found, degeneracies = [], 0
+    cedges = edges(clipper)
+    for i, (s1x, s1y, s2x, s2y) in enumerate(edges(subject)):
+        for j, (c1x, c1y, c2x, c2y) in enumerate(cedges):
+            hit = intersect_segments(s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y)
+            if hit:
+                found.append((i, j) + hit)
+            elif hit is DEGENERATE:
+                degeneracies += 1
+                if contacts is not None:
+                    contacts.append((i, j))
+
+    if stats is not None:
+        stats.pairs += len(subject) * len(clipper)
+        stats.degeneracies += degeneracies
+    return found
+
+
+def find_intersections_sweep(subject, clipper, stats=None, contacts=None):
+    """Find edge intersections with an x-sorted active edge sweep.
+
+    Edges from both polygons are sorted by their leftmost x coordinate and
+    swept from left to right. Each polygon keeps a set of active edges (the
+    ones whose x range spans the sweep line), so an edge entering the sweep
+    is only tested against the active edges of the other polygon whose y
+    range overlaps its own. Edges leave the active set through a heap
+    ordered by their rightmost x coordinate.
+
+    This runs in O((n+m) log(n+m) + p) where p is the number of edge pairs
+    with overlapping bounding boxes, which stays close to the number of
+    actual intersections for real world data. The events of each polygon
+    are built one at a time, as the sweep reaches them (see
+    sorted_edge_events), so only the active edges take more than a few
+    bytes each.
+    """
+    events = merge(sorted_edge_events(subject, 0), sorted_edge_events(clipper, 1))
+    return sweep_events(events, stats, contacts)
+
+
+def edge_events(points, which):
+    """Return the sweep events for the edges of a polygon.
+
+    Each event is (xmin, xmax, ymin, ymax, which, i, x1, y1, x2, y2) for
+    the edge starting at points[i]; which is 0 for the subject and 1 for
+    the clipper.
+    """
+    return [(min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2), which, i, x1, y1, x2, y2)
+            for i, (x1, y1, x2, y2) in enumerate(edges(points))]
+
+
+def sorted_edge_events(points, which):
+    """Yield the events of edge_events(points, which), sorted by xmin.
+
+    Only the xmin of each edge and the sorted edge indexes are kept, in
+    arrays; each event is built as it's yielded.
+    """
+    xs, ys = coordinates(points)
+    n = len(xs)
+    keys = array('d', (min(xs[i], xs[i + 1 if i + 1 < n else 0]) for i in xrange(n)))
+    order = array('i', sorted(xrange(n), key=keys.__getitem__))
+
+    for i in order:
+        j = i + 1 if i + 1 < n else 0
+        x1, y1, x2, y2 = xs[i], ys[i], xs[j], ys[j]
+        yield (keys[i], x2 if x2 > x1 else x1, y1 if y1 < y2 else y2, y2 if y2 > y1 else y1,
+               which, i, x1, y1, x2, y2)
+
+
+def sweep_events(events, stats=None, contacts=None):
+    """Run the sweep of find_intersections_sweep over sorted edge events."""
+    active = ({}, {})   # edge index -> event, for subject and clipper
+    leaving = ([], [])  # heap of (xmax, index), for subject and clipper
+    found, pairs, degeneracies = [], 0, 0
+
+    for event in events:
+        xmin, xmax, ymin, ymax, which, i, x1, y1, x2, y2 = event
+        other = 1 - which
+        heap = leaving[other]
+        while heap and heap[0][0] < xmin:
+            del active[other][heappop(heap)[1]]
+
+        for j, (oxmin, oxmax, oymin, oymax, _, _, ox1, oy1, ox2, oy2) in active[other].iteritems():
+            if oymax < ymin or oymin > ymax:
+                continue
+            pairs += 1
+            if which == 0:
+                hit = intersect_segments(x1, y1, x2, y2, ox1, oy1, ox2, oy2)
+                if hit:
+                    found.append((i, j) + hit)
+            else:
+                hit = intersect_segments(ox1, oy1, ox2, oy2, x1, y1, x2, y2)
+                if hit:
+                    found.append((j, i) + hit)
+            if hit is DEGENERATE:
+                degeneracies += 1
+                if contacts is not None:
+                    contacts.append((i, j) if which == 0 else (j, i))
+
+        active[which][i] = event
+        heappush(leaving[which], (xmax, i))
+
+    if stats is not None:
+        stats.pairs += pairs
+        stats.degeneracies += degeneracies
+
+    found.sort()
+    return found
+
+
+def edge_array(points):
+    """Return the edges of a ring of points as a NumPy array of x1, y1, x2, y2 rows."""
+    x, y = [numpy.frombuffer(a, dtype=float) for a in coordinates(points)]
+    return numpy.column_stack((x, y, numpy.roll(x, -1), numpy.roll(y, -1)))
+
+
+def find_intersections_numpy(subject, clipper, stats=None, contacts=None):
+    """Find edge intersections by testing every pair of edges at once with NumPy.
+
+    The edges of both polygons are put into coordinate arrays, and the
+    pairs whose bounding boxes overlap are selected in one broadcast (in
+    blocks of subject edges, to bound memory use). den, us and uc are then
+    computed for those pairs at once, and only the actual hits are turned
+    back into Python tuples. The pairs whose floating point test is not
+    certain (see intersect_segments) are tested again one by one, so the
+    result is the same as the other engines'.
+
+    Falls back to find_intersections_sweep if NumPy is not installed.
+    """
+    if numpy is None:
+        return find_intersections_sweep(subject, clipper, stats, contacts)
+
+    s, c = edge_array(subject), edge_array(clipper)
+    sxmin, sxmax = numpy.minimum(s[:, 0], s[:, 2]), numpy.maximum(s[:, 0], s[:, 2])
+    symin, symax = numpy.minimum(s[:, 1], s[:, 3]), numpy.maximum(s[:, 1], s[:, 3])
+    cxmin, cxmax = numpy.minimum(c[:, 0], c[:, 2]), numpy.maximum(c[:, 0], c[:, 2])
+    cymin, cymax = numpy.minimum(c[:, 1], c[:, 3]), numpy.maximum(c[:, 1], c[:, 3])
+
+    found = []
+    block = max(1, NUMPY_BLOCK_SIZE // max(1, len(c)))
+    for start in xrange(0, len(s), block):
+        end = start + block
+        overlap = ((sxmin[start:end, numpy.newaxis] <= cxmax) & (cxmin <= sxmax[start:end, numpy.newaxis]) &
+                   (symin[start:end, numpy.newaxis] <= cymax) & (cymin <= symax[start:end, numpy.newaxis]))
+        rows, cols = numpy.nonzero(overlap)
+        rows += start
+        if stats is not None:
+            stats.pairs += len(rows)
+
+        s1x, s1y, s2x, s2y = s[rows].T
+        c1x, c1y, c2x, c2y = c[cols].T
+        sdx, sdy = s2x - s1x, s2y - s1y
+        cdx, cdy = c2x - c1x, c2y - c1y
+        dx, dy = s1x - c1x, s1y - c1y
+
+        t1, t2 = cdy * sdx, cdx * sdy
+        t3, t4 = cdx * dy, cdy * dx
+        t5, t6 = sdx * dy, sdy * dx
+        den, ns, nc = t1 - t2, t3 - t4, t5 - t6
+
+        # signs of den, ns, nc, den - ns and den - nc that are certain, as
+        # in intersect_segments; a pair crosses if all are certain and the
+        # same, and doesn't if any certain sign differs from den's
+        eden = ERRBOUND * (numpy.abs(t1) + numpy.abs(t2))
+        ens = ERRBOUND * (numpy.abs(t3) + numpy.abs(t4))
+        enc = ERRBOUND * (numpy.abs(t5) + numpy.abs(t6))
+        hits = numpy.abs(den) > eden
+        wrong = numpy.zeros_like(hits)
+        for value, error in ((ns, ens), (nc, enc),
+                             (den - ns, 1.0000000000000003 * (eden + ens)),
+                             (den - nc, 1.0000000000000003 * (eden + enc))):
+            certain = numpy.abs(value) > error
+            hits &= certain
+            wrong |= certain & ((value > 0) != (den > 0))
+
+        # parallel pairs (den exactly 0) are rejected unless collinear
+        wrong = wrong & (numpy.abs(den) > eden) | (eden == 0) & (numpy.abs(ns) > ens)
+        hits &= ~wrong
+
+        for k in numpy.nonzero(~(hits | wrong))[0].tolist():
+            i, j = int(rows[k]), int(cols[k])
+            hit = intersect_segments(*(s[i].tolist() + c[j].tolist()))
+            if hit:
+                found.append((i, j) + hit)
+            elif hit is DEGENERATE:
+                if stats is not None:
+                    stats.degeneracies += 1
+                if contacts is not None:
+                    contacts.append((i, j))
+
+        hits = numpy.nonzero(hits)[0]
+        if not len(hits):
+            continue
+
+        hs, hc = ns[hits] / den[hits], nc[hits] / den[hits]
+        x = s1x[hits] + hs * sdx[hits]
+        y = s1y[hits] + hs * sdy[hits]
+        for i, j, px, py, alphaS, alphaC in zip(rows[hits].tolist(), cols[hits].tolist(),
+                                                x.tolist(), y.tolist(),
+                                                hs.tolist(), hc.tolist()):
+            found.append((i, j, (px, py), alphaS, alphaC))
+
+    found.sort()
+    return found
+
+
+def monotone_chains(points):
+    """Split the edges of an x-monotone polygon into two chains sorted by x.
+
+    A polygon is x-monotone if its boundary goes from the leftmost vertex
+    to the rightmost one and back without turning back in x; all convex
+    polygons are. Return two lists of edge indexes (the edge starting at
+    points[i]), each sorted by x, or None if the polygon isn't x-monotone.
+    """
+    xs = coordinates(points)[0]
+    n = len(xs)
+    lo, hi = xs.index(min(xs)), xs.index(max(xs))
+    if lo == hi:
+        return None
+
+    chains = []
+    for start, end, sign in ((lo, hi, 1), (hi, lo, -1)):
+        chain, k = array('i'), start
+        while k != end:
+            next = k + 1 if k + 1 < n else 0
+            if (xs[next] - xs[k]) * sign < 0:
+                return None
+            chain.append(k)
+            k = next
+        chains.append(chain)
+
+    chains[1].reverse()
+    return chains
+
+
+def find_intersections_monotone(subject, clipper, stats=None, contacts=None):
+    """Find edge intersections between x-monotone (e.g., convex) polygons in O(n+m).
+
+    Each polygon is split into two chains of edges sorted by x (see
+    monotone_chains). Only edges that overlap in x can intersect, so each
+    chain of the subject is merged with each chain of the clipper, like
+    sorted lists, testing only the edges that overlap as the merge goes.
+
+    Falls back to find_intersections_sweep if either polygon isn't x-monotone,
+    or if contacts are asked for: the merge skips some pairs of edges that
+    only touch at the end of their x range, which can't cross, but may be
+    degenerate.
+    """
+    schains, cchains = monotone_chains(subject), monotone_chains(clipper)
+    if schains is None or cchains is None or contacts is not None:
+        return find_intersections_sweep(subject, clipper, stats, contacts)
+
+    (sx, sy), (cx, cy) = coordinates(subject), coordinates(clipper)
+    n, m = len(sx), len(cx)
+    found, pairs, degeneracies = [], 0, 0
+    for schain in schains:
+        for cchain in cchains:
+            i = j = 0
+            while i < len(schain) and j < len(cchain):
+                a, c = schain[i], cchain[j]
+                b, d = a + 1 if a + 1 < n else 0, c + 1 if c + 1 < m else 0
+                s1x, s1y, s2x, s2y = sx[a], sy[a], sx[b], sy[b]
+                c1x, c1y, c2x, c2y = cx[c], cy[c], cx[d], cy[d]
+                smax, cmax = max(s1x, s2x), max(c1x, c2x)
+                if min(s1x, s2x) <= cmax and min(c1x, c2x) <= smax:
+                    pairs += 1
+                    hit = intersect_segments(s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y)
+                    if hit:
+                        found.append((a, c) + hit)
+                    elif hit is DEGENERATE:
+                        degeneracies += 1
+                        if contacts is not None:
+                            contacts.append((a, c))
+
+                if smax <= cmax:
+                    i += 1
+                else:
+                    j += 1
+
+    if stats is not None:
+        stats.pairs += pairs
+        stats.degeneracies += degeneracies
+
+    found.sort()
+    return found
+
+
+def find_intersections_auto(subject, clipper, stats=None, contacts=None):
+    """Pick an engine based on the shape and size of the polygons.
+
+    When both polygons are x-monotone (e.g., convex), they're merged in
+    linear time. Otherwise, the sweep only tests edges whose x ranges
+    overlap, so it wins when the edges are short compared to the width of
+    the polygons. For long, jagged edges most pairs overlap anyway and
+    testing all of them at once with NumPy is faster, as long as the
+    number of pairs is not too large.
+    """
+    if monotone_chains(clipper) is not None and monotone_chains(subject) is not None:
+        return find_intersections_monotone(subject, clipper, stats, contacts)
+
+    if numpy is None or len(subject) * len(clipper) > NUMPY_AUTO_LIMIT:
+        return find_intersections_sweep(subject, clipper, stats, contacts)
+
+    xs = [numpy.frombuffer(coordinates(points)[0], dtype=float) for points in (subject, clipper)]
+    width = max(x.max() for x in xs) - min(x.min() for x in xs)
+    span = sum(numpy.abs(x - numpy.roll(x, 1)).mean() for x in xs)
+
+    if span > width * NUMPY_AUTO_DENSITY:
+        return find_intersections_numpy(subject, clipper, stats, contacts)
+    return find_intersections_sweep(subject, clipper, stats, contacts)
+
+
+ENGINES = {
+    'auto': find_intersections_auto,
+    'brute': find_intersections_brute,
+    'monotone': find_intersections_monotone,
+    'numpy': find_intersections_numpy,
+    'sweep': find_intersections_sweep,
+}
+
+DEFAULT_ENGINE = 'auto'
+
+# maximum number of edge pairs tested at once by the numpy engine
+NUMPY_BLOCK_SIZE = 1 << 20
+
+# maximum number of edge pairs for the auto engine to choose numpy
+NUMPY_AUTO_LIMIT = 1 << 22
+
+# minimum mean edge width (relative to the polygons width) for the auto
+# engine to choose numpy
+NUMPY_AUTO_DENSITY = 0.05
+
+
+def find_intersections(subject, clipper, engine=None, stats=None, contacts=None):
+    """Find the intersections between the edges of two polygons.
+
+    Both polygons are given as lists of (x, y) tuples. Return a list of
+    (i, j, (x, y), alphaS, alphaC) tuples, sorted by edge indexes, where
+    i is the index of the subject edge starting at subject[i] and j the
+    index of the clipper edge starting at clipper[j].
+
+    The engine is one of the names in ENGINES (DEFAULT_ENGINE if omitted).
+    If a ClipStats object is given, the edge pairs tested and degenerate
+    cases found are counted in it. If a contacts list is given, the (i, j)
+    pairs of degenerate edges are appended to it (see resolve_contacts).
+    """
+    try:
+        finder = ENGINES[engine or DEFAULT_ENGINE]
+    except KeyError:
+        raise ValueError("unknown intersection engine: %r" % engine)
+    return finder(subject, clipper, stats, contacts)
+
+
 def find_origin(subject, clipper):
     """Find the center coordinate for the given points."""
     x, y = [], []
@@ -334,24 +1893,514 @@ def find_origin(subject, clipper):
     return -x_max / 2, -y_max / 2, -(1.5 * width + 1.5 * height) / 2
 
 
-def clip_polygon(subject, clipper, operation = 'difference'):
-    """Higher level function for clipping two polygons (from a list of points)."""
-    Subject = Polygon()
-    Clipper = Polygon()
+def compact(polygon):
+    """Return a new CompactPolygon to be clipped, from any kind of polygon.
 
-    for s in subject:
-        Subject.add(Vertex(s))
+    The polygon may be a list of points, a CompactPolygon (which is copied)
+    or anything with a polygon() method returning a CompactPolygon, like a
+    PreparedPolygon or a view into a polygon store (see polystore).
+    """
+    if isinstance(polygon, CompactPolygon):
+        return polygon.copy()
+    if hasattr(polygon, 'polygon'):
+        return polygon.polygon()
+    return CompactPolygon(polygon)
 
-    for c in clipper:
-        Clipper.add(Vertex(c))
 
-    clipped = Clipper.difference(Subject)\
+def fingerprint(polygon):
+    """Return the coordinates of any kind of polygon as a string of float64 x, y pairs.
+
+    Used to key clip results in a ClipCache. It's computed only once for a
+    PreparedPolygon, and taken straight from the buffer of a store view.
+    """
+    if isinstance(polygon, PreparedPolygon):
+        if polygon.fingerprint is None:
+            polygon.fingerprint = polygon.template.flat().tostring()
+        return polygon.fingerprint
+    if isinstance(polygon, CompactPolygon):
+        return polygon.flat().tostring()
+    if hasattr(polygon, 'buffer'):
+        return str(polygon.buffer)
+    return array('d', [c for p in polygon for c in p[:2]]).tostring()
+
+
+class ClipCache(object):
+    """Least recently used cache of clip_polygon results.
+
+    Results are keyed on the operation (and the perturb option) and the
+    coordinates of both polygons (see fingerprint), and kept as flat
+    arrays, from which a new result is built on each hit, in the requested
+    output. The least recently used results are evicted when there are
+    more than maxsize of them, or when they take more than maxbytes
+    (roughly, counting keys and coordinates).
+
+    The hits, misses and evictions are counted. On a hit, no clip happens,
+    so a stats object given to clip_polygon is left untouched.
+
+    A cache can be shared between threads: its list of results is only
+    changed under a lock, which isn't held while clipping.
+    """
+
+    def __init__(self, maxsize=256, maxbytes=32 << 20):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def clear(self):
+        """Remove all the results (the counters are reset too)."""
+        with self.lock:
+            self.entries = {}
+            self.root = []  # circular list of [prev, next, key, flats, size], oldest first
+            self.root[:] = [self.root, self.root, None, None, 0]
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Return the flat arrays cached for a key (or None), as the most recently used."""
+        with self.lock:
+            link = self.entries.get(key)
+            if link is None:
+                self.misses += 1
+                return None
+
+            prev, next = link[0], link[1]
+            prev[1], next[0] = next, prev
+            last = self.root[0]
+            link[0], link[1] = last, self.root
+            last[1] = self.root[0] = link
+
+            self.hits += 1
+            return link[3]
+
+    def put(self, key, flats):
+        """Cache the flat arrays for a key, evicting the least recently used ones as needed."""
+        size = len(key[1]) + len(key[2]) + sum(f.itemsize * len(f) for f in flats)
+        if size > self.maxbytes or self.maxsize < 1:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                return
+
+            while self.entries and (len(self.entries) >= self.maxsize or self.bytes + size > self.maxbytes):
+                oldest = self.root[1]
+                self.root[1], oldest[1][0] = oldest[1], self.root
+                del self.entries[oldest[2]]
+                self.bytes -= oldest[4]
+                self.evictions += 1
+
+            last = self.root[0]
+            link = [last, self.root, key, flats, size]
+            last[1] = self.root[0] = self.entries[key] = link
+            self.bytes += size
+
+    def clip(self, subject, clipper, operation='difference', output='polygons', **kwargs):
+        """Same as clip_polygon, returning a cached result if there's one.
+
+        Metrics (output 'metrics') aren't cached: they're measured without
+        building the pieces, which is about as fast as copying them.
+        """
+        if output == 'metrics':
+            return clip_polygon(subject, clipper, operation, cache=False, output=output, **kwargs)
+        if output not in OUTPUTS:
+            raise ValueError("unknown output: %r" % output)
+
+        key = ((operation, bool(kwargs.get('perturb'))), fingerprint(subject), fingerprint(clipper))
+        flats = self.get(key)
+        if flats is None:
+            flats = clip_polygon(subject, clipper, operation, cache=False, output='flat', **kwargs)
+            flats = tuple(flats)
+            self.put(key, flats)
+
+        if output == 'polygons':
+            clipped = []
+            for flat in flats:
+                poly = CompactPolygon()
+                poly.set_coordinates(flat[0::2], flat[1::2])
+                clipped.append(poly)
+            return clipped
+        elif output == 'points':
+            return [zip(flat[0::2], flat[1::2]) for flat in flats]
+        return [flat[:] for flat in flats]
+
+    def __repr__(self):
+        """Report of the cache usage, for debugging purposes."""
+        return "%d result(s), %d bytes: %d hit(s), %d miss(es), %d eviction(s)\n" % (
+            len(self.entries), self.bytes, self.hits, self.misses, self.evictions)
+
+
+# cache used by clip_polygon by default (see ClipCache)
+CLIP_CACHE = ClipCache()
+
+
+def segment_distance(px, py, ax, ay, bx, by):
+    """Return the distance from point p to the segment from a to b."""
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    if length:
+        t = ((px - ax) * dx + (py - ay) * dy) / length
+        if t > 1:
+            ax, ay = bx, by
+        elif t > 0:
+            ax, ay = ax + t * dx, ay + t * dy
+    return hypot(px - ax, py - ay)
+
+
+def farthest(points, a, b):
+    """Return (distance, index) of the point farthest from the segment between points a and b.
+
+    Only the points strictly between a and b along the ring are considered
+    (b may be len(points), for the first point); the index is -1 if there
+    are none.
+    """
+    n = len(points)
+    ax, ay = points[a % n]
+    bx, by = points[b % n]
+    best, index = -1.0, -1
+    for k in xrange(a + 1, b):
+        d = segment_distance(points[k][0], points[k][1], ax, ay, bx, by)
+        if d > best:
+            best, index = d, k
+    return best, index
+
+
+def simplify_douglas_peucker(points, tolerance):
+    """Return the indexes of the vertices of a ring kept by Douglas-Peucker simplification.
+
+    The ring is split at its first point and the point farthest from it,
+    and each half is simplified: a vertex is kept if it lies farther than
+    tolerance from the segment between the kept vertices around it. At
+    least three vertices are kept.
+    """
+    n = len(points)
+    if n <= 3:
+        return range(n)
+
+    x0, y0 = points[0]
+    split = max(xrange(1, n), key=lambda k: hypot(points[k][0] - x0, points[k][1] - y0))
+    kept = [0, split]
+    stack = [(0, split), (split, n)]
+    while stack:
+        a, b = stack.pop()
+        d, k = farthest(points, a, b)
+        if k >= 0 and d > tolerance:
+            kept.append(k)
+            stack.append((a, k))
+            stack.append((k, b))
+
+    if len(kept) < 3:
+        kept.append(max((farthest(points, 0, split), farthest(points, split, n)))[1])
+    kept.sort()
+    return kept
+
+
+def simplify_visvalingam(points, tolerance):
+    """Return the indexes of the vertices of a ring kept by Visvalingam-Whyatt simplification.
+
+    The vertex making the triangle of smallest area with its neighbours is
+    removed, and the areas of its neighbours updated, until all triangles
+    have an area of at least tolerance squared (a deviation of tolerance
+    over a base of twice as much). Areas never decrease as vertices are
+    removed, so that the order of removal is meaningful. At least three
+    vertices are kept.
+    """
+    n = len(points)
+    if n <= 3:
+        return range(n)
+
+    def area(k):
+        (ax, ay), (bx, by), (cx, cy) = points[prevs[k]], points[k], points[nexts[k]]
+        return abs((bx - ax) * (cy - ay) - (by - ay) * (cx - ax)) / 2
+
+    nexts = range(1, n) + [0]
+    prevs = [n - 1] + range(n - 1)
+    areas = [area(k) for k in xrange(n)]
+    heap = [(a, k) for k, a in enumerate(areas)]
+    heapify(heap)
+
+    threshold = tolerance * tolerance
+    removed = [False] * n
+    count = n
+    while heap and count > 3:
+        a, k = heappop(heap)
+        if removed[k] or a != areas[k]:
+            continue  # stale entry, updated since it was pushed
+        if a >= threshold:
+            break
+
+        removed[k] = True
+        count -= 1
+        prev, next = prevs[k], nexts[k]
+        nexts[prev], prevs[next] = next, prev
+        for j in (prev, next):
+            areas[j] = max(area(j), a)
+            heappush(heap, (areas[j], j))
+
+    return [k for k in xrange(n) if not removed[k]]
+
+
+def crossing_edges(points):
+    """Return the indexes of the edges of a ring that cross or touch others.
+
+    Edges sharing a vertex only count if they fold back over each other.
+    """
+    n = len(points)
+    contacts = []
+    bad = set()
+    for i, j, point, alphaS, alphaC in find_intersections_sweep(points, points, None, contacts):
+        bad.add(i)
+
+    for i, j in contacts:
+        if i == j:
+            continue
+        if (i + 1) % n == j or (j + 1) % n == i:
+            k = j if (i + 1) % n == j else i  # the shared vertex
+            (ax, ay), (bx, by), (cx, cy) = points[k - 1], points[k], points[(k + 1) % n]
+            if orient2d(ax, ay, bx, by, cx, cy) or (bx - ax) * (cx - bx) + (by - ay) * (cy - by) > 0:
+                continue
+        bad.add(i)
+        bad.add(j)
+    return bad
+
+
+def preserve_topology(points, kept):
+    """Add vertices back to a simplified ring until its edges don't cross each other.
+
+    kept are the sorted indexes of the vertices of points left by a
+    simplification. Each edge crossing or touching another one (see
+    crossing_edges) gets back the removed vertex farthest from it, until
+    there are none left (or only original edges cross, if the ring wasn't
+    simple to begin with). Return the new indexes.
+    """
+    n = len(points)
+    kept = list(kept)
+    while True:
+        bad = crossing_edges([points[k] for k in kept])
+        added = []
+        for e in bad:
+            a = kept[e]
+            b = kept[e + 1] if e + 1 < len(kept) else kept[0] + n
+            d, k = farthest(points, a, b)
+            if k >= 0:
+                added.append(k % n)
+        if not added:
+            return kept
+        kept = sorted(set(kept).union(added))
+
+
+SIMPLIFY_METHODS = {
+    'douglas-peucker': simplify_douglas_peucker,
+    'visvalingam': simplify_visvalingam,
+}
+
+
+def simplify_points(points, tolerance, method='douglas-peucker', topology=False):
+    """Simplify a ring of points, returning a new list of points.
+
+    The method is one of the names in SIMPLIFY_METHODS. If topology is
+    True, the simplified ring doesn't cross itself (see preserve_topology);
+    rings of different polygons may still cross.
+    """
+    try:
+        simplify = SIMPLIFY_METHODS[method]
+    except KeyError:
+        raise ValueError("unknown simplification method: %r" % method)
+
+    kept = simplify(points, tolerance)
+    if topology:
+        kept = preserve_topology(points, kept)
+    return [points[k] for k in kept]
+
+
+class Simplifier(object):
+    """Simplification applied to polygons before clipping them.
+
+    Given to clip_polygon (and the batch functions in polybatch) as the
+    simplify argument, and called with any kind of polygon accepted by
+    clip_polygon, returning a simplified CompactPolygon (see
+    simplify_points). Results are kept in a ClipCache (SIMPLIFY_CACHE
+    by default, or None), keyed on the options and the coordinates of the
+    polygon (see fingerprint), so a polygon used in many clips is only
+    simplified once.
+    """
+
+    def __init__(self, tolerance, method='douglas-peucker', topology=False, cache=True):
+        if method not in SIMPLIFY_METHODS:
+            raise ValueError("unknown simplification method: %r" % method)
+        self.tolerance = tolerance
+        self.method = method
+        self.topology = topology
+        self.cache = SIMPLIFY_CACHE if cache is True else cache
+
+    def __call__(self, polygon):
+        key = None
+        if self.cache is not None and self.cache is not False:
+            key = ((self.method, self.tolerance, self.topology), fingerprint(polygon), '')
+            flats = self.cache.get(key)
+            if flats is not None:
+                poly = CompactPolygon()
+                poly.set_coordinates(flats[0][0::2], flats[0][1::2])
+                return poly
+
+        points = simplify_points(list(getattr(polygon, 'points', polygon)),
+                                 self.tolerance, self.method, self.topology)
+        poly = CompactPolygon(points)
+        if key is not None:
+            self.cache.put(key, (poly.flat(),))
+        return poly
+
+    def __repr__(self):
+        return "Simplifier(%r, %r, %r)" % (self.tolerance, self.method, self.topology)
+
+
+def simplifier(simplify):
+    """Return a Simplifier from the simplify argument of clip_polygon.
+
+    It may be a Simplifier, a tolerance (for the default options), or None.
+    """
+    if simplify is None or isinstance(simplify, Simplifier):
+        return simplify
+    return Simplifier(simplify)
+
+
+# cache used by Simplifier by default
+SIMPLIFY_CACHE = ClipCache(maxsize=1024)
+
+
+def clip_polygon(subject, clipper, operation = 'difference', cache=True, simplify=None, **kwargs):
+    """Higher level function for clipping two polygons (from a list of points).
+
+    The polygons are built as CompactPolygon objects (see compact), and so
+    are the resulting ones. Extra keyword arguments (e.g., engine) are
+    passed on to CompactPolygon.clip.
+
+    Results are memoized in CLIP_CACHE, or in the given ClipCache. Pass
+    cache=False to always clip (also when CLIP_CACHE is set to None).
+
+    If simplify is given (a tolerance, or a Simplifier), both polygons are
+    simplified before clipping.
+    """
+    simplify = simplifier(simplify)
+    if simplify is not None:
+        subject, clipper = simplify(subject), simplify(clipper)
+
+    if cache is True:
+        cache = CLIP_CACHE
+    if cache is not None and cache is not False:
+        return cache.clip(subject, clipper, operation, **kwargs)
+
+    Subject, Clipper = compact(subject), compact(clipper)
+
+    clipped = Clipper.difference(Subject, **kwargs)\
     if operation == 'reversed-diff'\
-    else Subject.__getattribute__(operation)(Clipper)
+    else Subject.__getattribute__(operation)(Clipper, **kwargs)
 
     return clipped
 
 
+# result of each operation on polygons a and b whose boundaries don't
+# cross, when a is inside b, b is inside a, or they're disjoint; holes
+# are returned as separate polygons, as by the algorithm
+CONTAINED = {
+    'intersection': {'inside': 'a', 'contains': 'b', 'disjoint': ''},
+    'union': {'inside': 'b', 'contains': 'a', 'disjoint': 'ab'},
+    'difference': {'inside': '', 'contains': 'ab', 'disjoint': 'a'},
+    'reversed-diff': {'inside': 'ba', 'contains': '', 'disjoint': 'b'},
+}
+
+
+def contained_relation(a, b, perturb=False, reverse=False):
+    """Tell how polygon a lies with respect to b, when their boundaries don't cross.
+
+    Return 'inside', 'contains' or 'disjoint' (see CONTAINED). Both are
+    polygons with points and is_inside (e.g., CompactPolygon or
+    PreparedPolygon). With perturb, points on the other boundary are
+    decided as a clip with perturb=True decides them, with b moved, or a
+    if reverse is true (as in a reversed difference): see
+    is_inside_perturbed.
+    """
+    (ax, ay), (bx, by) = a.points[0], b.points[0]
+    if perturb:
+        shift = 1 if reverse else -1
+        if is_inside_perturbed(b.points, ax, ay, shift):
+            return 'inside'
+        if is_inside_perturbed(a.points, bx, by, -shift):
+            return 'contains'
+    else:
+        if b.is_inside(ax, ay):
+            return 'inside'
+        if a.is_inside(bx, by):
+            return 'contains'
+    return 'disjoint'
+
+
+def clip_metrics(subject, clipper, operation='intersection', simplify=None, **kwargs):
+    """Measure the result of clipping two polygons, without building it.
+
+    Return a ClipMetrics object with the number of pieces, their area,
+    perimeter and bounding box, accumulated during the last phase of the
+    clip (see CompactPolygon.measure). The polygons may be of any kind
+    accepted by clip_polygon; results aren't cached.
+
+    Unlike clip_polygon, polygons whose boundaries don't cross are
+    measured as the pieces of the actual result (see CONTAINED): e.g.,
+    the intersection of disjoint polygons is empty. Both polygons are
+    simplified first if simplify is given, as in clip_polygon. Extra
+    keyword arguments are passed on to CompactPolygon.clip.
+    """
+    if operation not in CONTAINED:
+        raise ValueError("unknown operation: %r" % operation)
+
+    simplify = simplifier(simplify)
+    if simplify is not None:
+        subject, clipper = simplify(subject), simplify(clipper)
+
+    Subject, Clipper = compact(subject), compact(clipper)
+    if operation == 'reversed-diff':
+        metrics = Clipper.difference(Subject, output='metrics', **kwargs)
+    else:
+        metrics = getattr(Subject, operation)(Clipper, output='metrics', **kwargs)
+    if metrics.intersections:
+        return metrics
+
+    a, b = Subject.points, Clipper.points
+    relation = contained_relation(Subject, Clipper, kwargs.get('perturb'),
+                                  operation == 'reversed-diff')
+    metrics = ClipMetrics()
+    for k, p in enumerate(CONTAINED[operation][relation]):
+        # the second of two nested polygons is a hole in the first
+        metrics.add_points({'a': a, 'b': b}[p], hole=k > 0 and relation != 'disjoint')
+    return metrics
+
+
+def clip_area(subject, clipper, operation='intersection', **kwargs):
+    """Return the area of the result of clipping two polygons (see clip_metrics)."""
+    return clip_metrics(subject, clipper, operation, **kwargs).area
+
+
+def overlap_fraction(subject, clipper, **kwargs):
+    """Return the fraction of the subject's area covered by the clipper (0 to 1)."""
+    area = abs(signed_area(list(getattr(subject, 'points', subject))))
+    if not area:
+        return 0.0
+    return clip_area(subject, clipper, 'intersection', **kwargs) / area
+
+
 def parse_polygon(input_str):
     """construct a polygon based on a string.
 
@@ -0,0 +1,506 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+#
+# Efficient Clipping of Arbitrary Polygons
+#
+# Copyright (c) 2011, 2012 Helder Correia <helder.mc@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Local clipping service
+
+Serve clip_polygon on a Unix socket (or a localhost TCP port), so that
+short lived programs don't pay for starting Python and forking workers
+to clip a few polygons: the server keeps a pool of worker processes
+warm, and the clippers registered with it resident in the workers, by id.
+
+Every message is a frame: a uint32 length, followed by that many bytes.
+Polygons are a uint32 number of points followed by their float64 x, y
+pairs. Both ends run on the same machine, so everything is in its
+native byte order. A request starts with a command and a clipper id
+(uint64):
+
+    'R' id polygon              register a clipper (replacing any other)
+    'D' id                      drop a clipper
+    'C' id op count polygons    clip count subjects against a clipper,
+                                op being an index into OPERATIONS
+
+A response starts with 'K' (followed, for 'C', by the number of pieces
+of each subject, as uint32, and all the pieces, as polygons), or with
+'E' and an error message.
+
+Each connection is served by a thread, which splits a batch into chunks
+for the workers. No more than max_pending chunks are in the workers at
+once: past that, threads stop reading requests, so clients are slowed
+down by their sockets instead of piling up work in the server.
+
+Example:
+
+    polyserve.py --socket /tmp/polyclip.sock
+
+    client = ClipClient('/tmp/polyclip.sock')
+    client.register(1, district)
+    pieces = client.clip(parcels, 1, 'intersection')
+
+Requires Python 2.6 or later (multiprocessing).
+"""
+
+import math
+import os
+import random
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from array import array
+from multiprocessing import Pool, cpu_count
+from optparse import OptionParser
+from SocketServer import StreamRequestHandler, TCPServer, ThreadingMixIn, UnixStreamServer
+
+from polybatch import pack, unpack
+from polygon import CompactPolygon, OUTPUTS, PreparedPolygon, clip_polygon
+
+
+OPERATIONS = ('union', 'intersection', 'difference', 'reversed-diff')
+
+FRAME = struct.Struct('=I')
+HEADER = struct.Struct('=cQ')
+CLIP = struct.Struct('=BI')
+COUNT = struct.Struct('=I')
+
+# largest frame accepted, in bytes
+MAX_FRAME = 1 << 30
+
+
+class ServiceError(Exception):
+    """Error reported by the server for a request."""
+
+
+def read_frame(stream):
+    """Read a frame from a file-like stream, returning its bytes (None at the end)."""
+    header = stream.read(FRAME.size)
+    if len(header) < FRAME.size:
+        return None
+    size = FRAME.unpack(header)[0]
+    if size > MAX_FRAME:
+        raise ValueError("frame too large: %d bytes" % size)
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return data
+
+
+def frame(*parts):
+    """Return the frame for a message made of the given strings."""
+    data = ''.join(parts)
+    return FRAME.pack(len(data)) + data
+
+
+def write_polygon(parts, packed):
+    """Append a polygon, packed as by polybatch.pack, to a list of strings."""
+    parts.append(COUNT.pack(len(packed) // 16))
+    parts.append(packed)
+
+
+def read_polygons(data, offset, count):
+    """Read count polygons from data, as packed strings; return them and the new offset."""
+    polygons = []
+    for k in xrange(count):
+        n = COUNT.unpack_from(data, offset)[0]
+        offset += COUNT.size
+        polygons.append(data[offset:offset + 16 * n])
+        offset += 16 * n
+    if offset > len(data):
+        raise ValueError("truncated polygon data")
+    return polygons, offset
+
+
+# state of a worker process: clipper id -> (generation, PreparedPolygon)
+worker_clippers = {}
+worker_options = {}
+
+# number of clippers kept in a worker, before they're all dropped
+WORKER_CLIPPERS = 256
+
+
+def init_service_worker(options):
+    """Set up a worker process with the clip options, and warm it up with a clip."""
+    global worker_options
+    worker_options = dict(options)
+    worker_options.pop('cache', None)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the server stops the pool
+    clip_polygon([(0, 0), (2, 0), (2, 2), (0, 2)], [(1, 1), (3, 1), (3, 3), (1, 3)],
+                 'intersection', cache=False)
+
+
+def clip_chunk(task):
+    """Clip a chunk of subjects against a resident clipper, in a worker.
+
+    A task is (clipper id, generation, clipper, operation, subjects), with
+    packed polygons. The clipper is None if the worker is expected to have
+    it already. Return ('ok', pieces) with a list of packed pieces for
+    each subject, ('missing', None) if the clipper must be sent, or
+    ('error', message). Never raises, so that a slot is always released
+    (see ClipService.submit).
+    """
+    clipper_id, generation, clipper, operation, subjects = task
+    try:
+        entry = worker_clippers.get(clipper_id)
+        if entry is None or entry[0] != generation:
+            if clipper is None:
+                return 'missing', None
+            if len(worker_clippers) >= WORKER_CLIPPERS:
+                worker_clippers.clear()
+            entry = worker_clippers[clipper_id] = (generation, PreparedPolygon(unpack(clipper)))
+
+        pieces = []
+        for subject in subjects:
+            # subjects are seldom clipped twice, so results aren't cached
+            clipped = clip_polygon(CompactPolygon.from_buffer(subject), entry[1], operation,
+                                   cache=False, output='flat', **worker_options)
+            pieces.append([flat.tostring() for flat in clipped])
+        return 'ok', pieces
+    except Exception, e:
+        return 'error', "%s: %s" % (e.__class__.__name__, e)
+
+
+class ClipService(object):
+    """State of a server: the worker pool and the registered clippers.
+
+    Clippers are kept packed in the server, with a generation number that
+    changes each time one is registered. Workers build a PreparedPolygon
+    the first time they clip against a clipper (asking for it, see
+    clip_chunk), and keep it for the next requests.
+
+    The number of worker processes defaults to the number of CPUs, and
+    max_pending (the chunks sent to the workers at once) to four times
+    that. Extra keyword arguments are passed on to clip_polygon (results
+    aren't cached).
+    """
+
+    def __init__(self, workers=None, max_pending=None, chunksize=16, **options):
+        workers = workers or cpu_count()
+        self.pool = Pool(workers, init_service_worker, (options,))
+        self.slots = threading.BoundedSemaphore(max_pending or 4 * workers)
+        self.chunksize = chunksize
+        self.clippers = {}  # id -> (generation, packed polygon)
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def register(self, clipper_id, packed):
+        if len(packed) < 3 * 16:
+            raise ValueError("a clipper needs at least 3 points")
+        with self.lock:
+            self.generation += 1
+            self.clippers[clipper_id] = (self.generation, packed)
+
+    def drop(self, clipper_id):
+        with self.lock:
+            if self.clippers.pop(clipper_id, None) is None:
+                raise KeyError("unknown clipper: %d" % clipper_id)
+
+    def submit(self, task):
+        """Send a task to the pool, once a slot is free; return its AsyncResult."""
+        self.slots.acquire()
+        return self.pool.apply_async(clip_chunk, (task,), callback=lambda result: self.slots.release())
+
+    def clip(self, clipper_id, operation, subjects):
+        """Clip packed subjects against a registered clipper; return the packed pieces of each."""
+        with self.lock:
+            entry = self.clippers.get(clipper_id)
+        if entry is None:
+            raise KeyError("unknown clipper: %d" % clipper_id)
+        generation, packed = entry
+
+        chunks = [subjects[k:k + self.chunksize] for k in xrange(0, len(subjects), self.chunksize)]
+        pending = [self.submit((clipper_id, generation, None, operation, chunk)) for chunk in chunks]
+
+        pieces = []
+        for chunk, result in zip(chunks, pending):
+            status, value = result.get()
+            if status == 'missing':
+                status, value = self.submit((clipper_id, generation, packed, operation, chunk)).get()
+            if status == 'error':
+                raise ValueError(value)
+            pieces.extend(value)
+        return pieces
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+class ClipHandler(StreamRequestHandler):
+    """Serve the requests of a connection, one at a time, until it's closed."""
+
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                data = read_frame(self.rfile)
+            except ValueError, e:
+                self.wfile.write(frame('E', str(e)))
+                return
+            if data is None:
+                return
+
+            try:
+                command, clipper_id = HEADER.unpack_from(data)
+                if command == 'R':
+                    service.register(clipper_id, read_polygons(data, HEADER.size, 1)[0][0])
+                    response = frame('K')
+                elif command == 'D':
+                    service.drop(clipper_id)
+                    response = frame('K')
+                elif command == 'C':
+                    op, count = CLIP.unpack_from(data, HEADER.size)
+                    if op >= len(OPERATIONS):
+                        raise ValueError("unknown operation: %d" % op)
+                    subjects = read_polygons(data, HEADER.size + CLIP.size, count)[0]
+                    pieces = service.clip(clipper_id, OPERATIONS[op], subjects)
+                    parts = ['K'] + [COUNT.pack(len(p)) for p in pieces]
+                    for packed in (packed for p in pieces for packed in p):
+                        write_polygon(parts, packed)
+                    response = frame(*parts)
+                else:
+                    raise ValueError("unknown command: %r" % command)
+            except KeyError, e:
+                response = frame('E', e.args[0])
+            except (ValueError, struct.error), e:
+                response = frame('E', str(e))
+
+            self.wfile.write(response)
+            self.wfile.flush()
+
+
+class UnixClipServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class TCPClipServer(ThreadingMixIn, TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(address, service):
+    """Create a server for a ClipService on a Unix socket path, or a (host, port) address."""
+    if isinstance(address, basestring):
+        if os.path.exists(address):
+            os.unlink(address)
+        server = UnixClipServer(address, ClipHandler)
+    else:
+        server = TCPClipServer(address, ClipHandler)
+    server.service = service
+    return server
+
+
+class ClipClient(object):
+    """Client of a clipping server, on a Unix socket path or a (host, port) address.
+
+    Requests are sent one at a time; use a client per thread.
+    """
+
+    def __init__(self, address):
+        family = socket.AF_UNIX if isinstance(address, basestring) else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(address)
+        self.stream = self.socket.makefile('rb')
+
+    def request(self, *parts):
+        """Send a request and return its response (after the status), or raise ServiceError."""
+        self.socket.sendall(frame(*parts))
+        data = read_frame(self.stream)
+        if data is None:
+            raise ServiceError("connection closed by the server")
+        if data[:1] == 'E':
+            raise ServiceError(data[1:])
+        return data[1:]
+
+    def register(self, clipper_id, clipper):
+        """Register a clipper (any kind of polygon with points) under an id."""
+        parts = [HEADER.pack('R', clipper_id)]
+        write_polygon(parts, pack(getattr(clipper, 'points', clipper)))
+        self.request(*parts)
+
+    def drop(self, clipper_id):
+        """Drop a registered clipper."""
+        self.request(HEADER.pack('D', clipper_id))
+
+    def clip(self, subjects, clipper_id, operation='difference', output='points'):
+        """Clip many subjects against a registered clipper.
+
+        Return a list with the pieces of each subject, as lists of points,
+        or as given by the output (see CompactPolygon.clip).
+        """
+        if output not in OUTPUTS:
+            raise ValueError("unknown output: %r" % output)
+        if operation not in OPERATIONS:
+            raise ValueError("unknown operation: %r" % operation)
+
+        subjects = [pack(getattr(s, 'points', s)) for s in subjects]
+        parts = [HEADER.pack('C', clipper_id), CLIP.pack(OPERATIONS.index(operation), len(subjects))]
+        for packed in subjects:
+            write_polygon(parts, packed)
+        data = self.request(*parts)
+
+        counts = array('I')
+        counts.fromstring(data[:COUNT.size * len(subjects)])
+        pieces = read_polygons(data, COUNT.size * len(subjects), sum(counts))[0]
+        if output == 'polygons':
+            pieces = [CompactPolygon.from_buffer(p) for p in pieces]
+        elif output == 'points':
+            pieces = [unpack(p) for p in pieces]
+        else:
+            flats = []
+            for p in pieces:
+                flats.append(array('d'))
+                flats[-1].fromstring(p)
+            pieces = flats
+
+        results, offset = [], 0
+        for count in counts:
+            results.append(pieces[offset:offset + count])
+            offset += count
+        return results
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(address, clients=8, requests=100, batch=16, size=64, operation='intersection', seed=0):
+    """Run a load test against a server, from threads each with its own client.
+
+    Each client sends requests batches of batch random star-shaped subjects
+    of size vertices, clipped against a shared clipper. Return the
+    latencies of all requests (in seconds, sorted) and the total time.
+    """
+    rnd = random.Random(seed)
+
+    def star(n, dx, dy):
+        points = []
+        for i in xrange(n):
+            a, r = 2 * math.pi * i / n, 0.25 + 0.25 * rnd.random()
+            points.append((dx + r * math.cos(a), dy + r * math.sin(a)))
+        return points
+
+    with ClipClient(address) as client:
+        client.register(0, star(size, 0.5, 0.5))
+    batches = [[star(size, rnd.random(), rnd.random()) for k in xrange(batch)]
+               for k in xrange(min(requests, 16))]
+
+    latencies = []
+
+    def run():
+        with ClipClient(address) as client:
+            times = []
+            for k in xrange(requests):
+                start = time.time()
+                client.clip(batches[k % len(batches)], 0, operation)
+                times.append(time.time() - start)
+            latencies.extend(times)
+
+    threads = [threading.Thread(target=run) for k in xrange(clients)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    latencies.sort()
+    return latencies, elapsed
+
+
+def percentile(values, p):
+    """Return the p-th percentile (0 to 100) of a sorted list of values."""
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+class Arguments(object):
+    """Define and parse command line arguments."""
+
+    def __init__(self, *args, **kwargs):
+        self.parser = OptionParser(*args, **kwargs)
+
+        self.add_option("--socket", metavar="PATH",
+                        help="listen on (or connect to) a Unix socket at PATH")
+        self.add_option("--port", type="int",
+                        help="listen on (or connect to) a TCP port on localhost")
+        self.add_option("--workers", type="int", default=None,
+                        help="worker processes [default: number of CPUs]")
+        self.add_option("--max-pending", type="int", default=None,
+                        help="chunks of polygons sent to the workers at once "
+                             "[default: 4 per worker]")
+        self.add_option("--chunksize", type="int", default=16,
+                        help="polygons per chunk [default: %default]")
+        self.add_option("--engine", default=None,
+                        help="intersection engine (see polygon.ENGINES)")
+        self.add_option("--bench", action="store_true", default=False,
+                        help="run a load test against a running server, instead of serving")
+        self.add_option("--clients", type="int", default=8,
+                        help="concurrent clients of the load test [default: %default]")
+        self.add_option("--requests", type="int", default=100,
+                        help="requests per client [default: %default]")
+        self.add_option("--batch", type="int", default=16,
+                        help="polygons per request [default: %default]")
+        self.add_option("--size", type="int", default=64,
+                        help="vertices per polygon [default: %default]")
+
+    def add_option(self, *args, **kwargs):
+        self.parser.add_option(*args, **kwargs)
+
+    def parse_args(self, args):
+        options, args = self.parser.parse_args(args)
+        if (options.socket is None) == (options.port is None):
+            self.parser.error("either --socket or --port is required")
+        options.address = options.socket or ('127.0.0.1', options.port)
+        return options, args
+
+
+if __name__ == '__main__':
+    options = Arguments().parse_args(sys.argv[1:])[0]
+
+    if options.bench:
+        latencies, elapsed = load(options.address, options.clients, options.requests,
+                                  options.batch, options.size)
+        print "%d requests of %d polygons in %.3fs" % (len(latencies), options.batch, elapsed)
+        print "  throughput  %10.1f requests/s  %10.1f polygons/s" % (
+            len(latencies) / elapsed, len(latencies) * options.batch / elapsed)
+        print "  latency     p50 %.2fms  p99 %.2fms  max %.2fms" % (
+            1000 * percentile(latencies, 50), 1000 * percentile(latencies, 99), 1000 * latencies[-1])
+        sys.exit(0)
+
+    kwargs = {'engine': options.engine} if options.engine else {}
+    service = ClipService(options.workers, options.max_pending, options.chunksize, **kwargs)
+    server = make_server(options.address, service)
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if options.socket:
+            os.unlink(options.socket)
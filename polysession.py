@@ -0,0 +1,355 @@
+# -*- coding: UTF-8 -*-
+# Efficient Clipping of Arbitrary Polygons
+#
+# Copyright (c) 2011, 2012 Helder Correia <helder.mc@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Incremental clipping
+
+A clip session keeps two polygons, the intersections between their edges
+and an index of their edges, so that when a vertex is moved, inserted or
+deleted, only the intersections of the edges touching it are found
+again, against the edges of the other polygon near them.
+
+Intersections are labelled as entry or exit points locally, from the
+direction in which the edges cross and the orientation of the polygons
+(kept up to date on each edit), instead of by alternating them along
+each polygon. For simple polygons, both give the same labels, so an edit
+never needs to re-label intersections other than its own.
+
+Example:
+
+    session = ClipSession(subject, clipper, 'intersection')
+    session.move_vertex('clipper', 3, (4.5, 2.0))
+    clipped = session.result()
+
+The polygons must be simple (not self-intersecting).
+"""
+
+from array import array
+from math import floor
+
+from polygon import CompactPolygon, OUTPUTS, intersect_segments
+
+# (s_entry, c_entry) of each operation, as given to clip
+OPERATIONS = {
+    'union': (False, False),
+    'intersection': (True, True),
+    'difference': (False, True),
+    'reversed-diff': (False, True),
+}
+
+
+class Ring(object):
+    """Editable polygon with stable vertex ids, and a grid index of its edges.
+
+    Vertices are identified by ids that don't change when other vertices
+    are inserted or deleted. Each edge is identified by the id of the
+    vertex it starts from.
+    """
+
+    def __init__(self, points, cell_size):
+        self.cell_size = cell_size
+        self.ids = range(len(points))          # vertex ids, in order
+        self.points = dict(enumerate((float(p[0]), float(p[1])) for p in points))
+        self.nexts = dict((k, k + 1) for k in self.ids)
+        self.prevs = dict((k, k - 1) for k in self.ids)
+        self.nexts[len(points) - 1] = 0
+        self.prevs[0] = len(points) - 1
+        self.new_id = len(points)
+        self.area = 0.0     # twice the signed area
+        self.grid = {}      # cell -> set of edges crossing it
+        self.crossings = {} # edge -> set of keys of the intersections on it
+
+        for k in self.ids:
+            self.add_edge(k)
+
+    @property
+    def head(self):
+        return self.ids[0]
+
+    def edge(self, k):
+        """Return the coordinates of an edge, as (x1, y1, x2, y2)."""
+        return self.points[k] + self.points[self.nexts[k]]
+
+    def cells(self, k):
+        """Return the grid cells crossed by an edge (with a small margin, for rounding)."""
+        x1, y1, x2, y2 = self.edge(k)
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        size = self.cell_size
+        margin = size * 1e-9
+        slope = (y2 - y1) / (x2 - x1) if x2 != x1 else 0.0
+
+        cells = []
+        for cx in xrange(int(floor(x1 / size)), int(floor(x2 / size)) + 1):
+            # part of the edge in this column of cells
+            ya = y1 + (max(x1, cx * size) - x1) * slope
+            yb = y1 + (min(x2, (cx + 1) * size) - x1) * slope if x2 != x1 else y2
+            low, high = min(ya, yb) - margin, max(ya, yb) + margin
+            for cy in xrange(int(floor(low / size)), int(floor(high / size)) + 1):
+                cells.append((cx, cy))
+        return cells
+
+    def add_edge(self, k):
+        x1, y1, x2, y2 = self.edge(k)
+        self.area += x1 * y2 - x2 * y1
+        for cell in self.cells(k):
+            self.grid.setdefault(cell, set()).add(k)
+        self.crossings[k] = set()
+
+    def remove_edge(self, k):
+        x1, y1, x2, y2 = self.edge(k)
+        self.area -= x1 * y2 - x2 * y1
+        for cell in self.cells(k):
+            edges = self.grid[cell]
+            edges.discard(k)
+            if not edges:
+                del self.grid[cell]
+        return self.crossings.pop(k)
+
+    def near(self, cells):
+        """Return the edges crossing any of the given grid cells."""
+        edges = set()
+        for cell in cells:
+            edges.update(self.grid.get(cell, ()))
+        return edges
+
+    def ring(self):
+        """Return the points in order, as a list of tuples."""
+        return [self.points[k] for k in self.ids]
+
+
+class ClipSession(object):
+    """Clip two polygons incrementally, while their vertices are edited.
+
+    Each edit (move_vertex, insert_vertex or delete_vertex) only updates
+    the intersections of the one or two edges it changes, testing them
+    against the edges of the other polygon in the same cells of a grid,
+    so its cost depends on the edit, not on the size of the polygons.
+    Calling result() then builds the clipped polygons from the
+    intersections, in time proportional to them and to the output (plus
+    a pass over the vertex ids of the subject, to walk the intersections
+    in the same order as clip_polygon).
+
+    Vertices are given by their index in a polygon, 'subject' or
+    'clipper', as in the list of points it was created with (and shifted
+    by insertions and deletions).
+    """
+
+    def __init__(self, subject, clipper, operation='difference', cell_size=None):
+        if operation not in OPERATIONS:
+            raise ValueError("unknown operation: %r" % operation)
+        self.operation = operation
+
+        if cell_size is None:
+            lengths = []
+            for points in (subject, clipper):
+                for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+                    lengths.append(abs(x2 - x1) + abs(y2 - y1))
+            cell_size = float(sum(lengths)) / len(lengths) or 1.0
+
+        self.subject = Ring(subject, cell_size)
+        self.clipper = Ring(clipper, cell_size)
+
+        # the clip walks the first polygon (the subject, except for
+        # 'reversed-diff') from its intersections; they're keyed by the
+        # edges of the first and second polygons, as (first, second)
+        self.first, self.second = self.subject, self.clipper
+        if operation == 'reversed-diff':
+            self.first, self.second = self.clipper, self.subject
+        self.hits = {}  # (first edge, second edge) -> (x, y, alpha first, alpha second, den)
+
+        for k in self.first.ids:
+            self.find(self.first, k)
+
+    def find(self, ring, k):
+        """Find the intersections of an edge of one ring with the edges of the other one."""
+        first = ring is self.first
+        other = self.second if first else self.first
+        for j in other.near(ring.cells(k)):
+            key = (k, j) if first else (j, k)
+            s1x, s1y, s2x, s2y = self.first.edge(key[0])
+            c1x, c1y, c2x, c2y = self.second.edge(key[1])
+            hit = intersect_segments(s1x, s1y, s2x, s2y, c1x, c1y, c2x, c2y)
+            if hit:
+                (x, y), alphaS, alphaC = hit
+                den = (c2y - c1y) * (s2x - s1x) - (c2x - c1x) * (s2y - s1y)
+                self.hits[key] = (x, y, alphaS, alphaC, den)
+                self.first.crossings[key[0]].add(key)
+                self.second.crossings[key[1]].add(key)
+
+    def forget(self, ring, k):
+        """Remove an edge of a ring, with its intersections."""
+        first = ring is self.first
+        other = self.second if first else self.first
+        for key in ring.remove_edge(k):
+            del self.hits[key]
+            other.crossings[key[first]].discard(key)
+
+    def polygon(self, which):
+        if which not in ('subject', 'clipper'):
+            raise ValueError("unknown polygon: %r" % which)
+        return getattr(self, which)
+
+    def move_vertex(self, which, index, point):
+        """Move a vertex of a polygon to a new point."""
+        ring = self.polygon(which)
+        k = ring.ids[index]
+        prev = ring.prevs[k]
+        self.forget(ring, prev)
+        self.forget(ring, k)
+        ring.points[k] = (float(point[0]), float(point[1]))
+        for edge in (prev, k):
+            ring.add_edge(edge)
+            self.find(ring, edge)
+
+    def insert_vertex(self, which, index, point):
+        """Insert a vertex in a polygon, before the one at index (as list.insert)."""
+        ring = self.polygon(which)
+        n = len(ring.ids)
+        k = ring.ids[index % n if index < n else 0]
+        prev = ring.prevs[k]
+        self.forget(ring, prev)
+
+        new = ring.new_id
+        ring.new_id += 1
+        ring.points[new] = (float(point[0]), float(point[1]))
+        ring.nexts[prev], ring.prevs[new] = new, prev
+        ring.nexts[new], ring.prevs[k] = k, new
+        ring.ids.insert(index, new)
+
+        for edge in (prev, new):
+            ring.add_edge(edge)
+            self.find(ring, edge)
+
+    def delete_vertex(self, which, index):
+        """Delete a vertex from a polygon (which must keep at least three)."""
+        ring = self.polygon(which)
+        if len(ring.ids) <= 3:
+            raise ValueError("a polygon needs at least three vertices")
+
+        k = ring.ids.pop(index)
+        prev, next = ring.prevs[k], ring.nexts[k]
+        self.forget(ring, prev)
+        self.forget(ring, k)
+        ring.nexts[prev], ring.prevs[next] = next, prev
+        del ring.points[k], ring.nexts[k], ring.prevs[k]
+
+        ring.add_edge(prev)
+        self.find(ring, prev)
+
+    def entry(self, ring, key, entry):
+        """Label an intersection of one of the rings as an entry point.
+
+        The first ring enters the second one where it crosses an edge of
+        it from its outside to its inside, which is on the left side of
+        the edge if the second ring is counter-clockwise. Likewise for the
+        second ring.
+        """
+        den = self.hits[key][4]
+        if ring is self.first:
+            enters = den * self.second.area < 0
+        else:
+            enters = den * self.first.area > 0
+        return enters == entry
+
+    def walk(self, ring, key, forward, flat, sorted_crossings):
+        """Append the points along a ring from an intersection up to the next one, and return it."""
+        side = 0 if ring is self.first else 1
+        k = key[side]
+        hits = self.hits
+        crossings = sorted_crossings.get((side, k))
+        if crossings is None:
+            crossings = sorted(ring.crossings[k], key=lambda h: hits[h][2 + side])
+            sorted_crossings[side, k] = crossings
+
+        position = crossings.index(key)
+        while True:
+            position += 1 if forward else -1
+            if 0 <= position < len(crossings):
+                x, y = hits[crossings[position]][:2]
+                flat.append(x)
+                flat.append(y)
+                return crossings[position]
+
+            if forward:
+                k = ring.nexts[k]
+                x, y = ring.points[k]
+            else:
+                x, y = ring.points[k]
+                k = ring.prevs[k]
+            flat.append(x)
+            flat.append(y)
+
+            crossings = sorted_crossings.get((side, k))
+            if crossings is None:
+                crossings = sorted(ring.crossings[k], key=lambda h: hits[h][2 + side])
+                sorted_crossings[side, k] = crossings
+            position = -1 if forward else len(crossings)
+
+    def result(self, output='points'):
+        """Return the clipped polygons, as clip_polygon would, in the given output.
+
+        The output is 'points' for lists of (x, y) tuples (the default),
+        'flat' for arrays of x, y pairs (array('d')) or 'polygons' for
+        CompactPolygon objects.
+        """
+        if output not in OUTPUTS:
+            raise ValueError("unknown output: %r" % output)
+
+        first, second = self.first, self.second
+        entries = {first: OPERATIONS[self.operation][0], second: OPERATIONS[self.operation][1]}
+
+        # phase three of the algorithm, walking the rings from each
+        # intersection of the first polygon still unchecked, in order
+        # along it (which decides the direction of the output)
+        position = dict((k, i) for i, k in enumerate(first.ids))
+        hits = self.hits
+        starts = sorted(hits, key=lambda h: (position[h[0]], hits[h][2]))
+
+        list, checked, sorted_crossings = [], set(), {}
+        for start in starts:
+            if start in checked:
+                continue
+
+            ring, current = first, start
+            flat = array('d', hits[start][:2])
+            while True:
+                checked.add(current)
+                forward = self.entry(ring, current, entries[ring])
+                current = self.walk(ring, current, forward, flat, sorted_crossings)
+                ring = second if ring is first else first
+                if current in checked:
+                    break
+
+            list.append(flat)
+
+        if not list:
+            flat = array('d')
+            for x, y in first.ring():
+                flat.append(x)
+                flat.append(y)
+            list.append(flat)
+
+        if output == 'polygons':
+            for k, flat in enumerate(list):
+                list[k] = CompactPolygon()
+                list[k].set_coordinates(flat[0::2], flat[1::2])
+        elif output == 'points':
+            list = [zip(flat[0::2], flat[1::2]) for flat in list]
+
+        return list
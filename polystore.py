@@ -0,0 +1,179 @@
+# -*- coding: UTF-8 -*-
+# Efficient Clipping of Arbitrary Polygons
+#
+# Copyright (c) 2011, 2012 Helder Correia <helder.mc@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Binary polygon store
+
+A simple file format for large collections of polygons, read through
+mmap so that any polygon can be accessed without loading the file:
+
+    header      magic "PCLP", byte order ('l' or 'b'), 3 padding bytes,
+                number of polygons (uint64), offsets table position (uint64)
+    coordinates float64 x, y pairs of all polygons, one after the other
+    offsets     int64 vertex offset of each polygon in the coordinates,
+                plus the total number of vertices at the end
+
+Coordinates are stored in the byte order of the machine that wrote them.
+
+Example:
+
+    writer = PolygonWriter('parcels.pclp')
+    for points in parcels:
+        writer.write(points)
+    writer.close()
+
+    store = PolygonStore('parcels.pclp')
+    clipped = clip_polygon(store[42], district, 'intersection')
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from polygon import CompactPolygon
+
+
+MAGIC = 'PCLP'
+HEADER = struct.Struct('<4sc3xQQ')
+BYTEORDER = sys.byteorder[0]
+
+
+class PolygonWriter(object):
+    """Write polygons to a new store file, one at a time."""
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, BYTEORDER, 0, 0))
+        self.offsets = array('l', [0])
+
+    def write(self, points):
+        """Append a polygon (a list of points or a PolygonView) and return its index."""
+        if isinstance(points, PolygonView):
+            self.file.write(points.buffer)
+            count = len(points)
+        else:
+            flat = array('d')
+            for x, y in points:
+                flat.append(x)
+                flat.append(y)
+            flat.tofile(self.file)
+            count = len(flat) // 2
+
+        self.offsets.append(self.offsets[-1] + count)
+        return len(self.offsets) - 2
+
+    def close(self):
+        """Write the offsets table and the header, and close the file."""
+        position = self.file.tell()
+        for start in xrange(0, len(self.offsets), 65536):
+            chunk = self.offsets[start:start + 65536]
+            self.file.write(struct.pack('<%dq' % len(chunk), *chunk))
+
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, BYTEORDER, len(self.offsets) - 1, position))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PolygonStore(object):
+    """Read-only, random access to the polygons in a store file, through mmap."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, byteorder, self.count, self.offsets = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError("not a polygon store: %s" % path)
+        if byteorder != BYTEORDER:
+            raise ValueError("polygon store in a different byte order: %s" % path)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """Return a PolygonView of the polygon at the given index."""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("polygon index out of range")
+
+        start, end = struct.unpack_from('<2q', self.map, self.offsets + 8 * index)
+        return PolygonView(self.map, HEADER.size + 16 * start, end - start)
+
+    def __iter__(self):
+        for index in xrange(self.count):
+            yield self[index]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PolygonView(object):
+    """Zero-copy view of a polygon in a store.
+
+    It can be given to clip_polygon, or anything else that takes a list of
+    points. The buffer attribute exposes the raw x, y pairs, and coords a
+    NumPy array over them, when NumPy is installed; neither copies data.
+    """
+
+    def __init__(self, map, offset, count):
+        self.buffer = buffer(map, offset, 16 * count)
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.points)
+
+    @property
+    def coords(self):
+        """Return a (n, 2) NumPy array over the coordinates (None without NumPy)."""
+        if numpy is None:
+            return None
+        return numpy.frombuffer(self.buffer, dtype=float).reshape(-1, 2)
+
+    @property
+    def points(self):
+        """Return the polygon's points as a list of tuples (ordered coordinates pair)."""
+        flat = array('d')
+        flat.fromstring(self.buffer)
+        return zip(flat[0::2], flat[1::2])
+
+    def polygon(self):
+        """Return a new CompactPolygon with the points of this one, to be clipped."""
+        return CompactPolygon.from_buffer(self.buffer)
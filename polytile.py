@@ -0,0 +1,166 @@
+# -*- coding: UTF-8 -*-
+# Efficient Clipping of Arbitrary Polygons
+#
+# Copyright (c) 2011, 2012 Helder Correia <helder.mc@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Grid tiling of polygons
+
+Split a polygon into the cells of a regular, axis-aligned grid, as if it
+was clipped ('intersection') against every cell, in a single pass over
+its edges instead of one clip per cell.
+
+The polygon is first cut into columns along the vertical grid lines,
+then each column into cells along the horizontal ones. Each cut walks
+the edges once, breaking them into chains where they cross a grid line,
+and buckets the crossings by grid line. Sorted along their line, the
+crossings pair up into the intervals of the line inside the polygon,
+which tell how the chains on each side are joined into rings.
+
+Example:
+
+    tiles, covered = tile_polygon(points, (0, 0), 256)
+    for (i, j), pieces in tiles.iteritems():
+        ...
+
+The polygon must be simple (not self-intersecting).
+"""
+
+from math import floor
+
+from polygon import signed_area
+
+
+def split_ring(ring, axis, start, size):
+    """Cut a simple ring along the grid lines of one axis.
+
+    Lines are at start + k * size along the axis (0 for x, 1 for y). A
+    point on a line belongs to the strip after it. Return a dict mapping
+    strip indexes to the lists of rings (lists of points) in each strip.
+    """
+    n = len(ring)
+    strips = [int(floor((p[axis] - start) / size)) for p in ring]
+    for k in xrange(n):
+        if strips[k] != strips[k - 1]:
+            break
+    else:
+        return {strips[0]: [ring]}
+
+    # walk the edges from a crossing all the way around, back to it; each
+    # crossing ends a chain and starts the next, on the other side
+    chains, owners, lines = [], [], {}
+    chain = None
+    for step in xrange(n + 1):
+        i = (k - 1 + step) % n
+        j = i + 1 if i + 1 < n else 0
+        si, sj = strips[i], strips[j]
+        if si != sj:
+            pa, pb = ring[i][axis], ring[i][1 - axis]
+            qa, qb = ring[j][axis], ring[j][1 - axis]
+            direction = 1 if sj > si else -1
+            first = si + 1 if direction > 0 else si
+            for line in xrange(first, sj + (direction > 0), direction):
+                v = start + line * size
+                t = min(1.0, max(0.0, (v - pa) / (qa - pa)))
+                w = pb + t * (qb - pb)
+                point = (v, w) if axis == 0 else (w, v)
+                if chain is not None:
+                    chain.append(point)
+                    entry = len(chains) if step < n else 0
+                    lines.setdefault(line, []).append((w, direction, len(chains) - 1, entry))
+                    if step == n:
+                        break
+                chain = [point]
+                chains.append(chain)
+                owners.append(line if direction > 0 else line - 1)
+        if step < n:
+            chain.append(ring[j])
+
+    # pair the crossings on each line: the chain leaving through one
+    # crossing is joined to the chain entering through the other
+    link = [None] * len(chains)
+    for crossings in lines.itervalues():
+        crossings.sort()
+        for a in xrange(0, len(crossings) - 1, 2):
+            if crossings[a][1] == crossings[a + 1][1]:
+                # touching crossings at the same position, in the wrong order
+                for b in xrange(a + 2, len(crossings)):
+                    if crossings[b][0] != crossings[a + 1][0]:
+                        break
+                    if crossings[b][1] != crossings[a][1]:
+                        crossings[a + 1], crossings[b] = crossings[b], crossings[a + 1]
+                        break
+            u, v = crossings[a], crossings[a + 1]
+            link[u[2]] = v[3]
+            link[v[2]] = u[3]
+
+    result = {}
+    seen = [False] * len(chains)
+    for c in xrange(len(chains)):
+        if seen[c]:
+            continue
+        points = []
+        k = c
+        while k is not None and not seen[k]:
+            seen[k] = True
+            for p in chains[k]:
+                if not points or p != points[-1]:
+                    points.append(p)
+            k = link[k]
+        if len(points) > 1 and points[0] == points[-1]:
+            points.pop()
+        if len(points) > 2 and signed_area(points):
+            result.setdefault(owners[c], []).append(points)
+
+    return result
+
+
+def tile_polygon(points, origin, cell_size):
+    """Split a polygon into the cells of a grid.
+
+    The grid has a cell at (origin[0] + i * width, origin[1] + j * height)
+    for all integers i and j, where cell_size is a number (square cells)
+    or a (width, height) pair. The polygon is a list of points (or anything
+    with a points attribute, like a CompactPolygon).
+
+    Return (tiles, covered): tiles is a dict mapping the (i, j) index of
+    each cell partially covered by the polygon to the list of pieces of
+    the polygon in it (lists of points, in the same orientation as the
+    polygon); covered is a list of the (i, j) indexes of the cells fully
+    covered by the polygon, whose piece would be the cell itself.
+    """
+    points = list(getattr(points, 'points', points))
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+
+    x0, y0 = origin
+    try:
+        width, height = cell_size
+    except TypeError:
+        width = height = cell_size
+    area = abs(width * height)
+
+    tiles, covered = {}, []
+    for i, columns in split_ring(points, 0, x0, width).iteritems():
+        for column in columns:
+            for j, pieces in split_ring(column, 1, y0, height).iteritems():
+                if (len(pieces) == 1 and (i, j) not in tiles and
+                        abs(abs(signed_area(pieces[0])) - area) <= 1e-9 * area):
+                    covered.append((i, j))
+                else:
+                    tiles.setdefault((i, j), []).extend(pieces)
+
+    return tiles, covered
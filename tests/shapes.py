@@ -0,0 +1,40 @@
+# -*- coding: UTF-8 -*-
+"""Polygons used by the tests."""
+
+import math
+
+
+def star(rnd, n, radius=10.0, cx=0.0, cy=0.0, grid=False):
+    """Star-shaped polygon with n vertices at random radii around (cx, cy).
+
+    With grid, the coordinates are rounded to integers, which gives many
+    degenerate cases (vertices on edges, overlapping edges).
+    """
+    points = []
+    for k in xrange(n):
+        a = 2 * math.pi * k / n
+        r = radius * (0.5 + rnd.random())
+        x, y = cx + r * math.cos(a), cy + r * math.sin(a)
+        if grid:
+            x, y = float(round(x)), float(round(y))
+        points.append((x, y))
+    return points
+
+
+def square(x, y, size=1.0):
+    """Counter-clockwise square with its lower left corner at (x, y)."""
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size)]
+
+
+def regular(n, radius=1.0, cx=0.0, cy=0.0, phase=0.0):
+    """Counter-clockwise regular polygon with n vertices."""
+    return [(cx + radius * math.cos(phase + 2 * math.pi * k / n),
+             cy + radius * math.sin(phase + 2 * math.pi * k / n)) for k in xrange(n)]
+
+
+def pairs(rnd, count, grid=False):
+    """Yield count pairs of random overlapping stars."""
+    for k in xrange(count):
+        yield (star(rnd, rnd.randint(3, 40), grid=grid),
+               star(rnd, rnd.randint(3, 40), cx=rnd.uniform(-8, 8), cy=rnd.uniform(-8, 8),
+                    grid=grid))
@@ -0,0 +1,119 @@
+# -*- coding: UTF-8 -*-
+"""ClipCache: hits, misses and evictions, and what bypasses the cache."""
+
+import pickle
+import random
+import threading
+import unittest
+
+import polygon
+from polybatch import clip_many
+from polygon import ClipCache, ClipMetrics, ClipStats, clip_polygon
+
+from shapes import pairs, square
+
+A, B = square(0, 0, 2), square(1, 1, 2)
+
+
+def clip(subject, clipper, operation, cache, **kwargs):
+    return clip_polygon(subject, clipper, operation, cache=cache, output='points', **kwargs)
+
+
+class ClipCacheTestCase(unittest.TestCase):
+
+    def test_hits(self):
+        cache = ClipCache()
+        expected = clip(A, B, 'intersection', False)
+        self.assertEqual(clip(A, B, 'intersection', cache), expected)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 1, 1))
+        self.assertEqual(clip(A, B, 'intersection', cache), expected)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 1, 1))
+
+        # keyed on the operation, the perturb option and both polygons
+        clip(A, B, 'union', cache)
+        clip(A, B, 'intersection', cache, perturb=True)
+        clip(B, A, 'intersection', cache)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 4, 4))
+
+        cache.clear()
+        self.assertEqual((cache.hits, cache.misses, len(cache), cache.bytes), (0, 0, 0, 0))
+
+    def test_outputs(self):
+        cache = ClipCache()
+        for output in ('polygons', 'points', 'flat', 'polygons'):
+            first = clip_polygon(A, B, 'union', cache=cache, output=output)
+            first.pop()
+            second = clip_polygon(A, B, 'union', cache=cache, output=output)
+            self.assertEqual(len(second), 1)
+        self.assertEqual(second[0].points, clip(A, B, 'union', False)[0])
+        self.assertRaises(ValueError, clip_polygon, A, B, cache=cache, output='lists')
+
+    def test_stats(self):
+        cache, stats = ClipCache(), ClipStats()
+        clip(A, B, 'union', cache, stats=stats)
+        clip(A, B, 'union', cache, stats=stats)
+        self.assertEqual(stats.clips, 1)
+
+    def test_maxsize(self):
+        cache = ClipCache(maxsize=2)
+        clip(A, B, 'union', cache)
+        clip(A, B, 'intersection', cache)
+        clip(A, B, 'union', cache)  # the intersection is now the oldest
+        clip(A, B, 'difference', cache)
+        self.assertEqual((len(cache), cache.evictions), (2, 1))
+        clip(A, B, 'union', cache)
+        clip(A, B, 'intersection', cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_maxbytes(self):
+        cache = ClipCache(maxbytes=1000)
+        clip(A, B, 'union', cache)
+        self.assertEqual(len(cache), 1)
+        size = cache.bytes
+        cache.maxbytes = 2 * size - 1
+        clip(B, A, 'union', cache)  # as big as the first result
+        self.assertEqual((len(cache), cache.evictions, cache.bytes), (1, 1, size))
+        cache.maxbytes = size - 1
+        clip(A, B, 'union', cache)
+        self.assertEqual((len(cache), cache.evictions), (1, 1))  # too big, not cached
+
+    def test_bypass(self):
+        cache = polygon.CLIP_CACHE
+        size, misses = len(cache), cache.misses
+        metrics = clip_polygon(A, B, 'intersection', output='metrics')
+        self.assertTrue(isinstance(metrics, ClipMetrics))
+        self.assertEqual(metrics.area, 1.0)
+        clip(A, B, 'intersection', False)
+        clip_many([A, A], B, 'intersection', workers=0)
+        self.assertEqual((len(cache), cache.misses), (size, misses))
+
+    def test_threads(self):
+        tasks = list(pairs(random.Random(1), 20))
+        expected = [clip(a, b, 'union', False) for a, b in tasks]
+        cache, failures = ClipCache(maxsize=8), []
+
+        def work():
+            for k in xrange(3):
+                for (a, b), result in zip(tasks, expected):
+                    if clip(a, b, 'union', cache) != result:
+                        failures.append((a, b))
+
+        threads = [threading.Thread(target=work) for k in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(cache.hits + cache.misses, 4 * 3 * 20)
+        self.assertEqual(len(cache), 8)
+
+    def test_pickle(self):
+        cache = ClipCache()
+        expected = clip(A, B, 'union', cache)
+        copy = pickle.loads(pickle.dumps(cache, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(clip(A, B, 'union', copy), expected)
+        self.assertEqual((copy.hits, copy.misses, len(copy)), (1, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
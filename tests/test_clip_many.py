@@ -0,0 +1,51 @@
+# -*- coding: UTF-8 -*-
+"""clip_many: same results as clip_polygon, in or out of order."""
+
+import random
+import unittest
+
+from polybatch import clip_many
+from polygon import clip_polygon
+
+from shapes import pairs, star
+
+
+def points(result):
+    return [p.points for p in result]
+
+
+class ClipManyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rnd = random.Random(1)
+        self.clipper = star(rnd, 30)
+        self.subjects = [star(rnd, 20, cx=rnd.uniform(-8, 8), cy=rnd.uniform(-8, 8))
+                         for k in xrange(30)]
+        self.expected = [clip_polygon(s, self.clipper, 'intersection', cache=False,
+                                      output='points') for s in self.subjects]
+
+    def test_in_process(self):
+        results = clip_many(self.subjects, self.clipper, 'intersection', workers=0)
+        self.assertEqual([points(r) for r in results], self.expected)
+
+    def test_workers(self):
+        results = clip_many(self.subjects, self.clipper, 'intersection', workers=2, chunksize=4)
+        self.assertEqual([points(r) for r in results], self.expected)
+
+    def test_unordered(self):
+        results = clip_many(self.subjects, self.clipper, 'intersection', workers=2, chunksize=4,
+                            ordered=False)
+        self.assertEqual(sorted((k, points(r)) for k, r in results),
+                         list(enumerate(self.expected)))
+
+    def test_pairs(self):
+        tasks = list(pairs(random.Random(2), 20))
+        for operation in ('union', 'difference', 'reversed-diff'):
+            expected = [clip_polygon(a, b, operation, cache=False, output='points')
+                        for a, b in tasks]
+            results = clip_many(tasks, None, operation, workers=2)
+            self.assertEqual([points(r) for r in results], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
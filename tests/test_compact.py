@@ -0,0 +1,62 @@
+# -*- coding: UTF-8 -*-
+"""CompactPolygon: the arrays, and clipping with them or with Polygon objects."""
+
+import random
+import unittest
+
+from polygon import CompactPolygon, Polygon, PointsView, Vertex
+
+from shapes import pairs, square
+
+OPERATIONS = ('union', 'intersection', 'difference')
+
+
+def linked(points):
+    """Return a Polygon of Vertex objects with the given points."""
+    poly = Polygon()
+    for p in points:
+        poly.add(Vertex(p))
+    return poly
+
+
+class CompactPolygonTestCase(unittest.TestCase):
+
+    def test_points(self):
+        points = [(0.0, 0.0), (2.0, 0.0), (1.0, 3.0)]
+        poly = CompactPolygon(points)
+        self.assertEqual(poly.points, points)
+        self.assertEqual(CompactPolygon.from_buffer(poly.flat().tostring()).points, points)
+        self.assertEqual(poly.to_polygon().points, points)
+        self.assertEqual(CompactPolygon.from_polygon(linked(points)).points, points)
+        self.assertEqual([(v.x, v.y) for v in poly.iter()], points)
+
+    def test_points_view(self):
+        idx, view = CompactPolygon(square(0, 0)).originals()
+        self.assertTrue(isinstance(view, PointsView))
+        self.assertEqual(len(view), 4)
+        self.assertEqual(list(view), square(0, 0))
+        self.assertEqual(view[1], (1.0, 0.0))
+        self.assertEqual(view[-1], (0.0, 1.0))
+        self.assertEqual(view[1:3], [(1.0, 0.0), (1.0, 1.0)])
+        self.assertRaises(IndexError, view.__getitem__, 4)
+
+    def test_clip(self):
+        for a, b in pairs(random.Random(1), 50):
+            for operation in OPERATIONS:
+                compact = getattr(CompactPolygon(a), operation)(CompactPolygon(b))
+                subject, clipper = linked(a), linked(b)
+                clipped = getattr(subject, operation)(clipper)
+                self.assertEqual([p.points for p in clipped], [p.points for p in compact])
+                # Polygon.clip works on copies
+                self.assertEqual(subject.points, a)
+                self.assertEqual(clipper.points, b)
+
+    def test_no_crossing(self):
+        subject = linked(square(0, 0))
+        self.assertEqual(subject.intersection(linked(square(5, 5))), [subject])
+        compact = CompactPolygon(square(0, 0))
+        self.assertEqual(compact.intersection(CompactPolygon(square(5, 5))), [compact])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+# -*- coding: UTF-8 -*-
+"""Intersection engines: all of them find the same intersections."""
+
+import random
+import unittest
+
+import polybatch
+import polygon
+from polybatch import init_strip_worker, shared_coords, strip_bounds, sweep_strip
+from polygon import ClipStats, clip_polygon, find_intersections, monotone_chains
+
+from shapes import pairs, regular, square
+
+
+def found(subject, clipper, engine, perturb=False):
+    """Return the sorted intersections found by an engine, and the contacts."""
+    contacts = [] if perturb else None
+    hits = find_intersections(subject, clipper, engine, None, contacts)
+    return sorted(hits), sorted(contacts or [])
+
+
+class EngineTestCase(unittest.TestCase):
+
+    engine = 'sweep'
+
+    def assertAgrees(self, subject, clipper):
+        for perturb in (False, True):
+            self.assertEqual(found(subject, clipper, self.engine, perturb),
+                             found(subject, clipper, 'brute', perturb))
+
+    def test_random(self):
+        for subject, clipper in pairs(random.Random(1), 100):
+            self.assertAgrees(subject, clipper)
+
+    def test_degenerate(self):
+        # integer coordinates: vertices on edges and overlapping edges
+        for subject, clipper in pairs(random.Random(2), 100, grid=True):
+            self.assertAgrees(subject, clipper)
+
+    def test_shared_edges(self):
+        self.assertAgrees(square(0, 0), square(1, 0))
+        self.assertAgrees(square(0, 0, 2), square(0.5, 0))
+        self.assertAgrees(square(0, 0), square(0, 0))
+
+    def test_clip(self):
+        for subject, clipper in pairs(random.Random(3), 20):
+            for operation in ('union', 'intersection', 'difference', 'reversed-diff'):
+                self.assertEqual(
+                    clip_polygon(subject, clipper, operation, cache=False, output='points',
+                                 engine=self.engine),
+                    clip_polygon(subject, clipper, operation, cache=False, output='points',
+                                 engine='brute'))
+
+    def test_stats(self):
+        stats = ClipStats()
+        subject, clipper = square(0, 0, 2), square(1, 1, 2)
+        clip_polygon(subject, clipper, 'intersection', cache=False, engine=self.engine,
+                     stats=stats)
+        self.assertEqual(stats.intersections, 2)
+        self.assertTrue(stats.pairs > 0)
+
+
+@unittest.skipIf(polygon.numpy is None, "NumPy isn't installed")
+class NumpyEngineTestCase(EngineTestCase):
+
+    engine = 'numpy'
+
+    def test_blocks(self):
+        # the pairs of edges are tested in several blocks
+        size = polygon.NUMPY_BLOCK_SIZE
+        polygon.NUMPY_BLOCK_SIZE = 64
+        try:
+            for subject, clipper in pairs(random.Random(4), 20):
+                self.assertAgrees(subject, clipper)
+        finally:
+            polygon.NUMPY_BLOCK_SIZE = size
+
+
+class MonotoneEngineTestCase(EngineTestCase):
+
+    engine = 'monotone'
+
+    def test_convex(self):
+        rnd = random.Random(5)
+        for k in xrange(50):
+            subject = regular(rnd.randint(3, 60), rnd.uniform(1, 5), phase=rnd.random())
+            clipper = regular(rnd.randint(3, 60), rnd.uniform(1, 5), rnd.uniform(-3, 3),
+                              rnd.uniform(-3, 3), rnd.random())
+            self.assertAgrees(subject, clipper)
+
+    def test_chains(self):
+        lower, upper = monotone_chains(square(0, 0))
+        self.assertEqual((list(lower), list(upper)), ([0], [3, 2, 1]))
+        self.assertEqual(monotone_chains([(0.0, 0.0), (2.0, 0.0), (1.0, 1.0), (2.0, 2.0),
+                                          (0.0, 2.0)]), None)
+        self.assertEqual(monotone_chains([(0.0, 0.0), (0.0, 1.0), (0.0, 2.0)]), None)
+
+
+class AutoEngineTestCase(MonotoneEngineTestCase):
+
+    engine = 'auto'
+
+
+class ParallelEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.options = polybatch.PARALLEL_WORKERS, polybatch.PARALLEL_MIN_EDGES
+        polybatch.PARALLEL_WORKERS, polybatch.PARALLEL_MIN_EDGES = 3, 0
+
+    def tearDown(self):
+        polybatch.PARALLEL_WORKERS, polybatch.PARALLEL_MIN_EDGES = self.options
+
+    def test_strips(self):
+        # the strips, swept one after the other in this process, find each
+        # intersection (and degenerate pair) once
+        rnd = random.Random(6)
+        for grid in (False, True):
+            for subject, clipper in pairs(rnd, 50, grid):
+                init_strip_worker(shared_coords(subject), shared_coords(clipper))
+                bounds = strip_bounds(subject, clipper, rnd.randint(2, 5))
+                hits, contacts = [], []
+                for strip in zip(bounds[:-1], bounds[1:]):
+                    strip_hits, strip_contacts, tested = sweep_strip(strip)
+                    hits.extend(strip_hits)
+                    contacts.extend(strip_contacts)
+                self.assertEqual((sorted(hits), sorted(contacts)),
+                                 found(subject, clipper, 'sweep', True))
+
+    def test_workers(self):
+        rnd = random.Random(7)
+        for grid in (False, True):
+            for subject, clipper in pairs(rnd, 3, grid):
+                stats = ClipStats()
+                self.assertEqual(found(subject, clipper, 'parallel', True),
+                                 found(subject, clipper, 'sweep', True))
+                find_intersections(subject, clipper, 'parallel', stats)
+                self.assertTrue(stats.pairs > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
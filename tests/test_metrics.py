@@ -0,0 +1,99 @@
+# -*- coding: UTF-8 -*-
+"""ClipMetrics: measures of the clip results, holes subtracted."""
+
+import random
+import unittest
+from math import hypot
+
+from polygon import ClipMetrics, PreparedPolygon, clip_area, clip_metrics, clip_polygon, \
+    signed_area
+
+from shapes import pairs, square
+
+OPERATIONS = ('union', 'intersection', 'difference', 'reversed-diff')
+
+# a U, and a bar across the top of its arms: their union has a hole
+U = [(0.0, 0.0), (5.0, 0.0), (5.0, 4.0), (4.0, 4.0), (4.0, 1.0), (1.0, 1.0), (1.0, 4.0),
+     (0.0, 4.0)]
+BAR = [(-1.0, 3.0), (6.0, 3.0), (6.0, 5.0), (-1.0, 5.0)]
+
+
+def perimeter(points):
+    return sum(hypot(x2 - x1, y2 - y1)
+               for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]))
+
+
+class ClipMetricsTestCase(unittest.TestCase):
+
+    def test_pieces(self):
+        # the same pieces as the clip builds, when the boundaries cross
+        for a, b in pairs(random.Random(1), 50):
+            for operation in OPERATIONS:
+                metrics = clip_metrics(a, b, operation)
+                if not metrics.intersections:
+                    continue
+                pieces = clip_polygon(a, b, operation, cache=False, output='points')
+                self.assertEqual(metrics.pieces, len(pieces))
+                self.assertAlmostEqual(metrics.perimeter, sum(perimeter(p) for p in pieces), 9)
+                xs = [x for p in pieces for x, y in p]
+                ys = [y for p in pieces for x, y in p]
+                self.assertEqual(metrics.bbox, (min(xs), min(ys), max(xs), max(ys)))
+
+    def test_areas(self):
+        # inclusion-exclusion, whatever the orientation of the polygons
+        for a, b in pairs(random.Random(2), 100):
+            if random.Random(len(a)).random() < 0.5:
+                a = a[::-1]
+            area_a, area_b = abs(signed_area(a)), abs(signed_area(b))
+            common = clip_area(a, b, 'intersection')
+            self.assertTrue(0 <= common <= min(area_a, area_b) + 1e-9)
+            self.assertAlmostEqual(clip_area(a, b, 'union'), area_a + area_b - common, 9)
+            self.assertAlmostEqual(clip_area(a, b, 'difference'), area_a - common, 9)
+            self.assertAlmostEqual(clip_area(a, b, 'reversed-diff'), area_b - common, 9)
+
+    def test_hole(self):
+        expected = {'union': (23.0, 2), 'intersection': (2.0, 2), 'difference': (9.0, 1),
+                    'reversed-diff': (12.0, 1)}
+        for u in (U, U[::-1], PreparedPolygon(U)):
+            for bar in (BAR, BAR[::-1], PreparedPolygon(BAR)):
+                for operation, (area, pieces) in expected.iteritems():
+                    metrics = clip_metrics(u, bar, operation)
+                    self.assertEqual((metrics.area, metrics.pieces), (area, pieces))
+                    self.assertEqual(clip_area(bar, u, operation), expected[
+                        {'difference': 'reversed-diff',
+                         'reversed-diff': 'difference'}.get(operation, operation)][0])
+
+    def test_contained(self):
+        # boundaries that don't cross: the hole of A\B is subtracted
+        outer, inner, far = square(0, 0, 4), square(1, 1), square(10, 10)
+        for operation, area in (('union', 16.0), ('intersection', 1.0), ('difference', 15.0),
+                                ('reversed-diff', 0.0)):
+            self.assertEqual(clip_area(outer, inner, operation), area)
+        self.assertEqual(clip_area(inner, outer, 'reversed-diff'), 15.0)
+        self.assertEqual(clip_metrics(outer, inner, 'difference').pieces, 2)
+        self.assertEqual(clip_area(outer, far, 'intersection'), 0.0)
+        self.assertEqual(clip_area(outer, far, 'union'), 17.0)
+        self.assertEqual(clip_metrics(outer, far, 'intersection').bbox, None)
+
+    def test_shared_edges(self):
+        # with perturb, polygons sharing an edge have no area in common
+        a = square(0, 0, 2)
+        for b in (square(2, 0, 2), square(-2, 0, 2), square(0, 2, 2), square(0, -2, 2),
+                  square(2, 2, 2), square(1, 2), square(2, 0.5)):
+            area_b = abs(signed_area(b))
+            for x, y in ((a, b), (b, a)):
+                self.assertEqual(clip_area(x, y, 'intersection', perturb=True), 0.0)
+                self.assertEqual(clip_area(x, y, 'union', perturb=True), 4.0 + area_b)
+                self.assertEqual(clip_area(x, y, 'difference', perturb=True),
+                                 abs(signed_area(x)))
+
+    def test_add(self):
+        metrics = ClipMetrics()
+        metrics.add_points(square(0, 0, 4)[::-1])
+        metrics.add_points(square(1, 1), hole=True)
+        self.assertEqual((metrics.pieces, metrics.area, metrics.perimeter), (2, 15.0, 20.0))
+        self.assertEqual(metrics.bbox, (0, 0, 4, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
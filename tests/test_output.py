@@ -0,0 +1,57 @@
+# -*- coding: UTF-8 -*-
+"""The output forms of clip: polygons, points and flat arrays hold the same pieces."""
+
+import random
+import unittest
+from array import array
+
+from polygon import CompactPolygon, clip_polygon
+
+from shapes import pairs, regular, square
+
+OPERATIONS = ('union', 'intersection', 'difference', 'reversed-diff')
+
+
+def clip(subject, clipper, operation, output):
+    return clip_polygon(subject, clipper, operation, cache=False, output=output)
+
+
+class OutputTestCase(unittest.TestCase):
+
+    def assertSameOutputs(self, subject, clipper, operation):
+        polygons = clip(subject, clipper, operation, 'polygons')
+        points = clip(subject, clipper, operation, 'points')
+        flat = clip(subject, clipper, operation, 'flat')
+        self.assertTrue(all(isinstance(p, CompactPolygon) for p in polygons))
+        self.assertTrue(all(isinstance(f, array) and f.typecode == 'd' for f in flat))
+        self.assertEqual([p.points for p in polygons], points)
+        self.assertEqual([zip(f[0::2], f[1::2]) for f in flat], points)
+
+    def test_random(self):
+        for subject, clipper in pairs(random.Random(1), 30):
+            for operation in OPERATIONS:
+                self.assertSameOutputs(subject, clipper, operation)
+
+    def test_many_pieces(self):
+        # two stars rotated against each other: a piece at each crossing
+        subject = [p if k % 2 else (p[0] / 4, p[1] / 4)
+                   for k, p in enumerate(regular(200, 10.0))]
+        clipper = [p if k % 2 else (p[0] / 4, p[1] / 4)
+                   for k, p in enumerate(regular(200, 10.0, phase=0.01))]
+        for operation in OPERATIONS:
+            self.assertSameOutputs(subject, clipper, operation)
+        self.assertEqual(len(clip(subject, clipper, 'difference', 'points')), 100)
+
+    def test_no_crossing(self):
+        subject = CompactPolygon(square(0, 0))
+        self.assertEqual(subject.intersection(CompactPolygon(square(5, 5)), output='points'),
+                         [square(0, 0)])
+        flat, = subject.intersection(CompactPolygon(square(5, 5)), output='flat')
+        self.assertEqual(flat, subject.flat())
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, clip, square(0, 0), square(0.5, 0.5), 'union', 'lists')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -*- coding: UTF-8 -*-
+"""overlay: the same pieces as clipping each pair of polygons."""
+
+import random
+import unittest
+
+from polybatch import Layer, STRTree, bounding_box, overlay
+from polygon import clip_area, signed_area
+
+from shapes import regular, square, star
+
+
+def area(pieces):
+    return sum(abs(signed_area(p)) for p in pieces)
+
+
+def overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class OverlayTestCase(unittest.TestCase):
+
+    def test_random(self):
+        rnd = random.Random(1)
+        left = [star(rnd, rnd.randint(3, 20), 2.0, rnd.uniform(0, 40), rnd.uniform(0, 40))
+                for k in xrange(60)]
+        right = dict(('r%d' % k, star(rnd, rnd.randint(3, 20), 3.0, rnd.uniform(0, 40),
+                                      rnd.uniform(0, 40))) for k in xrange(40))
+        found = {}
+        for lkey, rkey, pieces in overlay(left, right, output='points'):
+            found[lkey, rkey] = area(pieces)
+        for lkey, a in enumerate(left):
+            for rkey, b in right.iteritems():
+                expected = clip_area(a, b, 'intersection')
+                if (lkey, rkey) in found:
+                    self.assertAlmostEqual(found[lkey, rkey], expected, 9)
+                else:
+                    self.assertEqual(expected, 0.0)
+        self.assertTrue(len(found) > 10)
+
+    def test_contained(self):
+        # a square deep inside a large polygon (settled without clipping),
+        # one crossing its boundary, and one outside of it, in its bounding box
+        big = regular(64, 10.0)
+        small = [square(-0.5, -0.5), square(9.5, -0.5), square(7.5, 7.5)]
+        expected = {
+            'intersection': {0: [small[0]], 1: None},
+            'union': {0: [big], 1: None, 2: [small[2], big]},
+            'difference': {1: None, 2: [small[2]]},
+            'reversed-diff': {0: [big, small[0]], 1: None, 2: [big]},
+        }
+        for operation, results in expected.iteritems():
+            found = dict((lkey, pieces) for lkey, rkey, pieces
+                         in overlay(small, [big], operation, output='points'))
+            self.assertEqual(sorted(found), sorted(results))
+            for lkey, pieces in results.iteritems():
+                if pieces is None:
+                    self.assertAlmostEqual(area(found[lkey]), abs(clip_area(
+                        small[lkey], big, operation)), 9)
+                else:
+                    self.assertEqual(found[lkey], pieces)
+
+    def test_shared_edges(self):
+        # with perturb, neighbours in a grid have no area in common
+        left = [square(x, y) for x in xrange(4) for y in xrange(4)]
+        right = Layer(dict(((x, y), square(x, y)) for x in xrange(4) for y in xrange(4)))
+        for lkey, rkey, pieces in overlay(left, right, output='points', perturb=True):
+            expected = 1.0 if left[lkey] == right.polygons[rkey] else 0.0
+            self.assertEqual(area(pieces), expected)
+
+    def test_outputs(self):
+        left, right = [square(0, 0, 2)], Layer([square(1, 1, 2)])
+        points = list(overlay(left, right, output='points'))
+        self.assertEqual([(l, r, [p.points for p in pieces])
+                          for l, r, pieces in overlay(left, right)], points)
+        self.assertEqual([(l, r, [zip(f[0::2], f[1::2]) for f in pieces])
+                          for l, r, pieces in overlay(left, right, output='flat')], points)
+        self.assertRaises(ValueError, list, overlay(left, right, 'xor'))
+        self.assertRaises(ValueError, list, overlay(left, right, output='lists'))
+
+
+class STRTreeTestCase(unittest.TestCase):
+
+    def test_query(self):
+        rnd = random.Random(2)
+        boxes = [bounding_box(star(rnd, 5, 2.0, rnd.uniform(0, 50), rnd.uniform(0, 50)))
+                 for k in xrange(500)]
+        tree = STRTree([(bbox, k) for k, bbox in enumerate(boxes)], 8)
+        for k in xrange(50):
+            x, y = rnd.uniform(0, 50), rnd.uniform(0, 50)
+            query = (x, y, x + rnd.uniform(0, 10), y + rnd.uniform(0, 10))
+            self.assertEqual(sorted(tree.query(query)),
+                             [i for i, bbox in enumerate(boxes) if overlaps(bbox, query)])
+
+
+if __name__ == '__main__':
+    unittest.main()
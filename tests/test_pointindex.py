@@ -0,0 +1,83 @@
+# -*- coding: UTF-8 -*-
+"""PointIndex: the same answers as is_inside_points, for many points."""
+
+import random
+import unittest
+
+import polygon
+from polygon import CompactPolygon, PointIndex, PreparedPolygon, is_inside_points
+
+from shapes import star
+
+
+def grid_points(rnd, count):
+    # points on the integer grid, many of them on edges or vertices
+    return [(float(rnd.randint(-16, 16)), float(rnd.randint(-16, 16))) for k in xrange(count)]
+
+
+class PointIndexTestCase(unittest.TestCase):
+
+    def assertContains(self, points, queries, **kwargs):
+        index = PointIndex(points, **kwargs)
+        self.assertEqual(index.contains(queries),
+                         [is_inside_points(points, x, y) for x, y in queries])
+
+    def test_random(self):
+        rnd = random.Random(1)
+        for k in xrange(20):
+            points = star(rnd, rnd.randint(3, 200))
+            queries = [(rnd.uniform(-16, 16), rnd.uniform(-16, 16)) for i in xrange(300)]
+            self.assertContains(points, queries)
+            self.assertContains(points, queries, bands=1)
+
+    def test_grid(self):
+        rnd = random.Random(2)
+        for k in xrange(20):
+            points = star(rnd, rnd.randint(3, 40), grid=True)
+            queries = grid_points(rnd, 300) + points
+            self.assertContains(points, queries)
+            self.assertContains(points, queries, bands=7)
+
+    def test_self_intersecting(self):
+        # a band whose edges cross is searched linearly
+        rnd = random.Random(3)
+        for k in xrange(10):
+            points = [(rnd.uniform(-10, 10), rnd.uniform(-10, 10)) for i in xrange(30)]
+            queries = [(rnd.uniform(-10, 10), rnd.uniform(-10, 10)) for i in xrange(300)]
+            self.assertContains(points, queries)
+        self.assertFalse(all(PointIndex(points).sorted))
+
+    def test_degenerate(self):
+        self.assertEqual(PointIndex([(0, 0), (1, 1)]).contains([(0.5, 0.5)]), [False])
+        self.assertEqual(PointIndex([(0, 0), (1, 0), (2, 0)]).contains([(0.5, 0.0)]), [False])
+        self.assertEqual(PointIndex(star(random.Random(4), 10)).contains([]), [])
+
+    def test_polygons(self):
+        rnd = random.Random(5)
+        points = star(rnd, 50)
+        queries = [(rnd.uniform(-16, 16), rnd.uniform(-16, 16)) for i in xrange(300)]
+        expected = [is_inside_points(points, x, y) for x, y in queries]
+        self.assertEqual(CompactPolygon(points).contains(queries), expected)
+        prepared = PreparedPolygon(points)
+        self.assertEqual(prepared.contains(queries), expected)
+        self.assertEqual([prepared.is_inside(x, y) for x, y in queries], expected)
+
+
+@unittest.skipIf(polygon.numpy is None, "NumPy isn't installed")
+class NumpyPointIndexTestCase(unittest.TestCase):
+
+    def test_arrays(self):
+        numpy = polygon.numpy
+        rnd = random.Random(6)
+        for grid in (False, True):
+            points = star(rnd, 100, grid=grid)
+            queries = grid_points(rnd, 2000) if grid else \
+                [(rnd.uniform(-16, 16), rnd.uniform(-16, 16)) for i in xrange(2000)]
+            expected = [is_inside_points(points, x, y) for x, y in queries]
+            index = PointIndex(points)
+            self.assertEqual(index.contains(numpy.array(queries)).tolist(), expected)
+            self.assertEqual(index.contains(queries), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: UTF-8 -*-
+"""polybench: reproducible, simple polygons, and its output."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from polybench import SHAPES, compare, generate, run_case
+from polygon import crossing_edges
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'polybench.py')
+
+
+class GenerateTestCase(unittest.TestCase):
+
+    def test_reproducible(self):
+        for shape in SHAPES:
+            self.assertEqual(generate(shape, 50, 0.5, 1), generate(shape, 50, 0.5, 1))
+            self.assertEqual(len(generate(shape, 50, 0.5, 1)), 50)
+        self.assertNotEqual(generate('random-walk', 50, 0.5, 1),
+                            generate('random-walk', 50, 0.5, 2))
+        self.assertEqual(generate('convex', 10, 0.5, 1, 1.0, 2.0),
+                         [(x + 1.0, y + 2.0) for x, y in generate('convex', 10, 0.5, 1)])
+
+    def test_simple(self):
+        # the benchmark polygons don't cross themselves, at any size
+        for shape in SHAPES:
+            for n in (10, 16, 30, 100):
+                for roughness in (0.0, 0.1, 0.5, 1.0):
+                    points = generate(shape, n, roughness, 1)
+                    self.assertEqual(crossing_edges(points), set(),
+                                     "%s-%d-%s crosses itself" % (shape, n, roughness))
+
+
+class RunTestCase(unittest.TestCase):
+
+    def test_run_case(self):
+        result = run_case(('star', 20, 20, 0.5, 'intersection', None, 1))
+        self.assertEqual(result['case'], 'star-20x20-0.5-intersection')
+        self.assertTrue(result['intersections'] > 0)
+        self.assertTrue(result['pieces'] > 0)
+
+    def test_compare(self):
+        baseline = {'a': {'case': 'a', 'time': 2.0}}
+        self.assertEqual(compare({'case': 'a', 'time': 2.1}, baseline, 0.1), (1.05, False))
+        self.assertEqual(compare({'case': 'a', 'time': 3.0}, baseline, 0.1), (1.5, True))
+        self.assertEqual(compare({'case': 'b', 'time': 3.0}, baseline, 0.1), (None, False))
+
+    def test_json_output(self):
+        # with --json -, standard output is nothing but the JSON
+        output = subprocess.Popen(
+            [sys.executable, SCRIPT, '--shapes=convex,spiral', '--sizes=20x20',
+             '--roughness=0.5', '--operations=union', '--repeat=1', '--json=-'],
+            stdout=subprocess.PIPE).communicate()[0]
+        results = json.loads(output)
+        self.assertEqual([r['case'] for r in results],
+                         ['convex-20x20-0.5-union', 'spiral-20x20-0.5-union'])
+
+
+if __name__ == '__main__':
+    unittest.main()
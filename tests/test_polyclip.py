@@ -0,0 +1,83 @@
+# -*- coding: UTF-8 -*-
+"""polyclip's batch mode: parsing, formatting and clipping without OpenGL."""
+
+import json
+import sys
+import unittest
+from StringIO import StringIO
+
+from polyclip import Arguments, Batch, format_geometry, parse_geometry
+from polygon import clip_polygon
+
+from shapes import square
+
+
+def options(*args):
+    return Arguments().parse_args(list(args))[0]
+
+
+class GeometryTestCase(unittest.TestCase):
+
+    def test_geojson(self):
+        text = json.dumps({'type': 'Feature', 'properties': {'id': 7}, 'geometry': {
+            'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}})
+        format, rings, properties = parse_geometry(text)
+        self.assertEqual((format, rings, properties), ('geojson', [square(0, 0)], {'id': 7}))
+        self.assertEqual(parse_geometry(format_geometry(format, rings, properties)),
+                         (format, rings, properties))
+
+    def test_wkt(self):
+        text = 'MULTIPOLYGON (((0 0, 1 0, 1 1, 0 1, 0 0)), ((2 2, 3 2, 3 3, 2 3, 2 2)))'
+        format, rings, properties = parse_geometry(text)
+        self.assertEqual(rings, [square(0, 0), square(2, 2)])
+        self.assertEqual(parse_geometry(format_geometry(format, rings)), (format, rings, None))
+        self.assertEqual(format_geometry('wkt', []), 'MULTIPOLYGON EMPTY')
+
+    def test_holes(self):
+        self.assertRaises(ValueError, parse_geometry,
+                          'POLYGON ((0 0, 4 0, 4 4, 0 4, 0 0), (1 1, 2 1, 2 2, 1 1))')
+        self.assertRaises(ValueError, parse_geometry, json.dumps({
+            'type': 'Polygon', 'coordinates': [square(0, 0, 4), square(1, 1)]}))
+        self.assertRaises(ValueError, parse_geometry, '{"type": "Point", "coordinates": [0, 0]}')
+        self.assertRaises(ValueError, parse_geometry, 'POINT (0 0)')
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def clip(self, subject, *args):
+        return Batch(options('--clip-poly=0,0;4,0;4,4;0,4', *args)).clip([subject])
+
+    def test_crossing(self):
+        subject = square(2, 2, 4)
+        for operation in ('union', 'intersection', 'difference', 'reversed-diff'):
+            self.assertEqual(self.clip(subject, '--' + operation),
+                             clip_polygon(subject, square(0, 0, 4), operation, cache=False,
+                                          output='points'))
+
+    def test_no_crossing(self):
+        inside, outside, clipper = square(1, 1), square(5, 5), square(0, 0, 4)
+        self.assertEqual(self.clip(inside, '--intersection'), [inside])
+        self.assertEqual(self.clip(inside, '--difference'), [])
+        self.assertEqual(self.clip(outside, '--intersection'), [])
+        self.assertEqual(self.clip(outside, '--union'), [outside, clipper])
+        self.assertEqual(self.clip(square(-1, -1, 6), '--intersection'), [clipper])
+
+    def test_perturb(self):
+        # sharing an edge or a vertex with the clipper, which moves away
+        # from them when perturbed: nothing in common
+        for subject in (square(-4, 0, 4), square(0, -4, 4), square(-1, -1)):
+            self.assertEqual(self.clip(subject, '--intersection', '--perturb'), [])
+            self.assertEqual(self.clip(subject, '--difference', '--perturb'), [subject])
+            self.assertEqual(self.clip(subject, '--union', '--perturb'),
+                             [subject, square(0, 0, 4)])
+
+    def test_subject_option(self):
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            self.assertRaises(SystemExit, options, '--batch', '--subj-poly=0,0;1,0;1,1')
+        finally:
+            sys.stderr = stderr
+
+
+if __name__ == '__main__':
+    unittest.main()
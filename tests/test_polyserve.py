@@ -0,0 +1,105 @@
+# -*- coding: UTF-8 -*-
+"""polyserve: a server on a Unix socket clips as clip_polygon does."""
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from polygon import clip_polygon
+from polyserve import ClipClient, ClipService, ServiceError, make_server
+
+from shapes import square, star
+
+OPERATIONS = ('union', 'intersection', 'difference', 'reversed-diff')
+
+
+class ClipServiceTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        cls.address = os.path.join(cls.dir, 'polyclip.sock')
+        cls.service = ClipService(workers=2, chunksize=4)
+        cls.server = make_server(cls.address, cls.service)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+        shutil.rmtree(cls.dir)
+
+    def setUp(self):
+        rnd = random.Random(1)
+        self.clipper = star(rnd, 30)
+        self.subjects = [star(rnd, rnd.randint(3, 30), cx=rnd.uniform(-8, 8),
+                              cy=rnd.uniform(-8, 8)) for k in xrange(30)]
+
+    def expected(self, clipper, operation):
+        return [clip_polygon(s, clipper, operation, cache=False, output='points')
+                for s in self.subjects]
+
+    def test_clip(self):
+        with ClipClient(self.address) as client:
+            client.register(1, self.clipper)
+            for operation in OPERATIONS:
+                self.assertEqual(client.clip(self.subjects, 1, operation),
+                                 self.expected(self.clipper, operation))
+            self.assertEqual(client.clip([], 1), [])
+
+    def test_outputs(self):
+        with ClipClient(self.address) as client:
+            client.register(2, self.clipper)
+            points = client.clip(self.subjects, 2, 'union')
+            self.assertEqual([[p.points for p in r]
+                              for r in client.clip(self.subjects, 2, 'union', 'polygons')], points)
+            self.assertEqual([[zip(f[0::2], f[1::2]) for f in r]
+                              for r in client.clip(self.subjects, 2, 'union', 'flat')], points)
+            self.assertRaises(ValueError, client.clip, self.subjects, 2, 'union', 'lists')
+            self.assertRaises(ValueError, client.clip, self.subjects, 2, 'xor')
+
+    def test_register(self):
+        # workers holding the old clipper get the new one
+        other = square(-5.0, -5.0, 10.0)
+        with ClipClient(self.address) as client:
+            client.register(3, self.clipper)
+            client.clip(self.subjects, 3, 'intersection')
+            client.register(3, other)
+            self.assertEqual(client.clip(self.subjects, 3, 'intersection'),
+                             self.expected(other, 'intersection'))
+            client.drop(3)
+            self.assertRaises(ServiceError, client.clip, self.subjects, 3)
+            self.assertRaises(ServiceError, client.drop, 3)
+            self.assertRaises(ServiceError, client.register, 4, [(0.0, 0.0), (1.0, 1.0)])
+            # the connection is still usable after errors
+            client.register(4, other)
+            self.assertEqual(len(client.clip(self.subjects, 4)), len(self.subjects))
+
+    def test_clients(self):
+        expected = self.expected(self.clipper, 'difference')
+        with ClipClient(self.address) as client:
+            client.register(5, self.clipper)
+        failures = []
+
+        def work():
+            with ClipClient(self.address) as client:
+                for k in xrange(5):
+                    if client.clip(self.subjects, 5) != expected:
+                        failures.append(k)
+
+        threads = [threading.Thread(target=work) for k in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
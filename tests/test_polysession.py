@@ -0,0 +1,78 @@
+# -*- coding: UTF-8 -*-
+"""ClipSession: after any edits, the same result as clipping from scratch."""
+
+import math
+import random
+import unittest
+
+from polygon import clip_polygon
+from polysession import ClipSession
+
+from shapes import square, star
+
+OPERATIONS = ('union', 'intersection', 'difference', 'reversed-diff')
+
+
+def polar(angle, radius, center):
+    return (center[0] + radius * math.cos(angle), center[1] + radius * math.sin(angle))
+
+
+class ClipSessionTestCase(unittest.TestCase):
+
+    def assertClips(self, session, subject, clipper, operation):
+        self.assertEqual(session.result(),
+                         clip_polygon(subject, clipper, operation, cache=False, output='points'))
+
+    def test_edits(self):
+        # edits keep the polygons star-shaped around their centers, so simple
+        rnd = random.Random(1)
+        for operation in OPERATIONS:
+            centers = {'subject': (0.0, 0.0), 'clipper': (rnd.uniform(-8, 8), rnd.uniform(-8, 8))}
+            polygons = dict((which, star(rnd, 30, cx=c[0], cy=c[1]))
+                            for which, c in centers.iteritems())
+            angles = dict((which, [2 * math.pi * k / 30 for k in xrange(30)])
+                          for which in polygons)
+            session = ClipSession(polygons['subject'], polygons['clipper'], operation)
+            self.assertClips(session, polygons['subject'], polygons['clipper'], operation)
+
+            for step in xrange(60):
+                which = rnd.choice(('subject', 'clipper'))
+                points, a = polygons[which], angles[which]
+                n, edit = len(points), rnd.choice(('move', 'insert', 'delete'))
+                k = rnd.randrange(n)
+                if edit == 'move':
+                    points[k] = polar(a[k], rnd.uniform(5, 15), centers[which])
+                    session.move_vertex(which, k, points[k])
+                elif edit == 'insert':
+                    angle = (a[k - 1] + a[k] - (0 if k else 2 * math.pi)) / 2
+                    a.insert(k, angle)
+                    points.insert(k, polar(angle, rnd.uniform(5, 15), centers[which]))
+                    session.insert_vertex(which, k, points[k])
+                elif n > 10:
+                    del a[k], points[k]
+                    session.delete_vertex(which, k)
+                self.assertClips(session, polygons['subject'], polygons['clipper'], operation)
+
+    def test_outputs(self):
+        session = ClipSession(square(0, 0, 2), square(1, 1, 2), 'union')
+        points = session.result()
+        self.assertEqual([p.points for p in session.result('polygons')], points)
+        self.assertEqual([zip(f[0::2], f[1::2]) for f in session.result('flat')], points)
+        self.assertRaises(ValueError, session.result, 'lists')
+
+    def test_no_crossing(self):
+        session = ClipSession(square(0, 0), square(5, 5), 'intersection')
+        self.assertEqual(session.result(), [square(0.0, 0.0)])
+        session.move_vertex('clipper', 0, (0.5, 0.5))
+        self.assertClips(session, square(0, 0), [(0.5, 0.5)] + square(5, 5)[1:], 'intersection')
+
+    def test_errors(self):
+        self.assertRaises(ValueError, ClipSession, square(0, 0), square(1, 1), 'xor')
+        session = ClipSession(square(0, 0), square(1, 1))
+        self.assertRaises(ValueError, session.move_vertex, 'other', 0, (0, 0))
+        session.delete_vertex('subject', 0)
+        self.assertRaises(ValueError, session.delete_vertex, 'subject', 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
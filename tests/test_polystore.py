@@ -0,0 +1,69 @@
+# -*- coding: UTF-8 -*-
+"""polystore: polygons written to a store read back, and clip, the same."""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from polygon import CompactPolygon, clip_polygon
+from polystore import PolygonStore, PolygonWriter
+
+from shapes import star
+
+
+class PolygonStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'stars.pclp')
+        rnd = random.Random(1)
+        self.polygons = [star(rnd, rnd.randint(3, 40)) for k in xrange(50)]
+        with PolygonWriter(self.path) as writer:
+            for k, points in enumerate(self.polygons):
+                self.assertEqual(writer.write(points), k)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read(self):
+        with PolygonStore(self.path) as store:
+            self.assertEqual(len(store), len(self.polygons))
+            self.assertEqual([view.points for view in store], self.polygons)
+            self.assertEqual(list(store[-1]), self.polygons[-1])
+            self.assertEqual(len(store[3]), len(self.polygons[3]))
+            self.assertEqual(store[3].polygon().points, self.polygons[3])
+            self.assertRaises(IndexError, store.__getitem__, len(self.polygons))
+
+    def test_copy(self):
+        path = os.path.join(self.dir, 'copy.pclp')
+        with PolygonStore(self.path) as store:
+            with PolygonWriter(path) as writer:
+                for view in reversed(list(store)):
+                    writer.write(view)
+        with PolygonStore(path) as copy:
+            self.assertEqual([view.points for view in copy], self.polygons[::-1])
+
+    def test_clip(self):
+        clipper = star(random.Random(2), 30, cx=3.0)
+        with PolygonStore(self.path) as store:
+            for view, points in zip(store, self.polygons):
+                for cache in (True, False):
+                    self.assertEqual(
+                        clip_polygon(view, clipper, 'intersection', cache=cache, output='points'),
+                        clip_polygon(points, clipper, 'intersection', cache=False,
+                                     output='points'))
+            # clipping works on a copy, the store is read-only
+            self.assertTrue(isinstance(store[0].polygon(), CompactPolygon))
+            self.assertEqual(store[0].points, self.polygons[0])
+
+    def test_not_a_store(self):
+        path = os.path.join(self.dir, 'other')
+        with open(path, 'wb') as other:
+            other.write('\0' * 64)
+        self.assertRaises(ValueError, PolygonStore, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: UTF-8 -*-
+"""tile_polygon: the same pieces as clipping the polygon with each cell."""
+
+import random
+import unittest
+from math import floor
+
+from polygon import CompactPolygon, clip_area, signed_area
+from polytile import tile_polygon
+
+from shapes import square, star
+
+
+def cell(i, j, origin, (width, height)):
+    x, y = origin[0] + i * width, origin[1] + j * height
+    return [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+
+
+class TilePolygonTestCase(unittest.TestCase):
+
+    def assertTiles(self, points, origin, size):
+        tiles, covered = tile_polygon(points, origin, size)
+        self.assertFalse(set(tiles) & set(covered))
+        # the cells around the polygon's bounding box
+        (imin, jmin), (imax, jmax) = [
+            [int(floor((f(p[axis] for p in points) - origin[axis]) / size[axis]))
+             for axis in (0, 1)] for f in (min, max)]
+        total = 0.0
+        for i in xrange(imin - 1, imax + 2):
+            for j in xrange(jmin - 1, jmax + 2):
+                expected = clip_area(points, cell(i, j, origin, size), 'intersection',
+                                     perturb=True)
+                if (i, j) in covered:
+                    area = abs(size[0] * size[1])
+                else:
+                    area = sum(abs(signed_area(p)) for p in tiles.get((i, j), []))
+                self.assertAlmostEqual(area, expected, 9, "cell %d, %d" % (i, j))
+                total += area
+        self.assertAlmostEqual(total, abs(signed_area(points)), 9)
+
+    def test_random(self):
+        rnd = random.Random(1)
+        for k in xrange(20):
+            points = star(rnd, rnd.randint(3, 40), cx=rnd.uniform(-1, 1))
+            self.assertTiles(points, (rnd.uniform(-1, 1), 0.0), (rnd.uniform(2, 5), 3.0))
+
+    def test_grid_lines(self):
+        # vertices and edges on the grid lines
+        rnd = random.Random(2)
+        for k in xrange(20):
+            self.assertTiles(star(rnd, rnd.randint(3, 40), grid=True), (0.0, 0.0), (2.0, 2.0))
+
+    def test_orientation(self):
+        points = star(random.Random(3), 30)[::-1]
+        tiles, covered = tile_polygon(points, (0.0, 0.0), 4.0)
+        for pieces in tiles.itervalues():
+            self.assertTrue(all(signed_area(p) < 0 for p in pieces))
+
+    def test_covered(self):
+        tiles, covered = tile_polygon(CompactPolygon(square(0.5, 0.5, 3.0)), (0, 0), 1.0)
+        self.assertEqual(sorted(covered), [(1, 1), (1, 2), (2, 1), (2, 2)])
+        self.assertEqual(len(tiles), 12)
+        self.assertEqual(tile_polygon(square(0.25, 0.25, 0.5), (0, 0), 1.0),
+                         ({(0, 0): [square(0.25, 0.25, 0.5)]}, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: UTF-8 -*-
+"""Filtered predicates against exact arithmetic, and perturbation."""
+
+import random
+import unittest
+from fractions import Fraction
+
+from polygon import DEGENERATE, find_intersections, intersect_exact, intersect_segments, \
+    is_inside_perturbed, is_inside_points, orient2d, resolve_contacts
+
+from shapes import pairs, square
+
+# a shift small enough to stand for the perturbation on small integer grids
+D = 2.0 ** -20
+
+
+def kind(hit):
+    if hit is None:
+        return 'none'
+    return 'degenerate' if hit is DEGENERATE else 'crossing'
+
+
+class PredicatesTestCase(unittest.TestCase):
+
+    def assertSameIntersection(self, *coordinates):
+        hit, exact = intersect_segments(*coordinates), intersect_exact(*coordinates)
+        self.assertEqual(kind(hit), kind(exact), coordinates)
+        if kind(hit) == 'crossing':
+            for a, b in zip((hit[0][0], hit[0][1], hit[1], hit[2]),
+                            (exact[0][0], exact[0][1], exact[1], exact[2])):
+                self.assertAlmostEqual(a, b, 12)
+
+    def test_grid(self):
+        # end points on the other segment, collinear and zero-length segments
+        rnd = random.Random(1)
+        for k in xrange(5000):
+            self.assertSameIntersection(*[float(rnd.randint(0, 4)) for v in xrange(8)])
+
+    def test_nearly_collinear(self):
+        # end points within a few ulps of the other segment
+        rnd = random.Random(2)
+        for k in xrange(2000):
+            x1, x2 = rnd.uniform(-10, 10), rnd.uniform(-10, 10)
+            t = rnd.random()
+            x = x1 + t * (x2 - x1)
+            coordinates = [x1, 0.1 * x1, x2, 0.1 * x2, x, 0.1 * x, rnd.uniform(-10, 10),
+                           rnd.uniform(-10, 10)]
+            self.assertSameIntersection(*coordinates)
+            self.assertSameIntersection(*(coordinates[4:] + coordinates[:4]))
+
+    def test_orient2d(self):
+        self.assertTrue(orient2d(0, 0, 1, 0, 0, 1) > 0)
+        self.assertTrue(orient2d(0, 0, 1, 0, 0, -1) < 0)
+        self.assertEqual(orient2d(0, 0, 1, 1, 2, 2), 0)
+        # points a few ulps around a line, where floating point gets the sign wrong
+        ulp = 2.0 ** -53
+        for i in xrange(64):
+            for j in xrange(64):
+                x, y = 0.5 + i * ulp, 0.5 + j * ulp
+                exact = cmp((Fraction(24) - 12) * (Fraction(y) - 12) -
+                            (Fraction(24) - 12) * (Fraction(x) - 12), 0)
+                self.assertEqual(cmp(orient2d(12.0, 12.0, 24.0, 24.0, x, y), 0), exact)
+
+
+class PerturbationTestCase(unittest.TestCase):
+
+    def test_is_inside(self):
+        points = square(0.0, 0.0, 4.0)
+        for (x, y), inside in (((4.0, 2.0), True), ((0.0, 2.0), False), ((2.0, 0.0), False),
+                               ((2.0, 4.0), True), ((0.0, 0.0), False), ((4.0, 4.0), True),
+                               ((4.0, 0.0), False), ((2.0, 2.0), True), ((5.0, 4.0), False)):
+            self.assertEqual(is_inside_perturbed(points, x, y, -1), inside, (x, y))
+            self.assertEqual(is_inside_perturbed(points, x, y, 1),
+                             is_inside_points(points, x + D, y + D * D), (x, y))
+
+    def test_moved(self):
+        # the same crossings as with the clipper actually moved by (D, D*D)
+        for subject, clipper in pairs(random.Random(3), 100, grid=True):
+            contacts = []
+            found = find_intersections(subject, clipper, 'brute', None, contacts)
+            found += resolve_contacts(subject, clipper, contacts)
+            moved = [(x + D, y + D * D) for x, y in clipper]
+            expected = find_intersections(subject, moved, 'brute')
+            self.assertEqual(sorted((i, j) for i, j, p, a, b in found),
+                             sorted((i, j) for i, j, p, a, b in expected))
+            for x, y in subject:
+                self.assertEqual(is_inside_perturbed(clipper, x, y, -1),
+                                 is_inside_points(moved, x, y))
+
+
+if __name__ == '__main__':
+    unittest.main()
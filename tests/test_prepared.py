@@ -0,0 +1,63 @@
+# -*- coding: UTF-8 -*-
+"""PreparedPolygon: same results as plain polygons, and never modified."""
+
+import random
+import unittest
+
+from polygon import PreparedPolygon, clip_polygon, is_inside_points
+
+from shapes import pairs, star
+
+OPERATIONS = ('union', 'intersection', 'difference', 'reversed-diff')
+
+
+def clip(subject, clipper, operation, **kwargs):
+    return clip_polygon(subject, clipper, operation, cache=False, output='points', **kwargs)
+
+
+class PreparedPolygonTestCase(unittest.TestCase):
+
+    def test_clip(self):
+        for a, b in pairs(random.Random(1), 40):
+            prepared_a, prepared_b = PreparedPolygon(a), PreparedPolygon(b)
+            for operation in OPERATIONS:
+                for perturb in (False, True):
+                    expected = clip(a, b, operation, perturb=perturb)
+                    self.assertEqual(clip(a, prepared_b, operation, perturb=perturb), expected)
+                    self.assertEqual(clip(prepared_a, b, operation, perturb=perturb), expected)
+            self.assertEqual(prepared_a.points, tuple(a))
+            self.assertEqual(prepared_b.template.points, b)
+
+    def test_degenerate(self):
+        for a, b in pairs(random.Random(2), 40, grid=True):
+            prepared = PreparedPolygon(b)
+            for operation in OPERATIONS:
+                self.assertEqual(clip(a, prepared, operation, perturb=True),
+                                 clip(a, b, operation, perturb=True))
+
+    def test_reuse(self):
+        rnd = random.Random(3)
+        clipper = star(rnd, 30)
+        prepared = PreparedPolygon(clipper)
+        for k in xrange(20):
+            subject = star(rnd, 20, cx=rnd.uniform(-5, 5), cy=rnd.uniform(-5, 5))
+            self.assertEqual(clip(subject, prepared, 'intersection'),
+                             clip(subject, clipper, 'intersection'))
+
+    def test_is_inside(self):
+        rnd = random.Random(4)
+        points = star(rnd, 25)
+        prepared = PreparedPolygon(points)
+        for k in xrange(500):
+            x, y = rnd.uniform(-16, 16), rnd.uniform(-16, 16)
+            self.assertEqual(prepared.is_inside(x, y), is_inside_points(points, x, y))
+
+    def test_orientation(self):
+        points = [(0, 0), (4, 0), (4, 2), (0, 2)]
+        self.assertEqual(PreparedPolygon(points).bbox, (0, 0, 4, 2))
+        self.assertEqual(PreparedPolygon(points).orientation, 1)
+        self.assertEqual(PreparedPolygon(points[::-1]).orientation, -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
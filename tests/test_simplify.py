@@ -0,0 +1,100 @@
+# -*- coding: UTF-8 -*-
+"""Simplification before clipping: methods, topology and caching."""
+
+import random
+import unittest
+
+from polybench import generate
+from polygon import ClipCache, SIMPLIFY_METHODS, Simplifier, clip_polygon, crossing_edges, \
+    segment_distance, simplify_points
+
+from shapes import regular, star
+
+
+def noisy_circle(rnd, n, noise):
+    return [(x + rnd.uniform(-noise, noise), y + rnd.uniform(-noise, noise))
+            for x, y in regular(n, 10.0)]
+
+
+class SimplifyTestCase(unittest.TestCase):
+
+    def test_collinear(self):
+        points = [(0.0, 0.0), (1.0, 0.0), (2.0, 0.0), (2.0, 1.0), (2.0, 2.0), (1.0, 1.0)]
+        for method in SIMPLIFY_METHODS:
+            self.assertEqual(simplify_points(points, 1e-6, method),
+                             [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0)])
+            self.assertEqual(simplify_points(points[:3] + [(1.0, 1.0)], 100.0, method),
+                             [(0.0, 0.0), (2.0, 0.0), (1.0, 1.0)])
+
+    def test_noise(self):
+        rnd = random.Random(1)
+        for method in SIMPLIFY_METHODS:
+            points = noisy_circle(rnd, 200, 0.01)
+            simplified = simplify_points(points, 0.1, method)
+            self.assertTrue(10 < len(simplified) < 100)
+            # the vertices kept are in the same order
+            indexes = [points.index(p) for p in simplified]
+            self.assertEqual(indexes, sorted(indexes))
+
+    def test_douglas_peucker(self):
+        # each vertex removed lies within tolerance of the simplified ring
+        rnd = random.Random(2)
+        for k in xrange(20):
+            points = star(rnd, 50)
+            tolerance = rnd.uniform(0.1, 3)
+            kept = [points.index(p) for p in simplify_points(points, tolerance)]
+            for a, b in zip(kept, kept[1:] + [kept[0] + len(points)]):
+                (ax, ay), (bx, by) = points[a], points[b % len(points)]
+                for i in xrange(a + 1, b):
+                    x, y = points[i % len(points)]
+                    self.assertTrue(segment_distance(x, y, ax, ay, bx, by) <= tolerance)
+
+    def test_topology(self):
+        crossed = 0
+        for method in SIMPLIFY_METHODS:
+            for roughness in (0.1, 0.5, 0.9):
+                for tolerance in (0.05, 0.1, 0.2):
+                    points = generate('spiral', 100, roughness, 1)
+                    crossed += bool(crossing_edges(simplify_points(points, tolerance, method)))
+                    simplified = simplify_points(points, tolerance, method, topology=True)
+                    self.assertEqual(crossing_edges(simplified), set())
+        self.assertTrue(crossed)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, simplify_points, regular(5), 0.1, 'reumann-witkam')
+        self.assertRaises(ValueError, Simplifier, 0.1, 'reumann-witkam')
+
+
+class SimplifierTestCase(unittest.TestCase):
+
+    def test_cache(self):
+        cache = ClipCache()
+        simplify = Simplifier(0.1, cache=cache)
+        points = noisy_circle(random.Random(3), 100, 0.01)
+        first = simplify(points)
+        self.assertEqual(first.points, simplify_points(points, 0.1))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(simplify(points).points, first.points)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # keyed on the options too
+        Simplifier(0.1, 'visvalingam', cache=cache)(points)
+        Simplifier(0.2, cache=cache)(points)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(Simplifier(0.1, cache=None)(points).points, first.points)
+
+    def test_clip(self):
+        rnd = random.Random(4)
+        a, b = noisy_circle(rnd, 100, 0.01), [(x + 5, y) for x, y in noisy_circle(rnd, 100, 0.01)]
+        for simplify in (Simplifier(0.1), Simplifier(0.1, 'visvalingam', topology=True)):
+            expected = clip_polygon(simplify(a), simplify(b), 'union', cache=False,
+                                    output='points')
+            self.assertEqual(clip_polygon(a, b, 'union', cache=False, simplify=simplify,
+                                          output='points'), expected)
+        # a tolerance stands for a Simplifier with the default options
+        self.assertEqual(clip_polygon(a, b, 'union', cache=False, simplify=0.1, output='points'),
+                         clip_polygon(a, b, 'union', cache=False, simplify=Simplifier(0.1),
+                                      output='points'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# -*- coding: UTF-8 -*-
+"""ClipStats: counters and callback; intersect() on degenerate input."""
+
+import random
+import unittest
+
+from polygon import ClipStats, Vertex, clip_polygon, intersect
+
+from shapes import pairs, square
+
+
+def clip(subject, clipper, operation, **kwargs):
+    return clip_polygon(subject, clipper, operation, cache=False, output='points', **kwargs)
+
+
+class ClipStatsTestCase(unittest.TestCase):
+
+    def test_counters(self):
+        stats = ClipStats()
+        clip(square(0, 0, 2), square(1, 1, 2), 'intersection', stats=stats)
+        self.assertEqual(stats.clips, 1)
+        self.assertEqual(stats.intersections, 2)
+        self.assertEqual(stats.degeneracies, 0)
+        self.assertTrue(0 < stats.pairs <= 16)
+        # the intersections in both polygons, and the result (5 vertices, as it
+        # starts and ends at the same intersection)
+        self.assertEqual(stats.vertices, 9)
+        self.assertEqual(sorted(stats.times), sorted(ClipStats.PHASES))
+        self.assertTrue(all(t >= 0 for t in stats.times.values()))
+        for name in ClipStats.PHASES + ('pairs', 'degeneracies', 'walked'):
+            self.assertTrue(name in repr(stats))
+
+    def test_callback(self):
+        calls = []
+        stats = ClipStats(callback=lambda s: calls.append(s.clips))
+        for operation in ('union', 'intersection', 'metrics'):
+            if operation == 'metrics':
+                clip_polygon(square(0, 0, 2), square(1, 1, 2), 'intersection', cache=False,
+                             output='metrics', stats=stats)
+            else:
+                clip(square(0, 0, 2), square(1, 1, 2), operation, stats=stats)
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(stats.intersections, 6)
+
+    def test_degeneracies(self):
+        stats = ClipStats()
+        clip(square(0, 0, 2), square(1, 0, 2), 'intersection', stats=stats)
+        self.assertTrue(stats.degeneracies > 0)
+
+    def test_same_results(self):
+        for a, b in pairs(random.Random(1), 20):
+            for operation in ('union', 'intersection', 'difference', 'reversed-diff'):
+                self.assertEqual(clip(a, b, operation, stats=ClipStats()), clip(a, b, operation))
+
+
+class IntersectTestCase(unittest.TestCase):
+
+    def intersect(self, s1, s2, c1, c2):
+        return intersect(Vertex(s1), Vertex(s2), Vertex(c1), Vertex(c2))
+
+    def test_crossing(self):
+        point, alphaS, alphaC = self.intersect((0.0, 0.0), (2.0, 2.0), (0.0, 2.0), (2.0, 0.0))
+        self.assertEqual((point, alphaS, alphaC), ((1.0, 1.0), 0.5, 0.5))
+        self.assertEqual(self.intersect((0.0, 0.0), (1.0, 0.0), (0.0, 1.0), (1.0, 1.0)), None)
+
+    def test_degenerate(self):
+        # an end point on the other segment, collinear overlap, touching ends
+        for segments in ((0.0, 0.0), (2.0, 0.0), (1.0, 0.0), (1.0, 1.0)), \
+                        ((0.0, 0.0), (2.0, 0.0), (1.0, 0.0), (3.0, 0.0)), \
+                        ((0.0, 0.0), (1.0, 1.0), (1.0, 1.0), (2.0, 0.0)):
+            self.assertTrue(self.intersect(*segments) is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# -*- coding: UTF-8 -*-
+"""tessellate: triangles covering the polygons, holes left out (needs GLU)."""
+
+import random
+import unittest
+
+import polyclip
+from polygon import signed_area
+
+from shapes import square, star
+
+try:
+    polyclip.import_opengl()
+except Exception:
+    opengl = False
+else:
+    opengl = True
+
+
+def triangles_area(vertices):
+    area = 0.0
+    for k in xrange(0, len(vertices), 6):
+        ax, ay, bx, by, cx, cy = vertices[k:k + 6]
+        area += abs((bx - ax) * (cy - ay) - (by - ay) * (cx - ax)) / 2
+    return area
+
+
+@unittest.skipIf(not opengl, "OpenGL isn't installed")
+class TessellateTestCase(unittest.TestCase):
+
+    def test_stars(self):
+        rnd = random.Random(1)
+        for k in xrange(20):
+            points = star(rnd, rnd.randint(3, 40))
+            triangles = polyclip.tessellate([points])
+            self.assertEqual(len(triangles) % 6, 0)
+            # the vertices are single precision
+            area = abs(signed_area(points))
+            self.assertAlmostEqual(triangles_area(triangles), area, delta=1e-5 * area)
+
+    def test_holes(self):
+        # odd winding: a ring inside another is a hole, whatever its orientation
+        for hole in (square(1, 1), square(1, 1)[::-1]):
+            self.assertAlmostEqual(triangles_area(polyclip.tessellate([square(0, 0, 4), hole])),
+                                   15.0, 3)
+        self.assertAlmostEqual(triangles_area(polyclip.tessellate([square(0, 0), square(2, 0)])),
+                               2.0, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: UTF-8 -*-
+"""union_all: shared edges merged, holes kept, in or out of process."""
+
+import random
+import unittest
+
+from polybatch import union_all
+from polygon import clip_area, signed_area
+
+from shapes import square, star
+
+
+def areas(polygons):
+    return [signed_area(p.points) for p in polygons]
+
+
+class UnionAllTestCase(unittest.TestCase):
+
+    grid = [square(x, y) for x in xrange(3) for y in xrange(3)]
+
+    def test_shared_edges(self):
+        for workers in (0, 2):
+            union = union_all(self.grid, workers=workers)
+            self.assertEqual(areas(union), [9.0])
+            self.assertEqual(sorted(set(union[0].points)),
+                             [(float(x), float(y)) for x in xrange(4) for y in xrange(4)
+                              if x in (0, 3) or y in (0, 3)])
+
+    def test_hole(self):
+        ring = [p for p in self.grid if p != square(1, 1)]
+        for workers in (0, 2):
+            union = union_all(ring, workers=workers)
+            self.assertEqual(areas(union), [9.0, -1.0])
+            self.assertEqual(sorted(union[1].points), sorted(square(1, 1)))
+
+    def test_disjoint(self):
+        squares = [square(0, 0), square(3, 0), square(0, 3)]
+        for workers in (0, 2):
+            union = union_all(squares, workers=workers)
+            self.assertEqual(sorted(p.points for p in union), sorted(squares))
+
+    def test_area(self):
+        rnd = random.Random(1)
+        for k in xrange(20):
+            a, b = star(rnd, 20), star(rnd, 20, cx=rnd.uniform(-8, 8))
+            self.assertAlmostEqual(sum(areas(union_all([a, b], workers=0))),
+                                   clip_area(a, b, 'union'))
+
+    def test_clockwise(self):
+        # input orientation doesn't matter: outer rings come out counter-clockwise
+        squares = [square(0, 0)[::-1], square(1, 0)]
+        self.assertEqual(areas(union_all(squares, workers=0)), [2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()